@@ -0,0 +1,43 @@
+# Contenido para: backend/apis/cliente_http.py
+# Sesión aiohttp y GET con reintentos compartidos por los clientes de APIs
+# externas (clima, imágenes). El ritmo global lo marca un TokenBucket.
+import random
+import asyncio
+import logging
+
+import aiohttp
+
+MAX_INTENTOS = 4
+PAUSA_429 = (10, 20)
+ESTADOS_DEFINITIVOS = (400, 401, 403, 404)  # Reintentar no cambia la respuesta
+
+def crear_sesion(max_conexiones=4, timeout=30):
+    conector = aiohttp.TCPConnector(limit=max_conexiones, ttl_dns_cache=300, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=conector, headers={"accept-encoding": "gzip, deflate"},
+                                 timeout=aiohttp.ClientTimeout(total=timeout))
+
+async def obtener_bytes(session, limitador, url, etiqueta):
+    """GET con reintentos bajo el limitador global. Devuelve (bytes, content-type) o None."""
+    for intento in range(1, MAX_INTENTOS + 1):
+        await limitador.adquirir()
+        try:
+            async with session.get(url) as response:
+                if response.status == 429:
+                    logging.warning(f"⚠️ Código 429 en {etiqueta} (intento {intento}).")
+                    limitador.penalizar(random.uniform(*PAUSA_429))
+                    continue
+                if response.status in ESTADOS_DEFINITIVOS:
+                    logging.error(f"❌ {etiqueta}: {response.status} {(await response.text(errors='replace'))[:200]}")
+                    return None
+                response.raise_for_status()
+                datos = await response.read()
+                tipo = response.headers.get("Content-Type", "")
+            limitador.recompensar()
+            return datos, tipo
+        except asyncio.TimeoutError:
+            logging.error(f"⏱️ Timeout en {etiqueta} (intento {intento}).")
+        except aiohttp.ClientError as e:
+            logging.error(f"❌ Error de red en {etiqueta} (intento {intento}): {e}")
+        await asyncio.sleep(min(60, 2 ** intento) + random.uniform(0, 1))
+    logging.error(f"❌ Se agotaron los intentos para {etiqueta}.")
+    return None
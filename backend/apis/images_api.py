@@ -0,0 +1,153 @@
+# Contenido para: backend/apis/images_api.py
+# Imágenes de destinos (Pixabay) y logos de empresas (empresas.logo_url).
+#
+# - DESCARGA: búsqueda en Pixabay y bajada de bytes; todo pasa por un
+#   AlmacenContenido, así que un logo idéntico para varias empresas se guarda
+#   una sola vez y repetir la descarga no sale a la red.
+# - MINIATURAS: versiones de tamaño fijo generadas una vez al descargar
+#   (Pillow es opcional: sin él se sirve el original).
+# - CONSULTA LOCAL: lo que usa el frontend. Sólo lee la tabla `imagenes` y el
+#   disco; si algo no se descargó devuelve None, nunca espera a la red.
+import io
+import json
+import logging
+from urllib.parse import urlencode
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+from ..core.config import (
+    PIXABAY_API_KEY, PIXABAY_BASE_URL, PIXABAY_CONSULTA, IMAGENES_DIR,
+)
+from ..scraping.shared.almacen_contenido import clave_peticion, ruta_objeto
+from ..database.db_manager import obtener_gestor, DB_PATH_POR_DEFECTO
+from .cliente_http import obtener_bytes
+
+# Firma de los primeros bytes -> extensión. Lo que no es imagen no se guarda.
+FIRMAS_IMAGEN = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+def extension_imagen(datos):
+    for firma, extension in FIRMAS_IMAGEN:
+        if datos.startswith(firma):
+            return extension
+    if datos[:4] == b"RIFF" and datos[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+# --- DESCARGA ---
+
+def construir_url_busqueda(destino, base_url=None, api_key=None):
+    """(url con key, clave de caché sin key) de la búsqueda de fotos de `destino`."""
+    parametros = urlencode(sorted({
+        "q": PIXABAY_CONSULTA.format(ciudad=destino), "image_type": "photo", "orientation": "horizontal",
+        "category": "travel", "safesearch": "true", "per_page": 3,
+    }.items()))
+    base_url = base_url or PIXABAY_BASE_URL
+    clave = clave_peticion("pixabay", destino, parametros)
+    return f"{base_url}?{parametros}&key={api_key or PIXABAY_API_KEY}", clave
+
+async def url_imagen_destino(session, limitador, almacen, destino, base_url=None, offline=False):
+    """URL de la foto más relevante para `destino` según Pixabay (respuesta cacheada), o None."""
+    url, clave = construir_url_busqueda(destino, base_url)
+    datos = almacen.obtener(clave)
+    if datos is None and not offline:
+        respuesta = await obtener_bytes(session, limitador, url, f"búsqueda de imágenes {destino}")
+        if respuesta is not None:
+            try:
+                json.loads(respuesta[0])
+            except ValueError:
+                logging.error(f"❌ Respuesta de Pixabay no es JSON para {destino}; no se guarda.")
+            else:
+                datos = respuesta[0]
+                almacen.registrar(clave, datos, ".json", origen=url.split("&key=")[0])
+    if datos is None:
+        return None
+    for hit in json.loads(datos).get("hits") or []:
+        if isinstance(hit, dict) and (hit.get("webformatURL") or hit.get("largeImageURL")):
+            return hit.get("webformatURL") or hit.get("largeImageURL")
+    logging.warning(f"⚠️ Pixabay no devolvió imágenes para {destino}.")
+    return None
+
+async def descargar_imagen(session, limitador, almacen, url, offline=False):
+    """(hash, extension) de la imagen en `url`, desde el almacén si ya se bajó. None si no hay."""
+    clave = clave_peticion("imagen", url)
+    encontrado = almacen.buscar(clave)
+    if encontrado is not None or offline:
+        return encontrado
+    respuesta = await obtener_bytes(session, limitador, url, f"imagen {url}")
+    if respuesta is None:
+        return None
+    extension = extension_imagen(respuesta[0])
+    if extension is None:
+        logging.error(f"❌ {url} no devolvió una imagen ({respuesta[1] or 'sin Content-Type'}); no se guarda.")
+        return None
+    return almacen.registrar(clave, respuesta[0], extension, origen=url), extension
+
+# --- MINIATURAS ---
+
+def generar_miniatura(almacen, hash_, extension, tamano, recortar):
+    """
+    Miniatura de exactamente `tamano` (ancho, alto) de un objeto del almacén.
+    `recortar=True` llena el cuadro recortando al centro (fotos, JPEG);
+    `recortar=False` la encaja entera sobre fondo transparente (logos, PNG).
+    Devuelve (hash, extension) o None si no hay Pillow o la imagen no se puede abrir.
+    """
+    if Image is None:
+        return None
+    ancho, alto = tamano
+    clave = clave_peticion("miniatura", hash_, ancho, alto, recortar)
+    encontrado = almacen.buscar(clave)
+    if encontrado is not None:
+        return encontrado
+    try:
+        with Image.open(almacen.ruta(hash_, extension)) as original:
+            original.seek(0)
+            if recortar:
+                imagen = ImageOps.fit(original.convert("RGB"), tamano, Image.Resampling.LANCZOS)
+                formato, extension_salida, opciones = "JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True}
+            else:
+                encajada = ImageOps.contain(original.convert("RGBA"), tamano, Image.Resampling.LANCZOS)
+                imagen = Image.new("RGBA", tamano, (0, 0, 0, 0))
+                imagen.paste(encajada, ((ancho - encajada.width) // 2, (alto - encajada.height) // 2))
+                formato, extension_salida, opciones = "PNG", ".png", {"optimize": True}
+    except (OSError, ValueError) as e:
+        logging.error(f"❌ No se pudo generar la miniatura de {hash_}: {e}")
+        return None
+    salida = io.BytesIO()
+    imagen.save(salida, formato, **opciones)
+    return almacen.registrar(clave, salida.getvalue(), extension_salida, origen=hash_), extension_salida
+
+# --- CONSULTA LOCAL ---
+
+def _elegir_ruta(fila, miniatura, raiz):
+    hash_, extension, miniatura_hash, miniatura_extension = fila
+    if miniatura and miniatura_hash:
+        return ruta_objeto(raiz, miniatura_hash, miniatura_extension)
+    return ruta_objeto(raiz, hash_, extension)
+
+def ruta_imagen(tipo, clave, miniatura=True, db_path=DB_PATH_POR_DEFECTO, raiz=IMAGENES_DIR):
+    """
+    Ruta local de la imagen de un destino (tipo='destino', clave=ciudad) o del
+    logo de una empresa (tipo='logo', clave=empresa_id). None si no se descargó.
+    """
+    filas = obtener_gestor(db_path).consultar("imagen", (tipo, str(clave)))
+    if not filas:
+        return None
+    ruta = _elegir_ruta(filas[0], miniatura, raiz)
+    return ruta if ruta.exists() else None
+
+def rutas_imagenes(tipo, miniatura=True, db_path=DB_PATH_POR_DEFECTO, raiz=IMAGENES_DIR):
+    """{clave: ruta local} de todas las imágenes de un tipo, en una consulta (p. ej. todos los logos)."""
+    rutas = {}
+    for clave, *fila in obtener_gestor(db_path).consultar("imagenes_tipo", (tipo,)):
+        ruta = _elegir_ruta(fila, miniatura, raiz)
+        if ruta.exists():
+            rutas[clave] = ruta
+    return rutas
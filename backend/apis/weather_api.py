@@ -0,0 +1,76 @@
+# Contenido para: backend/apis/weather_api.py
+# Cliente de la Timeline API de Visual Crossing (historial diario por ciudad).
+#
+# Todas las respuestas pasan por un AlmacenContenido: la clave de la petición es
+# la URL sin la API key, así que repetir una descarga es offline y cambiar de
+# clave no invalida la caché. La URL base sale de config (o del entorno), de
+# modo que un servidor local puede hacerse pasar por Visual Crossing en pruebas.
+import json
+import logging
+from datetime import timedelta
+from urllib.parse import quote, urlencode
+
+from ..core.config import (
+    VISUAL_CROSSING_API_KEY, VISUAL_CROSSING_BASE_URL, CLIMA_PAIS, CLIMA_DIAS_POR_PETICION,
+)
+from ..scraping.shared.almacen_contenido import clave_peticion
+from .cliente_http import obtener_bytes
+
+PARAMETROS_FIJOS = {"unitGroup": "metric", "include": "days", "contentType": "json",
+                    "elements": "datetime,tempmax,tempmin,temp,precip,humidity,conditions,icon"}
+
+# Campo de Visual Crossing -> columna de la tabla clima
+CAMPOS_DIA = {
+    "tempmax": "temp_max", "tempmin": "temp_min", "temp": "temp_prom",
+    "precip": "precipitacion", "humidity": "humedad", "conditions": "condiciones", "icon": "icono",
+}
+
+def partir_rango(desde, hasta, dias=CLIMA_DIAS_POR_PETICION):
+    """[(inicio, fin)] de como mucho `dias` días cubriendo desde..hasta (date, inclusive)."""
+    tramos, inicio = [], desde
+    while inicio <= hasta:
+        fin = min(hasta, inicio + timedelta(days=dias - 1))
+        tramos.append((inicio, fin))
+        inicio = fin + timedelta(days=1)
+    return tramos
+
+def construir_url(ciudad, desde, hasta, base_url=None, api_key=None):
+    """(url con key, clave de caché sin key) para el historial de `ciudad` entre dos fechas."""
+    base_url = (base_url or VISUAL_CROSSING_BASE_URL).rstrip("/")
+    ubicacion = quote(f"{ciudad}, {CLIMA_PAIS}")
+    ruta = f"{base_url}/{ubicacion}/{desde.isoformat()}/{hasta.isoformat()}"
+    parametros = urlencode(sorted(PARAMETROS_FIJOS.items()))
+    clave = clave_peticion("visualcrossing", ciudad, desde.isoformat(), hasta.isoformat(), parametros)
+    return f"{ruta}?{parametros}&key={api_key or VISUAL_CROSSING_API_KEY}", clave
+
+async def obtener_historial(session, limitador, almacen, ciudad, desde, hasta, base_url=None, offline=False):
+    """
+    Respuesta cruda (bytes) del historial de `ciudad`, desde la caché si ya se
+    pidió antes. Con `offline=True` nunca sale a la red. Devuelve None si no hay datos.
+    """
+    url, clave = construir_url(ciudad, desde, hasta, base_url)
+    guardado = almacen.obtener(clave)
+    if guardado is not None or offline:
+        return guardado
+    respuesta = await obtener_bytes(session, limitador, url, f"clima {ciudad} {desde}..{hasta}")
+    if respuesta is None:
+        return None
+    datos = respuesta[0]
+    try:
+        json.loads(datos)
+    except ValueError:
+        logging.error(f"❌ Respuesta de clima no es JSON para {ciudad} {desde}..{hasta}; no se guarda.")
+        return None
+    almacen.registrar(clave, datos, ".json", origen=url.split("&key=")[0])
+    return datos
+
+def parsear_dias(datos):
+    """Bytes de la respuesta -> [{fecha, temp_max, ...}] (un dict por día)."""
+    dias = []
+    for dia in json.loads(datos).get("days") or []:
+        if not isinstance(dia, dict) or not dia.get("datetime"):
+            continue
+        fila = {"fecha": dia["datetime"]}
+        fila.update({columna: dia.get(campo) for campo, columna in CAMPOS_DIA.items()})
+        dias.append(fila)
+    return dias
@@ -0,0 +1,259 @@
+# Contenido para: backend/core/conexiones.py
+# Búsqueda de itinerarios con transbordos (p. ej. Lima → Huancayo → Ayacucho)
+# sobre todos los viajes cargados, no sólo sobre los pares directos de city_ids.json.
+#
+# Cada viaje es una "conexión" (ciudad origen, ciudad destino, salida, llegada,
+# precio de la última oferta). Las conexiones se guardan en arrays ordenados por
+# hora de salida y la búsqueda es un barrido estilo CSA (Connection Scan
+# Algorithm): se recorren una sola vez en orden de salida y, para cada una, se
+# mira la etiqueta más barata que ya espera en su ciudad de origen respetando el
+# transbordo mínimo, la espera máxima y el límite de tramos. Como el barrido
+# avanza en el tiempo, las etiquetas que maduran o vencen se manejan con dos
+# montículos por (ciudad, tramos) y nunca hay que volver atrás.
+#
+# Uso: python backend/core/conexiones.py --origen Lima --desde 2025-07-05 [--destino Ayacucho]
+import time
+import heapq
+import logging
+import argparse
+from pathlib import Path
+from datetime import date, datetime, timedelta
+import sys
+
+import numpy as np
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+from backend.database.db_manager import obtener_gestor, DB_PATH_POR_DEFECTO
+
+INTERVALO_REFRESCO = 30    # Segundos mínimos entre comprobaciones de version_datos
+TRANSBORDO_MIN = 60        # Minutos mínimos entre llegar a una ciudad y salir de ella
+ESPERA_MAX = 24 * 60       # Minutos máximos esperando un transbordo
+MAX_TRAMOS = 3
+
+_EPOCA = datetime(1970, 1, 1)
+
+def _minutos_desde_epoca(instante):
+    return int((instante - _EPOCA).total_seconds() // 60)
+
+def _instante(minutos):
+    return _EPOCA + timedelta(minutes=int(minutos))
+
+def _minutos_hora(hora):
+    try:
+        h, m = hora.split(":")[:2]
+        return int(h) * 60 + int(m)
+    except (AttributeError, ValueError):
+        return 0
+
+class BuscadorConexiones:
+    """
+    Índice de conexiones en columnas de NumPy ordenadas por salida (minutos
+    desde época): origen/destino (índices de ciudad), salida, llegada, precio,
+    asientos y viaje_id.
+    """
+
+    def __init__(self, db_path=DB_PATH_POR_DEFECTO, intervalo_refresco=INTERVALO_REFRESCO):
+        self.db_path = str(db_path)
+        self.intervalo_refresco = intervalo_refresco
+        self._gestor = obtener_gestor(self.db_path)
+        self.reconstruir()
+
+    # --- CONSTRUCCIÓN ---
+
+    def reconstruir(self):
+        inicio = time.perf_counter()
+        version = self._gestor.version_datos()
+        filas = self._gestor.consultar("conexiones", cache=False)
+        self.ciudades = sorted({f[1] for f in filas} | {f[2] for f in filas})
+        self.indice_ciudad = {ciudad: i for i, ciudad in enumerate(self.ciudades)}
+        self.empresas = {eid: nombre for eid, nombre, *_ in self._gestor.consultar("empresas")}
+
+        n = len(filas)
+        viaje_id, origen, destino, fecha, hora_sal, hora_lle, duracion, precio, asientos, empresa = \
+            (list(col) for col in zip(*filas)) if n else ([] for _ in range(10))
+        dias = np.array(fecha, dtype="datetime64[D]").astype(np.int64)
+        salida = dias * 1440 + np.array([_minutos_hora(h) for h in hora_sal], dtype=np.int64)
+        # La llegada sale de la duración; si falta, de la hora de llegada (al día siguiente si es menor)
+        hora_llegada = np.array([_minutos_hora(h) for h in hora_lle], dtype=np.int64)
+        por_hora = dias * 1440 + hora_llegada + np.where(hora_llegada <= salida % 1440, 1440, 0)
+        duracion = np.array([-1 if d is None else d for d in duracion], dtype=np.int64)
+        llegada = np.where(duracion > 0, salida + duracion, por_hora)
+
+        orden = np.argsort(salida, kind="stable")
+        self._c = {
+            "viaje_id": np.array(viaje_id, dtype=np.int64)[orden],
+            "origen": np.array([self.indice_ciudad[c] for c in origen], dtype=np.int32)[orden],
+            "destino": np.array([self.indice_ciudad[c] for c in destino], dtype=np.int32)[orden],
+            "salida": salida[orden],
+            "llegada": llegada[orden],
+            "precio": np.array(precio, dtype=np.float64)[orden],
+            "asientos": np.array([-1 if a is None else a for a in asientos], dtype=np.int32)[orden],
+            "empresa_id": np.array(empresa, dtype=np.int32)[orden],
+        }
+        self.version = version
+        self._ultima_comprobacion = time.monotonic()
+        logging.info(f"Conexiones: {n} viajes entre {len(self.ciudades)} ciudades indexados en {time.perf_counter() - inicio:.2f}s")
+
+    def refrescar_si_cambio(self):
+        """Reconstruye (es barato) si el loader subió version_datos; como mucho cada `intervalo_refresco` s."""
+        if time.monotonic() - self._ultima_comprobacion < self.intervalo_refresco:
+            return False
+        self._ultima_comprobacion = time.monotonic()
+        if self._gestor.version_datos() == self.version:
+            return False
+        self.reconstruir()
+        return True
+
+    def __len__(self):
+        return len(self._c["viaje_id"])
+
+    # --- BÚSQUEDA ---
+
+    def buscar(self, origen, fecha_desde, fecha_hasta=None, destino=None, max_tramos=MAX_TRAMOS,
+               transbordo_min=TRANSBORDO_MIN, espera_max=ESPERA_MAX, asientos_min=1, presupuesto=None):
+        """
+        Itinerarios más baratos saliendo de `origen` entre `fecha_desde` y
+        `fecha_hasta` (inclusive, 'YYYY-MM-DD'). Por cada destino (o sólo
+        `destino`) devuelve el más barato con 1 tramo, con 2, ... siempre que
+        cada uno mejore al anterior, ordenados por destino y precio.
+        """
+        self.refrescar_si_cambio()
+        if origen not in self.indice_ciudad:
+            return []
+        c = self._c
+        o = self.indice_ciudad[origen]
+        inicio = _minutos_desde_epoca(datetime.fromisoformat(fecha_desde))
+        fin = _minutos_desde_epoca(datetime.fromisoformat(fecha_hasta or fecha_desde) + timedelta(days=1))
+        # Ninguna cadena de max_tramos puede seguir viva más allá de este límite
+        duracion_max = int((c["llegada"] - c["salida"]).max()) if len(self) else 0
+        limite = fin + (max_tramos - 1) * (espera_max + transbordo_min + duracion_max)
+        desde, hasta = np.searchsorted(c["salida"], [inicio, limite])
+
+        # Etiquetas: (precio acumulado, conexión, etiqueta padre, tramos)
+        etiquetas = []
+        pendientes = {}   # (ciudad, tramos) -> montículo (lista para salir, precio, etiqueta, llegada)
+        disponibles = {}  # (ciudad, tramos) -> montículo (precio, llegada, etiqueta)
+        mejores = {}      # (ciudad, tramos) -> etiqueta más barata que llega ahí
+
+        validas = c["precio"][desde:hasta] > 0
+        if asientos_min:
+            validas &= c["asientos"][desde:hasta] >= asientos_min
+        for i in (np.flatnonzero(validas) + desde).tolist():
+            t = int(c["salida"][i])
+            a, b = int(c["origen"][i]), int(c["destino"][i])
+            if b == o:
+                continue  # Volver al origen nunca sirve
+            precio = float(c["precio"][i])
+            llegada = int(c["llegada"][i])
+            nuevas = []
+            if a == o:
+                if t < fin:
+                    nuevas.append((precio, -1, 1))
+            else:
+                for tramos in range(1, max_tramos):
+                    previa = self._mejor_disponible(pendientes, disponibles, (a, tramos), t, espera_max)
+                    if previa is not None:
+                        nuevas.append((etiquetas[previa][0] + precio, previa, tramos + 1))
+            for total, padre, tramos in nuevas:
+                if presupuesto is not None and total > presupuesto:
+                    continue
+                etiqueta = len(etiquetas)
+                etiquetas.append((total, i, padre, tramos))
+                clave = (b, tramos)
+                actual = mejores.get(clave)
+                if actual is None or (total, llegada) < (etiquetas[actual][0], int(c["llegada"][etiquetas[actual][1]])):
+                    mejores[clave] = etiqueta
+                if tramos < max_tramos:
+                    heapq.heappush(pendientes.setdefault(clave, []), (llegada + transbordo_min, total, etiqueta, llegada))
+
+        return self._itinerarios(etiquetas, mejores, destino, max_tramos)
+
+    @staticmethod
+    def _mejor_disponible(pendientes, disponibles, clave, t, espera_max):
+        """Etiqueta más barata en `clave` con la que se alcanza una salida en `t`, o None."""
+        cola = pendientes.get(clave)
+        if cola:
+            libres = disponibles.setdefault(clave, [])
+            while cola and cola[0][0] <= t:
+                _, total, etiqueta, llegada = heapq.heappop(cola)
+                heapq.heappush(libres, (total, llegada, etiqueta))
+        libres = disponibles.get(clave)
+        # La espera se cuenta desde la llegada; como t sólo avanza, las vencidas no vuelven a servir
+        while libres and libres[0][1] + espera_max < t:
+            heapq.heappop(libres)
+        return libres[0][2] if libres else None
+
+    def _itinerarios(self, etiquetas, mejores, destino, max_tramos):
+        por_destino = {}
+        for (ciudad, tramos), etiqueta in mejores.items():
+            por_destino.setdefault(ciudad, {})[tramos] = etiqueta
+        resultados = []
+        for ciudad, por_tramos in por_destino.items():
+            nombre = self.ciudades[ciudad]
+            if destino and nombre != destino:
+                continue
+            mejor_precio = float("inf")
+            for tramos in range(1, max_tramos + 1):
+                etiqueta = por_tramos.get(tramos)
+                if etiqueta is None or etiquetas[etiqueta][0] >= mejor_precio:
+                    continue
+                mejor_precio = etiquetas[etiqueta][0]
+                resultados.append(self._como_dict(etiquetas, etiqueta, nombre))
+        resultados.sort(key=lambda r: (r["destino"], r["precio_total"]))
+        return resultados
+
+    def _como_dict(self, etiquetas, etiqueta, destino):
+        c = self._c
+        tramos = []
+        while etiqueta != -1:
+            _, i, padre, _ = etiquetas[etiqueta]
+            tramos.append({
+                "viaje_id": int(c["viaje_id"][i]),
+                "origen": self.ciudades[int(c["origen"][i])],
+                "destino": self.ciudades[int(c["destino"][i])],
+                "salida": _instante(c["salida"][i]).strftime("%Y-%m-%d %H:%M"),
+                "llegada": _instante(c["llegada"][i]).strftime("%Y-%m-%d %H:%M"),
+                "empresa": self.empresas.get(int(c["empresa_id"][i])),
+                "precio": round(float(c["precio"][i]), 2),
+            })
+            etiqueta = padre
+        tramos.reverse()
+        return {
+            "destino": destino,
+            "precio_total": round(sum(t["precio"] for t in tramos), 2),
+            "tramos": tramos,
+            "salida": tramos[0]["salida"],
+            "llegada": tramos[-1]["llegada"],
+        }
+
+_instancias = {}
+
+def obtener_buscador(db_path=DB_PATH_POR_DEFECTO):
+    """Instancia compartida por proceso."""
+    if db_path not in _instancias:
+        _instancias[db_path] = BuscadorConexiones(db_path)
+    return _instancias[db_path]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Itinerarios más baratos con transbordos.")
+    parser.add_argument("--db", default=DB_PATH_POR_DEFECTO)
+    parser.add_argument("--origen", required=True)
+    parser.add_argument("--destino")
+    parser.add_argument("--desde", default=date.today().isoformat(), help="Primera fecha de salida (YYYY-MM-DD).")
+    parser.add_argument("--hasta", help="Última fecha de salida (YYYY-MM-DD); por defecto igual a --desde.")
+    parser.add_argument("--tramos", type=int, default=MAX_TRAMOS)
+    parser.add_argument("--transbordo", type=int, default=TRANSBORDO_MIN, help="Minutos mínimos de transbordo.")
+    parser.add_argument("--espera", type=int, default=ESPERA_MAX, help="Minutos máximos de espera en un transbordo.")
+    parser.add_argument("--presupuesto", type=float)
+    args = parser.parse_args()
+
+    buscador = BuscadorConexiones(args.db)
+    inicio = time.perf_counter()
+    itinerarios = buscador.buscar(args.origen, args.desde, args.hasta, args.destino, args.tramos,
+                                  args.transbordo, args.espera, presupuesto=args.presupuesto)
+    print(f"🧭 {len(itinerarios)} itinerarios en {(time.perf_counter() - inicio) * 1000:.2f} ms")
+    for it in itinerarios:
+        ruta = " → ".join([it["tramos"][0]["origen"]] + [t["destino"] for t in it["tramos"]])
+        print(f"   S/ {it['precio_total']:.2f} | {it['salida']} → {it['llegada']} | {ruta}")
@@ -0,0 +1,34 @@
+# Contenido para: backend/core/config.py
+# Variables globales: rutas de datos y claves/URLs de APIs externas.
+# Las claves se leen del entorno (nunca se versionan); las URLs base también se
+# pueden sobrescribir por entorno para apuntar a un servidor local de pruebas.
+import os
+from pathlib import Path
+
+RAIZ_PROYECTO = Path(__file__).resolve().parents[2]
+DATA_RAW = Path("data/raw")
+DATA_PROCESSED = Path("data/processed")
+DATA_CACHE = Path("data/cache")
+DB_PATH = DATA_PROCESSED / "viajes.db"
+
+# --- CLIMA (Visual Crossing) ---
+VISUAL_CROSSING_API_KEY = os.environ.get("VISUAL_CROSSING_API_KEY", "")
+VISUAL_CROSSING_BASE_URL = os.environ.get(
+    "VISUAL_CROSSING_BASE_URL",
+    "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline",
+)
+CLIMA_CACHE_DIR = DATA_CACHE / "clima"
+CLIMA_PAIS = "Peru"               # Se agrega al nombre de la ciudad para desambiguar
+CLIMA_DIAS_POR_PETICION = 31      # Días por petición de historial
+CLIMA_MAX_CONCURRENTES = 4
+CLIMA_TASA_POR_SEGUNDO = 2.0
+
+# --- IMÁGENES (Pixabay + logos de empresas) ---
+PIXABAY_API_KEY = os.environ.get("PIXABAY_API_KEY", "")
+PIXABAY_BASE_URL = os.environ.get("PIXABAY_BASE_URL", "https://pixabay.com/api/")
+PIXABAY_CONSULTA = "{ciudad} Peru"  # Texto de búsqueda por destino
+IMAGENES_DIR = Path("data/images")
+MINIATURA_DESTINO = (480, 270)    # 16:9, recortada al centro
+MINIATURA_LOGO = (96, 96)         # Cabe completa, fondo transparente
+IMAGENES_MAX_CONCURRENTES = 8
+IMAGENES_TASA_POR_SEGUNDO = 5.0
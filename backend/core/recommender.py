@@ -0,0 +1,433 @@
+# Contenido para: backend/core/recommender.py
+# Recomendador en memoria: una "foto" columnar (arrays de NumPy) con la última
+# oferta de cada viaje. Las consultas (presupuesto, fechas, ruta, amenidades)
+# se resuelven con máscaras vectorizadas y un top-k con np.partition, sin
+# joins contra SQLite en cada petición.
+#
+# La foto se construye una vez y luego se refresca de forma incremental: sólo
+# se releen los viajes con filas nuevas en historial_viajes desde la última vez
+# (historial_viajes.id es autoincremental, así que basta con recordar el máximo).
+#
+# Uso: python backend/core/recommender.py --origen Huancayo --destino Lima --presupuesto 60
+import time
+import logging
+import argparse
+from pathlib import Path
+from datetime import date
+import sys
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # Ejecutado como script (python backend/core/recommender.py)
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+from backend.database.db_manager import obtener_gestor, CONSULTAS, DB_PATH_POR_DEFECTO
+
+# Pesos del puntaje (se normalizan dentro del conjunto filtrado)
+PESOS_POR_DEFECTO = {"precio": 0.45, "duracion": 0.20, "rating": 0.20, "bus_score": 0.15}
+INTERVALO_REFRESCO = 30  # Segundos mínimos entre comprobaciones de datos nuevos
+
+_EPOCA = date(1970, 1, 1)
+
+def _dias_desde_epoca(fecha):
+    """'YYYY-MM-DD' (o date) -> días desde 1970-01-01, como int."""
+    if isinstance(fecha, str):
+        fecha = date.fromisoformat(fecha[:10])
+    return (fecha - _EPOCA).days
+
+def _minutos(hora):
+    try:
+        h, m = hora.split(":")[:2]
+        return int(h) * 60 + int(m)
+    except (AttributeError, ValueError):
+        return -1
+
+class Recomendador:
+    """
+    Foto columnar de la última oferta por viaje. Columnas (todas alineadas por
+    posición y ordenadas por viaje_id):
+    viaje_id, ruta_id, empresa_id, fecha (días desde época), hora_salida (min),
+    duracion (min), precio, asientos, rating, bus_score y `mascara`, una matriz
+    uint64 (n_viajes × palabras) con un bit por amenidad.
+    """
+
+    def __init__(self, db_path=DB_PATH_POR_DEFECTO, intervalo_refresco=INTERVALO_REFRESCO):
+        self.db_path = str(db_path)
+        self.intervalo_refresco = intervalo_refresco
+        self._ultima_comprobacion = 0.0
+        self._gestor = obtener_gestor(self.db_path)
+        self.reconstruir()
+
+    # --- CONSTRUCCIÓN ---
+
+    def reconstruir(self):
+        """Relee todo desde SQLite (también recarga catálogos y ratings de empresas)."""
+        inicio = time.perf_counter()
+        with self._gestor.lectura() as conn:
+            self.max_historial_id = conn.execute(CONSULTAS["max_historial_id"]).fetchone()[0]
+            self._cargar_catalogos(conn)
+            columnas = self._columnas_desde_filas(conn.execute(CONSULTAS["ultima_oferta"]).fetchall())
+            columnas["mascara"] = self._mascaras(conn.execute(CONSULTAS["viaje_amenidades"]), columnas["viaje_id"])
+        self._columnas = columnas
+        self._construir_calendario()
+        self._ultima_comprobacion = time.monotonic()
+        logging.info(f"Recomendador: {len(self)} viajes cargados en {time.perf_counter() - inicio:.2f}s")
+
+    def _cargar_catalogos(self, conn):
+        self.rutas = {rid: (o, d) for rid, o, d in conn.execute(CONSULTAS["rutas"])}
+        self.empresas = {eid: nombre for eid, nombre, *_ in conn.execute(CONSULTAS["empresas"])}
+        amenidades = conn.execute(CONSULTAS["amenidades"]).fetchall()
+        self.bit_amenidad = {codigo: i for i, (_, codigo, _) in enumerate(amenidades)}
+        # Bases anteriores al descargador de clima no tienen la tabla
+        self._hay_clima = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clima'").fetchone() is not None
+        self._id_a_bit = {aid: i for i, (aid, _, _) in enumerate(amenidades)}
+        self.palabras_mascara = max(1, (len(amenidades) + 63) // 64)
+
+    @staticmethod
+    def _columnas_desde_filas(filas):
+        n = len(filas)
+        col = {
+            "viaje_id": np.empty(n, dtype=np.int64),
+            "ruta_id": np.empty(n, dtype=np.int32),
+            "empresa_id": np.empty(n, dtype=np.int32),
+            "fecha": np.empty(n, dtype=np.int32),
+            "hora_salida": np.empty(n, dtype=np.int16),
+            "duracion": np.empty(n, dtype=np.float32),
+            "precio": np.empty(n, dtype=np.float32),
+            "asientos": np.empty(n, dtype=np.int32),
+            "rating": np.empty(n, dtype=np.float32),
+            "bus_score": np.empty(n, dtype=np.float32),
+        }
+        for i, (vid, rid, eid, fecha, hora, dur, precio, asientos, rating, score) in enumerate(filas):
+            col["viaje_id"][i] = vid
+            col["ruta_id"][i] = rid
+            col["empresa_id"][i] = eid
+            col["fecha"][i] = _dias_desde_epoca(fecha)
+            col["hora_salida"][i] = _minutos(hora)
+            col["duracion"][i] = np.nan if dur is None else dur
+            col["precio"][i] = np.nan if precio is None else precio
+            col["asientos"][i] = -1 if asientos is None else asientos
+            col["rating"][i] = np.nan if rating is None else rating
+            col["bus_score"][i] = np.nan if score is None else score
+        return col
+
+    def _mascaras(self, filas_amenidades, viaje_ids):
+        """Máscaras de bits a partir de filas (viaje_id, amenidad_id)."""
+        mascara = np.zeros((len(viaje_ids), self.palabras_mascara), dtype=np.uint64)
+        if not len(viaje_ids):
+            return mascara
+        filas = np.array(filas_amenidades.fetchall(), dtype=np.int64).reshape(-1, 2)
+        if not len(filas):
+            return mascara
+        posiciones = np.searchsorted(viaje_ids, filas[:, 0])
+        validas = (posiciones < len(viaje_ids)) & (viaje_ids[np.minimum(posiciones, len(viaje_ids) - 1)] == filas[:, 0])
+        bits = np.array([self._id_a_bit.get(a, -1) for a in filas[:, 1]], dtype=np.int64)
+        validas &= bits >= 0
+        posiciones, bits = posiciones[validas], bits[validas]
+        np.bitwise_or.at(mascara, (posiciones, bits // 64), np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64)))
+        return mascara
+
+    def refrescar(self):
+        """
+        Incorpora lo cargado desde la última vez: relee sólo los viajes con filas
+        nuevas en historial_viajes, actualiza en su sitio los que ya estaban y
+        agrega los nuevos (sus ids son mayores, así que el orden se mantiene).
+        Devuelve cuántos viajes se tocaron.
+        """
+        self._ultima_comprobacion = time.monotonic()
+        with self._gestor.lectura() as conn:
+            max_id = conn.execute(CONSULTAS["max_historial_id"]).fetchone()[0]
+            if max_id == self.max_historial_id:
+                return 0
+            ampliable = max_id > self.max_historial_id and \
+                conn.execute(CONSULTAS["conteo_amenidades"]).fetchone()[0] == len(self.bit_amenidad)
+            if ampliable:
+                desde = (self.max_historial_id,)
+                filas = conn.execute(CONSULTAS["ultima_oferta_desde_historial"], desde).fetchall()
+                self.rutas.update({rid: (o, d) for rid, o, d in conn.execute(CONSULTAS["rutas"])})
+                self.empresas.update({eid: nombre for eid, nombre, *_ in conn.execute(CONSULTAS["empresas"])})
+                cambios = self._columnas_desde_filas(filas)
+                cambios["mascara"] = self._mascaras(
+                    conn.execute(CONSULTAS["viaje_amenidades_desde_historial"], desde), cambios["viaje_id"]
+                )
+                self.max_historial_id = max_id
+        if not ampliable:
+            # Borrados o catálogo de amenidades distinto: la foto ya no es ampliable
+            self.reconstruir()
+            return len(self)
+
+        actuales = self._columnas["viaje_id"]
+        posiciones = np.searchsorted(actuales, cambios["viaje_id"])
+        existentes = (posiciones < len(actuales)) & (actuales[np.minimum(posiciones, max(len(actuales) - 1, 0))] == cambios["viaje_id"]) \
+            if len(actuales) else np.zeros(len(posiciones), dtype=bool)
+        for nombre, valores in cambios.items():
+            self._columnas[nombre][posiciones[existentes]] = valores[existentes]
+        if (~existentes).any():
+            self._columnas = {
+                nombre: np.concatenate([self._columnas[nombre], valores[~existentes]])
+                for nombre, valores in cambios.items()
+            }
+            if not np.all(np.diff(self._columnas["viaje_id"]) > 0):
+                orden = np.argsort(self._columnas["viaje_id"], kind="stable")
+                self._columnas = {nombre: valores[orden] for nombre, valores in self._columnas.items()}
+        self._actualizar_calendario(np.unique(cambios["ruta_id"]))
+        logging.info(f"Recomendador: {len(filas)} viajes refrescados ({int((~existentes).sum())} nuevos)")
+        return len(filas)
+
+    # --- CALENDARIO DE PRECIOS (ruta × día) ---
+
+    def _construir_calendario(self):
+        """
+        Matrices (rutas × días) con precio mínimo, mediana y número de viajes
+        con asientos, desde el primer hasta el último día de salida cargado.
+        """
+        c = self._columnas
+        self._fila_ruta = {rid: i for i, rid in enumerate(sorted(self.rutas))}
+        self._dia0 = int(c["fecha"].min()) if len(self) else 0
+        n_dias = int(c["fecha"].max()) - self._dia0 + 1 if len(self) else 0
+        forma = (len(self._fila_ruta), n_dias)
+        self._calendario = {
+            "precio_min": np.full(forma, np.nan, dtype=np.float32),
+            "precio_mediana": np.full(forma, np.nan, dtype=np.float32),
+            "n_viajes": np.zeros(forma, dtype=np.int32),
+        }
+        self._llenar_calendario(np.ones(len(self), dtype=bool))
+
+    def _actualizar_calendario(self, ruta_ids):
+        """Recalcula sólo las filas de las rutas tocadas por un refresco."""
+        c = self._columnas
+        fuera = len(self) and (int(c["fecha"].min()) < self._dia0 or
+                               int(c["fecha"].max()) >= self._dia0 + self._calendario["n_viajes"].shape[1])
+        if fuera or any(int(r) not in self._fila_ruta for r in ruta_ids):
+            self._construir_calendario()  # Días o rutas nuevas: cambia la forma de la matriz
+            return
+        filas = [self._fila_ruta[int(r)] for r in ruta_ids]
+        for matriz in self._calendario.values():
+            matriz[filas] = 0 if matriz.dtype.kind == "i" else np.nan
+        self._llenar_calendario(np.isin(c["ruta_id"], ruta_ids))
+
+    def _llenar_calendario(self, seleccion):
+        c = self._columnas
+        seleccion = seleccion & (c["precio"] > 0) & (c["asientos"] != 0)
+        if not seleccion.any():
+            return
+        filas = np.array([self._fila_ruta[int(r)] for r in c["ruta_id"][seleccion]], dtype=np.int64)
+        dias = c["fecha"][seleccion].astype(np.int64) - self._dia0
+        precios = c["precio"][seleccion]
+        n_dias = self._calendario["n_viajes"].shape[1]
+        clave = filas * n_dias + dias
+        orden = np.lexsort((precios, clave))
+        clave, precios = clave[orden], precios[orden]
+        # Cada (ruta, día) es un tramo contiguo ordenado por precio
+        claves, inicios, conteos = np.unique(clave, return_index=True, return_counts=True)
+        mediana = (precios[inicios + (conteos - 1) // 2] + precios[inicios + conteos // 2]) / 2
+        fila, dia = np.divmod(claves, n_dias)
+        self._calendario["precio_min"][fila, dia] = precios[inicios]
+        self._calendario["precio_mediana"][fila, dia] = mediana
+        self._calendario["n_viajes"][fila, dia] = conteos
+
+    def calendario_precios(self, origen, destino, mes):
+        """
+        Calendario de un mes ('YYYY-MM') para una ruta: un dict por día con
+        precio_min, precio_mediana y n_viajes (None / 0 si no hay viajes) y el
+        día más barato. Se lee de matrices ya calculadas, sin tocar SQLite.
+        """
+        self.refrescar_si_cambio()
+        anio, num_mes = (int(x) for x in mes.split("-"))
+        primero = date(anio, num_mes, 1)
+        siguiente = date(anio + num_mes // 12, num_mes % 12 + 1, 1)
+        ruta_id = next((rid for rid, (o, d) in self.rutas.items() if o == origen and d == destino), None)
+        fila = self._fila_ruta.get(ruta_id)
+        dias = []
+        for n in range((siguiente - primero).days):
+            dia = primero.toordinal() - _EPOCA.toordinal() + n - self._dia0
+            con_datos = fila is not None and 0 <= dia < self._calendario["n_viajes"].shape[1] \
+                and self._calendario["n_viajes"][fila, dia] > 0
+            dias.append({
+                "fecha": date.fromordinal(primero.toordinal() + n).isoformat(),
+                "precio_min": round(float(self._calendario["precio_min"][fila, dia]), 2) if con_datos else None,
+                "precio_mediana": round(float(self._calendario["precio_mediana"][fila, dia]), 2) if con_datos else None,
+                "n_viajes": int(self._calendario["n_viajes"][fila, dia]) if con_datos else 0,
+            })
+        con_precio = [d for d in dias if d["precio_min"] is not None]
+        return {
+            "origen": origen,
+            "destino": destino,
+            "mes": mes,
+            "dias": dias,
+            "mas_barato": min(con_precio, key=lambda d: (d["precio_min"], d["fecha"]))["fecha"] if con_precio else None,
+        }
+
+    def refrescar_si_cambio(self):
+        """Comprobación barata (MAX(id)) como mucho cada `intervalo_refresco` segundos."""
+        if time.monotonic() - self._ultima_comprobacion >= self.intervalo_refresco:
+            return self.refrescar()
+        return 0
+
+    def __len__(self):
+        return len(self._columnas["viaje_id"])
+
+    # --- CONSULTAS ---
+
+    def mascara_amenidades(self, codigos):
+        """Máscara de bits (palabras uint64) para una lista de códigos de amenidad."""
+        requerida = np.zeros(self.palabras_mascara, dtype=np.uint64)
+        for codigo in codigos or ():
+            bit = self.bit_amenidad.get(codigo)
+            if bit is None:
+                return None  # Amenidad desconocida: ningún viaje la tiene
+            requerida[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return requerida
+
+    def filtrar(self, origen=None, destino=None, fecha_desde=None, fecha_hasta=None,
+                presupuesto=None, amenidades=None, asientos_min=1, hora_desde=None, hora_hasta=None):
+        """Máscara booleana de los viajes que cumplen todos los filtros."""
+        c = self._columnas
+        filtro = ~np.isnan(c["precio"])
+        if origen or destino:
+            rutas_ok = [rid for rid, (o, d) in self.rutas.items()
+                        if (not origen or o == origen) and (not destino or d == destino)]
+            filtro &= np.isin(c["ruta_id"], rutas_ok)
+        if fecha_desde:
+            filtro &= c["fecha"] >= _dias_desde_epoca(fecha_desde)
+        if fecha_hasta:
+            filtro &= c["fecha"] <= _dias_desde_epoca(fecha_hasta)
+        if presupuesto is not None:
+            filtro &= c["precio"] <= presupuesto
+        if asientos_min:
+            filtro &= c["asientos"] >= asientos_min
+        if hora_desde is not None:
+            filtro &= c["hora_salida"] >= _minutos(hora_desde)
+        if hora_hasta is not None:
+            filtro &= c["hora_salida"] <= _minutos(hora_hasta)
+        if amenidades:
+            requerida = self.mascara_amenidades(amenidades)
+            if requerida is None:
+                return np.zeros(len(self), dtype=bool)
+            filtro &= np.all((c["mascara"] & requerida) == requerida, axis=1)
+        return filtro
+
+    def puntuar(self, indices, pesos=None):
+        """Puntaje en [0, 1] (más es mejor) de los viajes en `indices`, normalizado en el subconjunto."""
+        pesos = pesos or PESOS_POR_DEFECTO
+        c = self._columnas
+
+        def _normalizar(valores, invertir):
+            # Escala min-max al subconjunto; los nulos no suman puntaje
+            valores = valores.astype(np.float64)
+            nulos = np.isnan(valores)
+            if nulos.all():
+                return np.zeros(len(valores))
+            lo, hi = np.nanmin(valores), np.nanmax(valores)
+            escala = (valores - lo) / (hi - lo) if hi > lo else np.full(len(valores), 0.5)
+            if invertir:
+                escala = 1.0 - escala
+            return np.where(nulos, 0.0, escala)
+
+        puntaje = np.zeros(len(indices), dtype=np.float64)
+        if not len(indices):
+            return puntaje
+        puntaje += pesos.get("precio", 0) * _normalizar(c["precio"][indices], invertir=True)
+        puntaje += pesos.get("duracion", 0) * _normalizar(c["duracion"][indices], invertir=True)
+        puntaje += pesos.get("rating", 0) * _normalizar(c["rating"][indices], invertir=False)
+        puntaje += pesos.get("bus_score", 0) * _normalizar(c["bus_score"][indices], invertir=False)
+        return puntaje
+
+    def recomendar(self, k=10, pesos=None, **filtros):
+        """
+        Top-k de viajes que cumplen `filtros` (ver `filtrar`), ordenados por
+        puntaje. Devuelve una lista de dicts listos para serializar.
+        """
+        self.refrescar_si_cambio()
+        indices = np.flatnonzero(self.filtrar(**filtros))
+        if not len(indices):
+            return []
+        puntaje = self.puntuar(indices, pesos)
+        # Redondeo para que el orden no dependa del ruido de float32 entre viajes empatados
+        orden = np.round(puntaje, 6)
+        if len(indices) > k:
+            # argpartition encuentra el umbral del k-ésimo; se conservan todos los
+            # empatados con él para que el desempate sea determinista
+            umbral = np.partition(orden, len(orden) - k)[len(orden) - k]
+            top = np.flatnonzero(orden >= umbral)
+        else:
+            top = np.arange(len(indices))
+        # Desempate por precio y luego viaje_id, igual que el SQL equivalente
+        top = top[np.lexsort((self._columnas["viaje_id"][indices[top]], self._columnas["precio"][indices[top]], -orden[top]))][:k]
+        return [self._como_dict(indices[i], puntaje[i]) for i in top]
+
+    def _como_dict(self, i, puntaje):
+        c = self._columnas
+        origen, destino = self.rutas.get(int(c["ruta_id"][i]), (None, None))
+        hora = int(c["hora_salida"][i])
+        fecha = date.fromordinal(_EPOCA.toordinal() + int(c["fecha"][i])).isoformat()
+        return {
+            "viaje_id": int(c["viaje_id"][i]),
+            "empresa": self.empresas.get(int(c["empresa_id"][i])),
+            "origen": origen,
+            "destino": destino,
+            "fecha_salida": fecha,
+            "hora_salida": f"{hora // 60:02d}:{hora % 60:02d}" if hora >= 0 else None,
+            "duracion_min": None if np.isnan(c["duracion"][i]) else float(c["duracion"][i]),
+            "precio_min": round(float(c["precio"][i]), 2),
+            "asientos_disponibles": int(c["asientos"][i]),
+            "rating": None if np.isnan(c["rating"][i]) else round(float(c["rating"][i]), 2),
+            "bus_score": None if np.isnan(c["bus_score"][i]) else round(float(c["bus_score"][i]), 2),
+            "puntaje": round(float(puntaje), 4),
+            "clima": self.clima(destino, fecha),
+        }
+
+    def clima(self, ciudad, fecha):
+        """
+        Clima diario de `ciudad` en `fecha` (o el mismo día un año antes, como
+        referencia histórica) desde la tabla clima: un lookup por clave primaria,
+        cacheado por el GestorBD. None si no hay datos.
+        """
+        if not ciudad or not self._hay_clima:
+            return None
+        dia = date.fromisoformat(fecha)
+        anterior = dia.replace(year=dia.year - 1, day=28 if (dia.month, dia.day) == (2, 29) else dia.day)
+        filas = self._gestor.consultar("clima_dia", (ciudad, fecha, anterior.isoformat()))
+        if not filas:
+            return None
+        return dict(zip(("fecha", "temp_max", "temp_min", "temp_prom", "precipitacion", "humedad", "condiciones", "icono"), filas[0]))
+
+_instancias = {}
+
+def obtener_recomendador(db_path=DB_PATH_POR_DEFECTO):
+    """Instancia compartida por proceso: la foto se construye una sola vez."""
+    if db_path not in _instancias:
+        _instancias[db_path] = Recomendador(db_path)
+    return _instancias[db_path]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Recomendaciones de viajes a partir de la última oferta de cada uno.")
+    parser.add_argument("--db", default=DB_PATH_POR_DEFECTO)
+    parser.add_argument("--origen")
+    parser.add_argument("--destino")
+    parser.add_argument("--desde", help="Fecha de salida mínima (YYYY-MM-DD).")
+    parser.add_argument("--hasta", help="Fecha de salida máxima (YYYY-MM-DD).")
+    parser.add_argument("--presupuesto", type=float)
+    parser.add_argument("--amenidades", type=int, nargs="*", default=None, help="Códigos de amenidad requeridos.")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--calendario", metavar="YYYY-MM", help="Muestra el calendario de precios del mes para --origen/--destino.")
+    args = parser.parse_args()
+
+    recomendador = Recomendador(args.db)
+    if args.calendario:
+        calendario = recomendador.calendario_precios(args.origen, args.destino, args.calendario)
+        print(f"📅 {args.origen} → {args.destino} | {args.calendario} | más barato: {calendario['mas_barato']}")
+        for d in calendario["dias"]:
+            if d["n_viajes"]:
+                print(f"   {d['fecha']} | mín S/ {d['precio_min']:.2f} | mediana S/ {d['precio_mediana']:.2f} | {d['n_viajes']} viajes")
+        sys.exit(0)
+    inicio = time.perf_counter()
+    resultados = recomendador.recomendar(
+        k=args.k, origen=args.origen, destino=args.destino, fecha_desde=args.desde,
+        fecha_hasta=args.hasta, presupuesto=args.presupuesto, amenidades=args.amenidades,
+    )
+    print(f"🎯 {len(resultados)} recomendaciones en {(time.perf_counter() - inicio) * 1000:.2f} ms")
+    for r in resultados:
+        print(f"   {r['puntaje']:.3f} | S/ {r['precio_min']:.2f} | {r['fecha_salida']} {r['hora_salida']} | "
+              f"{r['origen']} → {r['destino']} | {r['empresa']}")
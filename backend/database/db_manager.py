@@ -0,0 +1,419 @@
+# Contenido para: backend/database/db_manager.py
+# Capa de acceso a SQLite compartida por el loader, el esquema, el recomendador
+# y el frontend.
+#
+# - WAL: los lectores no se bloquean mientras el loader escribe (y viceversa);
+#   el dashboard puede consultar en plena carga.
+# - Un único escritor por proceso (protegido con un lock) y un pool de
+#   conexiones de sólo lectura que pueden usar los hilos de Streamlit.
+# - Consultas con nombre: el SQL vive aquí y cada conexión lo compila una sola
+#   vez gracias a la caché de sentencias de sqlite3 (`cached_statements`).
+# - Caché LRU de resultados con clave (consulta normalizada, parámetros, versión
+#   de datos). El loader incrementa version_datos en cada lote confirmado, así
+#   que una entrada nunca sobrevive a un cambio de datos.
+import re
+import queue
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DB_PATH_POR_DEFECTO = "data/processed/viajes.db"
+
+# --- PRAGMAS ---
+PRAGMAS_COMUNES = {
+    "busy_timeout": 30000,      # ms esperando un lock antes de fallar
+    "cache_size": -65536,       # 64 MB de caché de páginas por conexión
+    "mmap_size": 268435456,     # 256 MB mapeados en memoria para lecturas
+    "temp_store": "MEMORY",     # Tablas temporales (staging del loader) en RAM
+    "foreign_keys": "ON",
+}
+PRAGMAS_ESCRITURA = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",    # Con WAL es seguro ante caídas del proceso
+    "wal_autocheckpoint": 4000, # Páginas; checkpoints menos frecuentes durante cargas grandes
+}
+TAMANO_POOL_LECTURA = 4
+CACHE_MAX_ENTRADAS = 512
+CACHE_MAX_FILAS = 200000    # Cota de memoria aproximada: filas totales retenidas
+
+# --- CONSULTAS CON NOMBRE ---
+CONSULTAS = {
+    "rutas": "SELECT id, origen, destino FROM rutas ORDER BY origen, destino",
+    "empresas": "SELECT id, nombre, operator_id, rating, logo_url, bus_score FROM empresas ORDER BY nombre",
+    "amenidades": "SELECT id, codigo, descripcion FROM amenidades ORDER BY id",
+    "version_datos": "SELECT version FROM version_datos WHERE id = 1",
+    "max_historial_id": "SELECT COALESCE(MAX(id), 0) FROM historial_viajes",
+    "conteo_amenidades": "SELECT COUNT(*) FROM amenidades",
+    # Última oferta de cada viaje (viaje_ultimo_estado, mantenida por el loader)
+    "ultima_oferta": """
+        SELECT v.id, v.ruta_id, v.empresa_id, v.fecha_salida, v.hora_salida_programada,
+               v.duracion_programada_min, u.precio_min, u.asientos_disponibles,
+               e.rating, e.bus_score
+        FROM viajes v
+        JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        JOIN empresas e ON e.id = v.empresa_id
+        ORDER BY v.id
+    """,
+    "ultima_oferta_desde_historial": """
+        SELECT v.id, v.ruta_id, v.empresa_id, v.fecha_salida, v.hora_salida_programada,
+               v.duracion_programada_min, u.precio_min, u.asientos_disponibles,
+               e.rating, e.bus_score
+        FROM viajes v
+        JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        JOIN empresas e ON e.id = v.empresa_id
+        WHERE v.id IN (SELECT viaje_id FROM historial_viajes WHERE id > ?)
+        ORDER BY v.id
+    """,
+    "viaje_amenidades": "SELECT viaje_id, amenidad_id FROM viaje_amenidades",
+    "viaje_amenidades_desde_historial": """
+        SELECT viaje_id, amenidad_id FROM viaje_amenidades
+        WHERE viaje_id IN (SELECT viaje_id FROM historial_viajes WHERE id > ?)
+    """,
+    # Búsqueda de itinerarios con transbordos (backend/core/conexiones.py)
+    "conexiones": """
+        SELECT v.id, r.origen, r.destino, v.fecha_salida, v.hora_salida_programada, v.hora_llegada_programada,
+               v.duracion_programada_min, u.precio_min, u.asientos_disponibles, v.empresa_id
+        FROM viajes v
+        JOIN rutas r ON r.id = v.ruta_id
+        JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        WHERE u.precio_min > 0
+        ORDER BY v.fecha_salida, v.hora_salida_programada, v.id
+    """,
+    # Imágenes ya descargadas (image_downloader); nunca se sale a la red al renderizar
+    "imagen": """
+        SELECT hash, extension, miniatura_hash, miniatura_extension FROM imagenes WHERE tipo = ? AND clave = ?
+    """,
+    "imagenes_tipo": "SELECT clave, hash, extension, miniatura_hash, miniatura_extension FROM imagenes WHERE tipo = ?",
+    # Clima del destino el día del viaje o, si aún no existe, el mismo día del año anterior
+    "clima_dia": """
+        SELECT fecha, temp_max, temp_min, temp_prom, precipitacion, humedad, condiciones, icono
+        FROM clima WHERE ciudad = ? AND fecha IN (?, ?) ORDER BY fecha DESC LIMIT 1
+    """,
+    # Frontend
+    "viajes_ruta_fecha": """
+        SELECT v.id, e.nombre, v.fecha_salida, v.hora_salida_programada, v.hora_llegada_programada,
+               v.duracion_programada_min, v.tipo_bus, u.precio_min, u.precio_max,
+               u.asientos_disponibles, u.tiene_oferta, u.oferta_descripcion, e.rating
+        FROM viajes v
+        JOIN rutas r ON r.id = v.ruta_id
+        JOIN empresas e ON e.id = v.empresa_id
+        LEFT JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        WHERE r.origen = ? AND r.destino = ? AND v.fecha_salida BETWEEN ? AND ?
+        ORDER BY v.fecha_salida, v.hora_salida_programada
+    """,
+    "historial_viaje": """
+        SELECT fecha_snapshot, fecha_ultima_vista, precio_min, precio_max, asientos_disponibles, tiene_oferta
+        FROM historial_viajes WHERE viaje_id = ? ORDER BY fecha_snapshot
+    """,
+    "puntos_parada_viaje": """
+        SELECT p.nombre, NULLIF(p.direccion, ''), pp.fecha_hora, pp.tipo
+        FROM puntos_parada pp JOIN paradas p ON p.id = pp.parada_id
+        WHERE pp.viaje_id = ? ORDER BY pp.tipo, pp.fecha_hora
+    """,
+    "paradas": "SELECT id, nombre, NULLIF(direccion, '') FROM paradas ORDER BY nombre, direccion",
+    # BLOBs de tarifas vigentes de una ruta (decodificar con redbus_loader.tarifas)
+    "tarifas_ruta_fechas": """
+        SELECT v.id, v.fecha_salida, u.tarifas
+        FROM viajes v
+        JOIN rutas r ON r.id = v.ruta_id
+        JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        WHERE r.origen = ? AND r.destino = ? AND v.fecha_salida BETWEEN ? AND ?
+        ORDER BY v.fecha_salida, v.id
+    """,
+    # Viajes que embarcan (o desembarcan) en una parada entre dos fechas; usa idx_puntos_parada_parada
+    "viajes_desde_parada": """
+        SELECT v.id, r.origen, r.destino, e.nombre, pp.fecha_hora, v.tipo_bus, u.precio_min, u.asientos_disponibles
+        FROM puntos_parada pp
+        JOIN viajes v ON v.id = pp.viaje_id
+        JOIN rutas r ON r.id = v.ruta_id
+        JOIN empresas e ON e.id = v.empresa_id
+        LEFT JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        WHERE pp.parada_id = ? AND pp.tipo = ? AND pp.fecha_hora BETWEEN ? AND ?
+        ORDER BY pp.fecha_hora
+    """,
+    "amenidades_viaje": """
+        SELECT a.codigo, a.descripcion FROM viaje_amenidades va JOIN amenidades a ON a.id = va.amenidad_id
+        WHERE va.viaje_id = ? ORDER BY a.descripcion
+    """,
+    # Dashboard: sólo resumen_ruta_fecha_empresa (lo mantiene el loader por claves tocadas).
+    # Columnas comunes: n_viajes, precio_min, precio_prom, precio_max, duracion_prom, proporcion_oferta, asientos
+    "dashboard_por_ruta": """
+        SELECT r.origen, r.destino,
+               SUM(s.n_viajes), MIN(s.precio_min), SUM(s.suma_precio) / NULLIF(SUM(s.n_con_precio), 0), MAX(s.precio_max),
+               SUM(s.suma_duracion) / NULLIF(SUM(s.n_con_duracion), 0), SUM(s.n_con_oferta) * 1.0 / SUM(s.n_viajes),
+               SUM(s.asientos_disponibles)
+        FROM resumen_ruta_fecha_empresa s JOIN rutas r ON r.id = s.ruta_id
+        WHERE s.fecha_salida BETWEEN ? AND ?
+        GROUP BY s.ruta_id ORDER BY r.origen, r.destino
+    """,
+    "dashboard_por_empresa": """
+        SELECT e.nombre,
+               SUM(s.n_viajes), MIN(s.precio_min), SUM(s.suma_precio) / NULLIF(SUM(s.n_con_precio), 0), MAX(s.precio_max),
+               SUM(s.suma_duracion) / NULLIF(SUM(s.n_con_duracion), 0), SUM(s.n_con_oferta) * 1.0 / SUM(s.n_viajes),
+               SUM(s.asientos_disponibles)
+        FROM resumen_ruta_fecha_empresa s
+        JOIN rutas r ON r.id = s.ruta_id
+        JOIN empresas e ON e.id = s.empresa_id
+        WHERE r.origen = ? AND r.destino = ? AND s.fecha_salida BETWEEN ? AND ?
+        GROUP BY s.empresa_id ORDER BY 4
+    """,
+    "dashboard_por_fecha": """
+        SELECT s.fecha_salida,
+               SUM(s.n_viajes), MIN(s.precio_min), SUM(s.suma_precio) / NULLIF(SUM(s.n_con_precio), 0), MAX(s.precio_max),
+               SUM(s.suma_duracion) / NULLIF(SUM(s.n_con_duracion), 0), SUM(s.n_con_oferta) * 1.0 / SUM(s.n_viajes),
+               SUM(s.asientos_disponibles)
+        FROM resumen_ruta_fecha_empresa s JOIN rutas r ON r.id = s.ruta_id
+        WHERE r.origen = ? AND r.destino = ? AND s.fecha_salida BETWEEN ? AND ?
+        GROUP BY s.fecha_salida ORDER BY s.fecha_salida
+    """,
+    "dashboard_rango_fechas": "SELECT MIN(fecha_salida), MAX(fecha_salida) FROM resumen_ruta_fecha_empresa",
+}
+
+def aplicar_pragmas(conn, pragmas):
+    for nombre, valor in pragmas.items():
+        conn.execute(f"PRAGMA {nombre} = {valor};")
+
+def conectar(db_path, solo_lectura=False, **kwargs):
+    """
+    Abre una conexión configurada. Las de escritura activan WAL (persistente en
+    el archivo); las de sólo lectura usan `mode=ro` y nunca toman el lock de escritura.
+    """
+    kwargs.setdefault("cached_statements", max(128, 2 * len(CONSULTAS)))
+    kwargs.setdefault("timeout", 30)
+    if solo_lectura:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, **kwargs)
+        aplicar_pragmas(conn, PRAGMAS_COMUNES)
+        conn.execute("PRAGMA query_only = ON;")
+    else:
+        conn = sqlite3.connect(db_path, **kwargs)
+        aplicar_pragmas(conn, PRAGMAS_ESCRITURA)
+        aplicar_pragmas(conn, PRAGMAS_COMUNES)
+    return conn
+
+def incrementar_version_datos(cursor):
+    """Lo llama el loader dentro de cada transacción que cambia datos."""
+    cursor.execute("UPDATE version_datos SET version = version + 1, actualizado_en = CURRENT_TIMESTAMP WHERE id = 1")
+
+_ESPACIOS = re.compile(r"\s+")
+
+def normalizar_sql(sql):
+    """Misma consulta con distinto formato -> misma clave de caché."""
+    return _ESPACIOS.sub(" ", sql).strip().rstrip(";")
+
+class CacheResultados:
+    """
+    LRU de resultados acotada por número de entradas y por filas totales.
+    Las entradas llevan la versión de datos con la que se calcularon; al ver una
+    versión más nueva se descartan todas las anteriores. Una versión más vieja
+    (un lector cuya transacción empezó antes del último commit) no toca la caché.
+    """
+
+    def __init__(self, max_entradas=CACHE_MAX_ENTRADAS, max_filas=CACHE_MAX_FILAS):
+        self.max_entradas = max_entradas
+        self.max_filas = max_filas
+        self._entradas = OrderedDict()
+        self._filas = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = self.expulsiones = self.invalidaciones = 0
+
+    def _sincronizar_version(self, version):
+        """Avanza a `version` si es más nueva. Devuelve False si es más vieja que la vigente."""
+        if version == self._version:
+            return True
+        if version is not None and self._version is not None and version < self._version:
+            return False
+        if self._entradas:
+            self.invalidaciones += len(self._entradas)
+        self._entradas.clear()
+        self._filas = 0
+        self._version = version
+        return True
+
+    def obtener(self, clave, version):
+        with self._lock:
+            if not self._sincronizar_version(version):
+                self.fallos += 1
+                return None
+            filas = self._entradas.get(clave)
+            if filas is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return filas
+
+    def guardar(self, clave, version, filas):
+        filas = tuple(filas)
+        if len(filas) > self.max_filas:
+            return filas  # No cabe: se devuelve sin cachear
+        with self._lock:
+            if not self._sincronizar_version(version):
+                return filas  # Otro hilo ya vio datos más nuevos: no se mezcla
+            if clave in self._entradas:
+                self._filas -= len(self._entradas.pop(clave))
+            self._entradas[clave] = filas
+            self._filas += len(filas)
+            while len(self._entradas) > self.max_entradas or self._filas > self.max_filas:
+                _, expulsada = self._entradas.popitem(last=False)
+                self._filas -= len(expulsada)
+                self.expulsiones += 1
+        return filas
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._filas = 0
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "expulsiones": self.expulsiones,
+                "invalidaciones": self.invalidaciones,
+                "entradas": len(self._entradas),
+                "filas": self._filas,
+                "version_datos": self._version,
+            }
+
+class GestorBD:
+    """
+    Punto de acceso a una base: un escritor y un pool de lectores.
+
+        gestor = obtener_gestor("data/processed/viajes.db")
+        filas = gestor.consultar("viajes_ruta_fecha", ("Lima", "Cusco", "2025-07-01", "2025-07-31"))
+        with gestor.escritura() as conn:
+            conn.execute(...)
+    """
+
+    def __init__(self, db_path=DB_PATH_POR_DEFECTO, tamano_pool=TAMANO_POOL_LECTURA, cache=None):
+        self.db_path = str(db_path)
+        self.tamano_pool = tamano_pool
+        self.cache = cache if cache is not None else CacheResultados()
+        self._lectores = queue.LifoQueue()
+        self._lectores_creados = 0
+        self._lock_pool = threading.Lock()
+        self._escritor = None
+        self._lock_escritura = threading.RLock()
+
+    # --- LECTURA ---
+
+    def _tomar_lector(self):
+        try:
+            return self._lectores.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock_pool:
+            if self._lectores_creados < self.tamano_pool:
+                self._lectores_creados += 1
+                crear = True
+            else:
+                crear = False
+        if crear:
+            try:
+                return conectar(self.db_path, solo_lectura=True, check_same_thread=False)
+            except sqlite3.Error:
+                with self._lock_pool:
+                    self._lectores_creados -= 1
+                raise
+        return self._lectores.get()  # Pool lleno: espera a que otro hilo devuelva una
+
+    @contextmanager
+    def lectura(self):
+        """Presta una conexión de sólo lectura del pool (segura entre hilos, una por vez)."""
+        conn = self._tomar_lector()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._lectores.put(conn)
+
+    def consultar(self, nombre, parametros=(), cache=True):
+        """
+        Ejecuta una consulta con nombre de CONSULTAS y devuelve todas las filas
+        (una tupla compartida con la caché: no debe modificarse).
+        """
+        return self.consultar_sql(CONSULTAS[nombre], parametros, cache)
+
+    def consultar_uno(self, nombre, parametros=()):
+        with self.lectura() as conn:
+            return conn.execute(CONSULTAS[nombre], parametros).fetchone()
+
+    def consultar_sql(self, sql, parametros=(), cache=True):
+        """Como `consultar` pero con SQL arbitrario (de sólo lectura)."""
+        with self.lectura() as conn:
+            if not cache:
+                return conn.execute(sql, parametros).fetchall()
+            # Versión y consulta dentro de la misma transacción de lectura: con WAL
+            # ambas ven la misma foto de la base, así que la clave es exacta
+            conn.execute("BEGIN")
+            version = self._version_datos(conn)
+            clave = (normalizar_sql(sql), tuple(parametros))
+            filas = self.cache.obtener(clave, version)
+            if filas is None:
+                filas = self.cache.guardar(clave, version, conn.execute(sql, parametros).fetchall())
+            return filas
+
+    @staticmethod
+    def _version_datos(conn):
+        try:
+            fila = conn.execute(CONSULTAS["version_datos"]).fetchone()
+        except sqlite3.OperationalError:
+            return None  # Base sin version_datos (esquema anterior): la caché no se invalida sola
+        return fila[0] if fila else None
+
+    def version_datos(self):
+        with self.lectura() as conn:
+            return self._version_datos(conn)
+
+    # --- ESCRITURA ---
+
+    def conexion_escritura(self):
+        """La conexión de escritura del proceso (se crea al primer uso)."""
+        with self._lock_escritura:
+            if self._escritor is None:
+                self._escritor = conectar(self.db_path, check_same_thread=False)
+            return self._escritor
+
+    @contextmanager
+    def escritura(self):
+        """Transacción en el escritor único: BEGIN IMMEDIATE, commit o rollback."""
+        with self._lock_escritura:
+            conn = self.conexion_escritura()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def cerrar(self):
+        with self._lock_escritura:
+            if self._escritor is not None:
+                self._escritor.close()
+                self._escritor = None
+        while True:
+            try:
+                self._lectores.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock_pool:
+            self._lectores_creados = 0
+
+_gestores = {}
+_gestores_lock = threading.Lock()
+
+def obtener_gestor(db_path=DB_PATH_POR_DEFECTO, tamano_pool=TAMANO_POOL_LECTURA):
+    """Un GestorBD por archivo y por proceso."""
+    with _gestores_lock:
+        if db_path not in _gestores:
+            _gestores[db_path] = GestorBD(db_path, tamano_pool)
+            logging.debug(f"GestorBD creado para {db_path}")
+        return _gestores[db_path]
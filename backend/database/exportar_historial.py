@@ -0,0 +1,234 @@
+# Contenido para: backend/database/exportar_historial.py
+# Exporta historial_viajes (unido a viajes, rutas y empresas) a archivos
+# columnares para análisis: Parquet o Arrow IPC (Feather v2, se puede mapear en
+# memoria), particionados al estilo Hive por ruta y mes de salida:
+#
+#   <destino>/ruta_id=3/mes=2025-07/part-0000012001-0000015872.parquet
+#
+# La exportación es incremental: se recuerda el mayor historial_viajes.id ya
+# exportado (_estado_exportacion.json en el propio directorio) y cada pasada sólo
+# agrega archivos nuevos con las filas posteriores. Las filas ya exportadas no se
+# reescriben; tras un --compactar-historial o para refrescar fecha_ultima_vista
+# (modo CDC) hay que exportar con --completo.
+#
+# Uso: python -m backend.database.exportar_historial [--formato arrow] [--completo]
+#      Lectura: abrir_dataset("data/processed/historial_parquet").to_table(filter=...)
+import os
+import json
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import pyarrow as pa  # Opcional: sólo lo necesita esta exportación
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+from .db_manager import conectar, DB_PATH_POR_DEFECTO
+
+DESTINO_POR_DEFECTO = "data/processed/historial_parquet"
+ARCHIVO_ESTADO = "_estado_exportacion.json"
+EXTENSIONES = {"parquet": ".parquet", "arrow": ".arrow"}
+FILAS_POR_LECTURA = 50000
+
+# (columna, tipo Arrow); el orden es el del SELECT
+COLUMNAS = (
+    ("historial_id", "int64"), ("viaje_id", "int64"),
+    ("fecha_snapshot", "timestamp"), ("fecha_ultima_vista", "timestamp"),
+    ("precio_min", "float64"), ("precio_max", "float64"), ("asientos_disponibles", "int32"),
+    ("tiene_oferta", "bool"), ("oferta_descripcion", "string"),
+    ("precio_original_min", "float64"), ("precio_descuento_min", "float64"),
+    ("fecha_salida", "date"), ("hora_salida_programada", "string"), ("hora_llegada_programada", "string"),
+    ("duracion_programada_min", "int32"), ("tipo_bus", "string"),
+    ("es_ac", "bool"), ("es_seater", "bool"), ("es_sleeper", "bool"), ("asientos_totales", "int32"),
+    ("origen", "dictionary"), ("destino", "dictionary"),
+    ("empresa_id", "int32"), ("empresa", "dictionary"),
+)
+
+SQL_EXPORTACION = """
+    SELECT v.ruta_id, substr(v.fecha_salida, 1, 7) AS mes,
+           h.id, h.viaje_id, h.fecha_snapshot, COALESCE(h.fecha_ultima_vista, h.fecha_snapshot),
+           h.precio_min, h.precio_max, h.asientos_disponibles, h.tiene_oferta, h.oferta_descripcion,
+           h.precio_original_min, h.precio_descuento_min,
+           v.fecha_salida, v.hora_salida_programada, v.hora_llegada_programada,
+           v.duracion_programada_min, v.tipo_bus, v.es_ac, v.es_seater, v.es_sleeper, v.asientos_totales,
+           r.origen, r.destino, v.empresa_id, e.nombre
+    FROM historial_viajes h
+    JOIN viajes v ON v.id = h.viaje_id
+    JOIN rutas r ON r.id = v.ruta_id
+    JOIN empresas e ON e.id = v.empresa_id
+    WHERE h.id > ? AND h.id <= ?
+    ORDER BY v.ruta_id, mes, h.id
+"""
+
+def _requerir_pyarrow():
+    if pa is None:
+        raise RuntimeError("La exportación columnar necesita pyarrow (pip install pyarrow).")
+
+def _tipo_arrow(tipo):
+    return {
+        "int64": pa.int64(), "int32": pa.int32(), "float64": pa.float64(), "bool": pa.bool_(),
+        "string": pa.string(), "timestamp": pa.timestamp("s"), "date": pa.date32(),
+        "dictionary": pa.dictionary(pa.int32(), pa.string()),
+    }[tipo]
+
+def esquema():
+    _requerir_pyarrow()
+    return pa.schema([(nombre, _tipo_arrow(tipo)) for nombre, tipo in COLUMNAS])
+
+def _columna(valores, tipo):
+    """Lista de valores de SQLite -> array Arrow del tipo indicado."""
+    if tipo == "timestamp":
+        return pc.strptime(pa.array(valores, pa.string()), format="%Y-%m-%d %H:%M:%S", unit="s")
+    if tipo == "date":
+        return pc.strptime(pa.array(valores, pa.string()), format="%Y-%m-%d", unit="s").cast(pa.date32())
+    if tipo == "dictionary":
+        return pa.array(valores, pa.string()).dictionary_encode().cast(_tipo_arrow(tipo))
+    if tipo == "bool":
+        valores = [None if v is None else bool(v) for v in valores]
+    return pa.array(valores, _tipo_arrow(tipo))
+
+def _tabla(filas):
+    """Filas (sin las dos columnas de partición) -> pyarrow.Table con el esquema fijo."""
+    columnas = list(zip(*filas))
+    return pa.Table.from_arrays([_columna(list(valores), tipo) for valores, (_, tipo) in zip(columnas, COLUMNAS)],
+                                schema=esquema())
+
+def _escribir(tabla, ruta, formato):
+    """Escribe a un temporal y renombra: un archivo a medias nunca queda con nombre válido."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    if formato == "parquet":
+        pq.write_table(tabla, temporal, compression="zstd")
+    else:
+        # Sin compresión: así el archivo se puede mapear en memoria y leer sin copias
+        feather.write_feather(tabla, temporal, compression="uncompressed")
+    os.replace(temporal, ruta)
+
+def _nombre_parte(desde, hasta, formato):
+    return f"part-{desde:010d}-{hasta:010d}{EXTENSIONES[formato]}"
+
+def leer_estado(destino):
+    ruta = Path(destino) / ARCHIVO_ESTADO
+    if not ruta.exists():
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _guardar_estado(destino, estado):
+    ruta = Path(destino) / ARCHIVO_ESTADO
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporal, ruta)
+
+def _limpiar_huerfanos(destino, ultimo_id):
+    """Borra partes de una pasada interrumpida (empiezan después de lo ya confirmado)."""
+    borrados = 0
+    for archivo in Path(destino).glob("ruta_id=*/mes=*/part-*"):
+        try:
+            desde = int(archivo.name.split("-")[1])
+        except (IndexError, ValueError):
+            continue
+        if archivo.name.endswith(".tmp") or desde > ultimo_id:
+            archivo.unlink()
+            borrados += 1
+    if borrados:
+        logging.warning(f"⚠️ {borrados} archivos de una exportación interrumpida eliminados.")
+
+def exportar_historial(db_path=DB_PATH_POR_DEFECTO, destino=DESTINO_POR_DEFECTO, formato="parquet", completo=False):
+    """
+    Agrega al directorio `destino` las filas de historial_viajes con id mayor que
+    el último exportado, un archivo por (ruta, mes) tocado. Devuelve
+    (filas exportadas, archivos escritos).
+    """
+    _requerir_pyarrow()
+    if formato not in EXTENSIONES:
+        raise ValueError(f"Formato no soportado: {formato} (usa {', '.join(EXTENSIONES)})")
+    destino = Path(destino)
+    if completo:
+        # Sólo lo que escribe esta exportación: el directorio puede contener otras cosas
+        for archivo in destino.glob("ruta_id=*/mes=*/part-*"):
+            archivo.unlink()
+        (destino / ARCHIVO_ESTADO).unlink(missing_ok=True)
+
+    estado = leer_estado(destino)
+    if estado and estado["formato"] != formato:
+        raise ValueError(f"{destino} ya contiene una exportación en {estado['formato']}; usa --completo para cambiarla.")
+    ultimo_id = estado["ultimo_historial_id"] if estado else 0
+    destino.mkdir(parents=True, exist_ok=True)
+    _limpiar_huerfanos(destino, ultimo_id)
+
+    conn = conectar(db_path, solo_lectura=True)
+    filas_exportadas, archivos = 0, 0
+    try:
+        # Una transacción de lectura: el tope y las filas salen de la misma foto aunque el loader esté escribiendo
+        conn.execute("BEGIN")
+        tope = conn.execute("SELECT COALESCE(MAX(id), 0) FROM historial_viajes").fetchone()[0]
+        if tope <= ultimo_id:
+            logging.info(f"Nada nuevo que exportar (último historial_id exportado: {ultimo_id}).")
+            return 0, 0
+
+        cursor = conn.execute(SQL_EXPORTACION, (ultimo_id, tope))
+        particion, pendientes = None, []
+
+        def _volcar():
+            ruta = destino / f"ruta_id={particion[0]}" / f"mes={particion[1]}" / _nombre_parte(ultimo_id + 1, tope, formato)
+            _escribir(_tabla(pendientes), ruta, formato)
+
+        while True:
+            bloque = cursor.fetchmany(FILAS_POR_LECTURA)
+            if not bloque:
+                break
+            for fila in bloque:
+                if fila[:2] != particion:
+                    if pendientes:
+                        _volcar()
+                        archivos += 1
+                        filas_exportadas += len(pendientes)
+                    particion, pendientes = fila[:2], []
+                pendientes.append(fila[2:])
+        if pendientes:
+            _volcar()
+            archivos += 1
+            filas_exportadas += len(pendientes)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    _guardar_estado(destino, {
+        "formato": formato,
+        "ultimo_historial_id": tope,
+        "filas": (estado["filas"] if estado else 0) + filas_exportadas,
+        "exportado_en": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    logging.info(f"✅ Exportadas {filas_exportadas} filas de historial en {archivos} archivos ({formato}) → {destino}")
+    return filas_exportadas, archivos
+
+def abrir_dataset(destino=DESTINO_POR_DEFECTO):
+    """
+    pyarrow.dataset sobre la exportación, con ruta_id y mes como columnas de
+    partición (los filtros por ellas sólo abren los archivos necesarios).
+    """
+    _requerir_pyarrow()
+    import pyarrow.dataset as ds
+    estado = leer_estado(destino)
+    formato = "ipc" if estado and estado["formato"] == "arrow" else "parquet"
+    particion = ds.partitioning(pa.schema([("ruta_id", pa.int32()), ("mes", pa.string())]), flavor="hive")
+    # _estado_exportacion.json empieza por "_", así que dataset() ya lo ignora
+    return ds.dataset(destino, format=formato, partitioning=particion)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Exporta historial_viajes a Parquet/Arrow particionado por ruta y mes.")
+    parser.add_argument("--db", default=DB_PATH_POR_DEFECTO)
+    parser.add_argument("--destino", default=DESTINO_POR_DEFECTO)
+    parser.add_argument("--formato", choices=sorted(EXTENSIONES), default="parquet",
+                        help="parquet (comprimido, más compacto) o arrow (IPC/Feather v2 sin comprimir, se mapea en memoria).")
+    parser.add_argument("--completo", action="store_true", help="Borra la exportación existente y la rehace entera.")
+    args = parser.parse_args()
+    exportar_historial(args.db, args.destino, args.formato, args.completo)
@@ -0,0 +1,52 @@
+# Contenido para: backend/database/redbus_loader/consultas.py
+# Consultas sobre el historial de precios. Con el loader en modo CDC cada fila
+# de historial_viajes es un estado que rige desde fecha_snapshot hasta el
+# siguiente snapshot del viaje (y se confirmó por última vez en
+# fecha_ultima_vista), así que el precio en un instante es la última fila con
+# fecha_snapshot <= instante: un lookup sobre el índice único (viaje_id, fecha_snapshot).
+
+COLUMNAS_HISTORIAL = (
+    "fecha_snapshot", "fecha_ultima_vista", "precio_min", "precio_max", "asientos_disponibles",
+    "tiene_oferta", "oferta_descripcion", "precio_original_min", "precio_descuento_min", "tarifas",
+)
+
+def estado_en_instante(cursor, viaje_id, instante):
+    """
+    Estado del viaje vigente en `instante` ('YYYY-MM-DD HH:MM:SS') como dict, o
+    None si todavía no se había observado. `confirmado` es False cuando el
+    instante cae después de la última observación: el estado es el último
+    conocido, pero no se vio en ese momento.
+    """
+    cursor.execute(f"""
+        SELECT {", ".join(COLUMNAS_HISTORIAL)}
+        FROM historial_viajes
+        WHERE viaje_id = ? AND fecha_snapshot <= ?
+        ORDER BY fecha_snapshot DESC
+        LIMIT 1
+    """, (viaje_id, instante))
+    fila = cursor.fetchone()
+    if fila is None:
+        return None
+    estado = dict(zip(COLUMNAS_HISTORIAL, fila))
+    estado["confirmado"] = instante <= (estado["fecha_ultima_vista"] or estado["fecha_snapshot"])
+    return estado
+
+def precio_en_instante(cursor, viaje_id, instante):
+    """Atajo: precio_min vigente en `instante`, o None."""
+    estado = estado_en_instante(cursor, viaje_id, instante)
+    return estado["precio_min"] if estado else None
+
+def serie_precios(cursor, viaje_id):
+    """
+    Intervalos de estado del viaje: [(desde, hasta, precio_min, asientos_disponibles)],
+    donde `hasta` es el siguiente cambio o, en el último tramo, fecha_ultima_vista.
+    """
+    cursor.execute("""
+        SELECT fecha_snapshot,
+               COALESCE(LEAD(fecha_snapshot) OVER (ORDER BY fecha_snapshot), fecha_ultima_vista, fecha_snapshot),
+               precio_min, asientos_disponibles
+        FROM historial_viajes
+        WHERE viaje_id = ?
+        ORDER BY fecha_snapshot
+    """, (viaje_id,))
+    return cursor.fetchall()
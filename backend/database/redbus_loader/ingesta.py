@@ -0,0 +1,104 @@
+# Contenido para: backend/database/redbus_loader/ingesta.py
+# Etapa de ingesta del loader: recorre los archivos de forma perezosa, los parsea
+# con el backend JSON más rápido disponible y se queda sólo con los campos que
+# el loader realmente consume.
+import os
+import json
+import hashlib
+import logging
+
+try:
+    import orjson  # Opcional: 3-5x más rápido que json para estas respuestas
+except ImportError:
+    orjson = None
+
+BACKEND_JSON = "orjson" if orjson else "json"
+
+# --- CAMPOS QUE CONSUME EL LOADER ---
+CAMPOS_INVENTARIO = (
+    "travelsName", "operatorId", "totalRatings", "numberOfReviews", "busScore", "operatorLogoPath",
+    "departureTime", "arrivalTime", "journeyDurationMin", "serviceName", "busType",
+    "isAc", "isSeater", "isSleeper", "totalSeats", "availableSeats", "fareList",
+    "operatorOfferCampaign", "amenities", "bpData", "dpData",
+)
+CAMPOS_PUNTO_PARADA = ("Name", "Address", "BpFullTime")
+CAMPOS_RESPUESTA = ("parentSrcCityName", "parentDstCityName", "fechaScrapeo")
+
+def parsear_json(contenido):
+    """Parsea bytes JSON con orjson si está instalado y con json en caso contrario."""
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido.decode("utf-8"))
+
+def _proyectar_puntos(puntos):
+    if not isinstance(puntos, list):
+        return puntos
+    return [{c: p[c] for c in CAMPOS_PUNTO_PARADA if c in p} if isinstance(p, dict) else p for p in puntos]
+
+def proyectar_inventario(inv_item):
+    """Reduce un item de `inventories` a los campos que usa el loader."""
+    if not isinstance(inv_item, dict):
+        return inv_item
+    proyectado = {c: inv_item[c] for c in CAMPOS_INVENTARIO if c in inv_item}
+    for clave in ("bpData", "dpData"):
+        if clave in proyectado:
+            proyectado[clave] = _proyectar_puntos(proyectado[clave])
+    return proyectado
+
+def proyectar_respuesta(json_data):
+    """
+    Reduce una respuesta de SearchV4Results a un dict compacto con la misma forma
+    que el original en lo que respecta al loader (cabecera + inventories).
+    """
+    if not isinstance(json_data, dict):
+        return None
+    proyectada = {c: json_data[c] for c in CAMPOS_RESPUESTA if c in json_data}
+    meta = json_data.get("metaData")
+    if isinstance(meta, dict):
+        proyectada["metaData"] = {"busLogoBaseUrl": meta.get("busLogoBaseUrl", "")}
+    inventarios = json_data.get("inventories")
+    proyectada["inventories"] = [proyectar_inventario(i) for i in inventarios] if isinstance(inventarios, list) else inventarios
+    return proyectada
+
+def leer_respuesta_proyectada(ruta_archivo):
+    """
+    Lee el archivo una sola vez y devuelve (respuesta proyectada o None, sha256 del
+    contenido). El dict completo se descarta en cuanto termina la proyección.
+    """
+    try:
+        with open(ruta_archivo, "rb") as f:
+            contenido = f.read()
+    except OSError as e:
+        logging.error(f"Error cargando {ruta_archivo}: {e}")
+        return None, None
+    hash_contenido = hashlib.sha256(contenido).hexdigest()
+    try:
+        return proyectar_respuesta(parsear_json(contenido)), hash_contenido
+    except (UnicodeDecodeError, ValueError) as e:
+        logging.error(f"Error cargando {ruta_archivo}: {e}")
+        return None, hash_contenido
+
+def iterar_archivos_json(carpeta_raiz, extensiones=(".json",)):
+    """
+    Recorre `carpeta_raiz` con os.scandir y va entregando las rutas de los archivos
+    con alguna de `extensiones` (por defecto los .json; el loader pide también los
+    shards .jsonl.gz) carpeta por carpeta, sin construir la lista completa. El
+    orden es estable (alfabético) para que los ids asignados no dependan del
+    sistema de archivos.
+    """
+    pendientes = [carpeta_raiz]
+    while pendientes:
+        carpeta = pendientes.pop()
+        subcarpetas, archivos = [], []
+        try:
+            with os.scandir(carpeta) as entradas:
+                for entrada in entradas:
+                    if entrada.is_dir(follow_symlinks=False):
+                        subcarpetas.append(entrada.path)
+                    elif entrada.name.lower().endswith(extensiones):
+                        archivos.append(entrada.path)
+        except OSError as e:
+            logging.error(f"No se pudo recorrer {carpeta}: {e}")
+            continue
+        yield from sorted(archivos)
+        pendientes.extend(sorted(subcarpetas, reverse=True))
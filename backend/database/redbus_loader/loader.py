@@ -1,16 +1,29 @@
 # Contenido CORREGIDO para: backend/database/redbus_loader/loader.py
 import os
+import time
 import sqlite3
+import hashlib
 import logging
 from datetime import datetime
+from collections import deque
+from contextlib import nullcontext
+from itertools import islice, count
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
+from .ingesta import leer_respuesta_proyectada, iterar_archivos_json, parsear_json, proyectar_respuesta, BACKEND_JSON
+from ...scraping.shared.shards import iterar_miembros, es_shard, EXTENSION_SHARD
+from ...scraping.shared.metricas import metricas, perfilar
+from ..db_manager import conectar, incrementar_version_datos
+from .resumenes import actualizar_resumenes, reconstruir_resumenes
+from .tarifas import codificar_tarifas
 from .utils import (
-    cargar_json_desde_archivo, obtener_origen_destino, limpiar_precios, limpiar_tipo_bus,
+    obtener_fecha_scrapeo, obtener_origen_destino, limpiar_precios, precios_validos, limpiar_tipo_bus,
     extraer_puntos_parada, extraer_codigos_amenidades, generar_url_logo,
     validar_entero_o_none, validar_flotante_o_none, validar_formato_datetime,
-    AMENIDADES_MAP, cache_empresas_por_nombre, cache_empresas_por_operator_id,
-    cache_rutas, cache_amenidades_por_codigo
+    precargar_caches, vaciar_caches, clave_parada, AMENIDADES_MAP, cache_empresas_por_nombre, cache_empresas_por_operator_id,
+    cache_rutas, cache_amenidades_por_codigo, cache_paradas
 )
 
 LOTE_TAMANO = 200
@@ -22,140 +35,693 @@ def registrar_error(cursor, archivo, mensaje, excepcion_detalle=None):
     except sqlite3.Error as e:
         logging.error(f"Error al registrar error en BD: {e}")
 
-def procesar_lote_archivos(cursor, lote_archivos):
-    for ruta_archivo in lote_archivos:
-        json_data = cargar_json_desde_archivo(ruta_archivo)
-        if not json_data or not isinstance(json_data.get("inventories"), list):
-            registrar_error(cursor, ruta_archivo, "JSON inválido o sin inventario.")
+def normalizar_respuesta(json_data, url_scrapeada, fecha_snapshot):
+    """
+    Reduce una respuesta de RedBus (ya proyectada a los campos que usamos) a
+    tuplas listas para insertar. No toca la base de datos, por lo que puede
+    ejecutarse en los procesos del pool.
+    Cada item es [empresa, viaje, snapshot, puntos, amenidades]; las partes que no
+    llegaron a calcularse (item descartado o con error) quedan en None.
+    En `tiempos` viajan los segundos de cada etapa del parseo, porque en el pool
+    no hay acceso al registro de métricas del proceso principal.
+    """
+    inicio = time.perf_counter()
+    registro = {
+        "archivo": url_scrapeada, "url_scrapeada": url_scrapeada, "fecha_snapshot": fecha_snapshot,
+        "valido": False, "sin_cambios": False, "manifiesto": None, "items": [], "errores": [], "tiempos": {}
+    }
+    if not json_data or not isinstance(json_data.get("inventories"), list):
+        return registro
+
+    origen_ciudad, destino_ciudad = obtener_origen_destino(json_data)
+    bus_logo_base_url = json_data.get("metaData", {}).get("busLogoBaseUrl", "")
+    items, errores = [], []
+    segundos_fechas = 0.0
+
+    for inv_item in json_data["inventories"]:
+        item = [None, None, None, None, None]
+        try:
+            # --- EMPRESA ---
+            nombre_empresa = str(inv_item.get("travelsName", "")).strip()
+            operator_id = validar_entero_o_none(inv_item.get("operatorId"))
+            if not nombre_empresa and operator_id is None: continue
+            item[0] = (
+                nombre_empresa, operator_id, validar_flotante_o_none(inv_item.get("totalRatings")),
+                generar_url_logo(bus_logo_base_url, inv_item.get("operatorLogoPath")),
+                validar_entero_o_none(inv_item.get("totalRatings")),
+                validar_entero_o_none(inv_item.get("numberOfReviews")),
+                validar_flotante_o_none(inv_item.get("busScore"))
+            )
+
+            # --- VIAJE (sin empresa_id ni ruta_id, que se resuelven al escribir) ---
+            inicio_fechas = time.perf_counter()
+            hora_salida_str = validar_formato_datetime(inv_item.get("departureTime"))
+            hora_llegada_str = validar_formato_datetime(inv_item.get("arrivalTime"))
+            segundos_fechas += time.perf_counter() - inicio_fechas
+            if not hora_salida_str or not hora_llegada_str: continue
+
+            # validar_formato_datetime ya devuelve 'YYYY-MM-DD HH:MM:SS' canónico
+            item[1] = (
+                hora_salida_str[:10], hora_salida_str[11:], hora_llegada_str[11:],
+                validar_entero_o_none(inv_item.get("journeyDurationMin")),
+                limpiar_tipo_bus(inv_item.get("serviceName"), inv_item.get("busType")),
+                inv_item.get("isAc"), inv_item.get("isSeater"), inv_item.get("isSleeper"),
+                validar_entero_o_none(inv_item.get("totalSeats"))
+            )
+
+            # --- SNAPSHOT (sin viaje_id, fecha_snapshot ni url) ---
+            fare_list = inv_item.get("fareList", [])
+            precio_min, precio_max = limpiar_precios(fare_list)
+            asientos_disp = validar_entero_o_none(inv_item.get("availableSeats"))
+            oferta_info = (inv_item.get("operatorOfferCampaign") or {}).get("CmpgList", [{}])[0]
+            precios_orig = oferta_info.get("OriginalPrices", [])
+            precios_desc = oferta_info.get("DiscountedPrices", [])
+            item[2] = (
+                precio_min, precio_max, asientos_disp, bool(oferta_info), oferta_info.get("CampaignDesc"),
+                min(precios_orig) if precios_orig else None,
+                min(precios_desc) if precios_desc else None,
+                codificar_tarifas(precios_validos(fare_list))
+            )
+
+            # --- DATOS RELACIONADOS ---
+            item[3] = extraer_puntos_parada(inv_item, "embarque") + extraer_puntos_parada(inv_item, "desembarque")
+            item[4] = extraer_codigos_amenidades(inv_item.get("amenities", []))
+        except (TypeError, IndexError, ValueError) as e:
+            errores.append(("Error procesando un item de inventario.", str(e)))
+        items.append(item)
+
+    registro.update({"valido": True, "ruta": (origen_ciudad, destino_ciudad), "items": items, "errores": errores,
+                     "descartados": len(json_data["inventories"]) - len(items)})
+    registro["tiempos"] = {"normalizacion": time.perf_counter() - inicio, "validacion_fechas": segundos_fechas}
+    return registro
+
+def normalizar_archivo(ruta_archivo, previo=None):
+    """
+    Normaliza un api_response_YYYYMMDD.json. `previo` es su entrada del manifiesto
+    (tamano, mtime, hash); si el contenido no cambió sólo se refresca esa entrada.
+    """
+    url_scrapeada = ruta_archivo.replace("\\", "/")
+    try:
+        estado = os.stat(ruta_archivo)
+    except OSError as e:
+        logging.error(f"Error cargando {ruta_archivo}: {e}")
+        return normalizar_respuesta(None, url_scrapeada, None)
+
+    inicio = time.perf_counter()
+    json_data, hash_contenido = leer_respuesta_proyectada(ruta_archivo)
+    lectura = time.perf_counter() - inicio
+    fecha_snapshot = obtener_fecha_scrapeo(json_data, estado.st_mtime)
+    if previo and previo[2] == hash_contenido:
+        registro = normalizar_respuesta(None, url_scrapeada, fecha_snapshot)
+        registro["sin_cambios"] = True
+    else:
+        registro = normalizar_respuesta(json_data, url_scrapeada, fecha_snapshot)
+    if hash_contenido is not None:
+        registro["manifiesto"] = (url_scrapeada, estado.st_size, estado.st_mtime, hash_contenido, fecha_snapshot)
+    registro["tiempos"]["lectura"] = lectura
+    return registro
+
+def normalizar_shard(ruta_shard, previo=None):
+    """
+    Normaliza los registros de un shard .jsonl.gz. Como los shards sólo crecen por
+    append, si el prefijo ya cargado (según el manifiesto) no cambió se procesan
+    sólo los registros nuevos. Devuelve una lista de registros; la entrada del
+    manifiesto viaja en el último.
+    """
+    url_base = ruta_shard.replace("\\", "/")
+    inicio = time.perf_counter()
+    try:
+        estado = os.stat(ruta_shard)
+        with open(ruta_shard, "rb") as f:
+            contenido = f.read()
+    except OSError as e:
+        logging.error(f"Error cargando {ruta_shard}: {e}")
+        return [normalizar_respuesta(None, url_base, None)]
+
+    desde = 0
+    if previo and previo[0] <= len(contenido) and hashlib.sha256(contenido[:previo[0]]).hexdigest() == previo[2]:
+        desde = previo[0]
+
+    registros, fin = [], desde
+    for offset, longitud, datos in iterar_miembros(contenido, desde):
+        fin = offset + longitud
+        # La lectura de cada registro incluye descomprimir su miembro gzip (y, en el
+        # primero, leer el archivo)
+        try:
+            linea = parsear_json(datos)
+        except ValueError as e:
+            logging.error(f"Registro ilegible en {ruta_shard} (offset {offset}): {e}")
+            linea = {}
+        respuesta = proyectar_respuesta(linea.get("respuesta")) if isinstance(linea, dict) else None
+        url_scrapeada = f"{url_base}#{linea.get('fecha') if isinstance(linea, dict) else offset}"
+        lectura = time.perf_counter() - inicio
+        registros.append(normalizar_respuesta(respuesta, url_scrapeada, obtener_fecha_scrapeo(respuesta, estado.st_mtime)))
+        registros[-1]["tiempos"]["lectura"] = lectura
+        inicio = time.perf_counter()
+
+    if not registros:
+        registros.append(normalizar_respuesta(None, url_base, None))
+        registros[-1]["sin_cambios"] = True
+    registros[-1]["manifiesto"] = (url_base, fin, estado.st_mtime, hashlib.sha256(contenido[:fin]).hexdigest(), None)
+    return registros
+
+def normalizar_fuente(fuente):
+    """Normaliza un JSON o un shard; `fuente` es (ruta, entrada previa del manifiesto o None)."""
+    ruta, previo = fuente
+    if es_shard(ruta):
+        return normalizar_shard(ruta, previo)
+    return [normalizar_archivo(ruta, previo)]
+
+# --- TABLAS DE STAGING (temporales, viven sólo en la conexión del escritor) ---
+# `seq` conserva el orden de aparición de los items para que los ids asignados
+# coincidan con los de una inserción fila por fila.
+STAGING_DDL = (
+    """
+    CREATE TEMP TABLE IF NOT EXISTS stg_viajes (
+        seq INTEGER PRIMARY KEY,
+        viaje_id INTEGER,
+        empresa_id INTEGER NOT NULL,
+        ruta_id INTEGER NOT NULL,
+        fecha_salida TEXT NOT NULL,
+        hora_salida_programada TEXT NOT NULL,
+        hora_llegada_programada TEXT NOT NULL,
+        duracion_programada_min INTEGER,
+        tipo_bus TEXT,
+        es_ac BOOLEAN,
+        es_seater BOOLEAN,
+        es_sleeper BOOLEAN,
+        asientos_totales INTEGER,
+        con_snapshot BOOLEAN NOT NULL,
+        fecha_snapshot TEXT,
+        precio_min REAL,
+        precio_max REAL,
+        asientos_disponibles INTEGER,
+        tiene_oferta BOOLEAN,
+        oferta_descripcion TEXT,
+        precio_original_min REAL,
+        precio_descuento_min REAL,
+        tarifas BLOB,
+        url_scrapeada TEXT,
+        sin_cambio BOOLEAN NOT NULL DEFAULT 0,
+        duplicado BOOLEAN NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TEMP TABLE IF NOT EXISTS stg_puntos_parada (
+        seq INTEGER NOT NULL,
+        parada_id INTEGER NOT NULL,
+        fecha_hora TEXT,
+        tipo TEXT NOT NULL
+    );
+    """,
+    """
+    CREATE TEMP TABLE IF NOT EXISTS stg_viaje_amenidades (
+        seq INTEGER NOT NULL,
+        amenidad_id INTEGER NOT NULL
+    );
+    """,
+)
+
+def crear_tablas_staging(cursor):
+    for ddl in STAGING_DDL:
+        cursor.execute(ddl)
+
+def _contar_filas(cursor, tabla):
+    """Suma a las métricas las filas que insertó la última sentencia (execute o executemany)."""
+    metricas.contar("loader_filas_insertadas_total", max(cursor.rowcount, 0), tabla=tabla)
+
+def _empresa_id_en_cache(nombre_empresa, operator_id):
+    return cache_empresas_por_operator_id.get(operator_id) or cache_empresas_por_nombre.get((nombre_empresa, operator_id))
+
+def _resolver_dimensiones(cursor, lote_registros):
+    """
+    Inserta de una sola vez las rutas, empresas, amenidades y paradas que aún no
+    están en caché y vuelve a cargar las cachés con una única consulta.
+    """
+    rutas_nuevas, empresas_nuevas, amenidades_nuevas, paradas_nuevas = {}, {}, {}, {}
+    for registro in lote_registros:
+        if not registro["valido"] or registro["sin_cambios"]:
+            continue
+        if registro["ruta"] not in cache_rutas:
+            rutas_nuevas.setdefault(registro["ruta"], None)
+        for empresa_data, viaje_data, snapshot_data, puntos, codigos_amenidades in registro["items"]:
+            if empresa_data is None:
+                continue
+            if _empresa_id_en_cache(empresa_data[0], empresa_data[1]) is None:
+                empresas_nuevas.setdefault((empresa_data[0], empresa_data[1]), empresa_data)
+            for codigo in codigos_amenidades or []:
+                if codigo not in cache_amenidades_por_codigo:
+                    amenidades_nuevas.setdefault(codigo, AMENIDADES_MAP.get(codigo, f"Amenidad Desconocida {codigo}"))
+            for nombre, direccion, _, _ in puntos or []:
+                clave = clave_parada(nombre, direccion)
+                if clave not in cache_paradas:
+                    paradas_nuevas.setdefault(clave, None)
+
+    if not (rutas_nuevas or empresas_nuevas or amenidades_nuevas or paradas_nuevas):
+        return
+    if rutas_nuevas:
+        cursor.executemany("INSERT OR IGNORE INTO rutas (origen, destino) VALUES (?, ?)", list(rutas_nuevas))
+        _contar_filas(cursor, "rutas")
+    if empresas_nuevas:
+        cursor.executemany("INSERT OR IGNORE INTO empresas (nombre, operator_id, rating, logo_url, total_ratings, number_of_reviews, bus_score) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           list(empresas_nuevas.values()))
+        _contar_filas(cursor, "empresas")
+    if amenidades_nuevas:
+        cursor.executemany("INSERT OR IGNORE INTO amenidades (codigo, descripcion) VALUES (?, ?)", list(amenidades_nuevas.items()))
+        _contar_filas(cursor, "amenidades")
+    if paradas_nuevas:
+        cursor.executemany("INSERT OR IGNORE INTO paradas (nombre, direccion) VALUES (?, ?)", list(paradas_nuevas))
+        _contar_filas(cursor, "paradas")
+    precargar_caches(cursor)
+
+def _cargar_staging(cursor, lote_registros):
+    """Vuelca el lote a las tablas temporales con un executemany por tabla."""
+    filas_viajes, filas_puntos, filas_amenidades, filas_errores = [], [], [], []
+    seq = 0
+    for registro in lote_registros:
+        if registro["sin_cambios"]:
+            continue
+        ruta_archivo = registro["archivo"]
+        fecha_error = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if not registro["valido"]:
+            filas_errores.append((ruta_archivo, "JSON inválido o sin inventario.", str(None), fecha_error))
             continue
 
-        origen_ciudad, destino_ciudad = obtener_origen_destino(json_data)
-        fecha_snapshot = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        url_scrapeada = ruta_archivo.replace("\\", "/")
-        bus_logo_base_url = json_data.get("metaData", {}).get("busLogoBaseUrl", "")
+        fecha_snapshot = registro["fecha_snapshot"]
+        url_scrapeada = registro["url_scrapeada"]
+        ruta_id = cache_rutas[registro["ruta"]]
 
-        ruta_tupla = (origen_ciudad, destino_ciudad)
-        if ruta_tupla not in cache_rutas:
-            cursor.execute("INSERT OR IGNORE INTO rutas (origen, destino) VALUES (?, ?)", ruta_tupla)
-            cursor.execute("SELECT id FROM rutas WHERE origen = ? AND destino = ?", ruta_tupla)
-            cache_rutas[ruta_tupla] = cursor.fetchone()[0]
-        ruta_id = cache_rutas[ruta_tupla]
+        for empresa_data, viaje_data, snapshot_data, puntos, codigos_amenidades in registro["items"]:
+            if empresa_data is None or viaje_data is None:
+                continue
+            seq += 1
+            empresa_id = _empresa_id_en_cache(empresa_data[0], empresa_data[1])
+            if snapshot_data is None:
+                filas_viajes.append((seq, empresa_id, ruta_id, *viaje_data, False, None, *([None] * 8), None))
+                continue
+            filas_viajes.append((seq, empresa_id, ruta_id, *viaje_data, True, fecha_snapshot, *snapshot_data, url_scrapeada))
+            filas_puntos.extend((seq, cache_paradas[clave_parada(nombre, direccion)], fecha_hora, tipo)
+                                for nombre, direccion, fecha_hora, tipo in puntos or [])
+            filas_amenidades.extend((seq, cache_amenidades_por_codigo[c]) for c in codigos_amenidades or [])
 
-        for inv_item in json_data["inventories"]:
-            try:
-                # --- LÓGICA DE EMPRESAS (UPSERT) ---
-                nombre_empresa = str(inv_item.get("travelsName", "")).strip()
-                operator_id = validar_entero_o_none(inv_item.get("operatorId"))
-                if not nombre_empresa and operator_id is None: continue
-
-                empresa_id = cache_empresas_por_operator_id.get(operator_id) or cache_empresas_por_nombre.get((nombre_empresa, operator_id))
-                if empresa_id is None:
-                    empresa_data = (
-                        nombre_empresa, operator_id, validar_flotante_o_none(inv_item.get("totalRatings")),
-                        generar_url_logo(bus_logo_base_url, inv_item.get("operatorLogoPath")),
-                        validar_entero_o_none(inv_item.get("totalRatings")),
-                        validar_entero_o_none(inv_item.get("numberOfReviews")),
-                        validar_flotante_o_none(inv_item.get("busScore"))
-                    )
-                    cursor.execute("INSERT OR IGNORE INTO empresas (nombre, operator_id, rating, logo_url, total_ratings, number_of_reviews, bus_score) VALUES (?, ?, ?, ?, ?, ?, ?)", empresa_data)
-                    if operator_id:
-                        cursor.execute("SELECT id FROM empresas WHERE operator_id = ?", (operator_id,))
-                    else:
-                        cursor.execute("SELECT id FROM empresas WHERE nombre = ?", (nombre_empresa,))
-                    empresa_id = cursor.fetchone()[0]
-                    if operator_id: cache_empresas_por_operator_id[operator_id] = empresa_id
-                    cache_empresas_por_nombre[(nombre_empresa, operator_id)] = empresa_id
-
-                # --- LÓGICA DE VIAJES Y HISTORIAL ---
-                hora_salida_str = validar_formato_datetime(inv_item.get("departureTime"))
-                hora_llegada_str = validar_formato_datetime(inv_item.get("arrivalTime"))
-                if not hora_salida_str or not hora_llegada_str: continue
-
-                dt_salida = datetime.strptime(hora_salida_str, "%Y-%m-%d %H:%M:%S")
-                
-                # 1. OBTENER O CREAR EL VIAJE EN EL CATÁLOGO
-                viaje_estatico_data = (
-                    empresa_id, ruta_id, dt_salida.strftime("%Y-%m-%d"),
-                    dt_salida.strftime("%H:%M:%S"),
-                    datetime.strptime(hora_llegada_str, "%Y-%m-%d %H:%M:%S").strftime("%H:%M:%S"),
-                    validar_entero_o_none(inv_item.get("journeyDurationMin")),
-                    limpiar_tipo_bus(inv_item.get("serviceName"), inv_item.get("busType")),
-                    inv_item.get("isAc"), inv_item.get("isSeater"), inv_item.get("isSleeper"),
-                    validar_entero_o_none(inv_item.get("totalSeats"))
+        filas_errores.extend((ruta_archivo, mensaje, str(detalle), fecha_error) for mensaje, detalle in registro["errores"])
+
+    cursor.executemany("INSERT INTO stg_viajes (seq, empresa_id, ruta_id, fecha_salida, hora_salida_programada, hora_llegada_programada, duracion_programada_min, tipo_bus, es_ac, es_seater, es_sleeper, asientos_totales, con_snapshot, fecha_snapshot, precio_min, precio_max, asientos_disponibles, tiene_oferta, oferta_descripcion, precio_original_min, precio_descuento_min, tarifas, url_scrapeada) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", filas_viajes)
+    cursor.executemany("INSERT INTO stg_puntos_parada (seq, parada_id, fecha_hora, tipo) VALUES (?, ?, ?, ?)", filas_puntos)
+    cursor.executemany("INSERT INTO stg_viaje_amenidades (seq, amenidad_id) VALUES (?, ?)", filas_amenidades)
+    if filas_errores:
+        cursor.executemany("INSERT INTO errores_procesamiento (archivo, mensaje, detalle_excepcion, fecha_error) VALUES (?, ?, ?, ?)", filas_errores)
+        _contar_filas(cursor, "errores_procesamiento")
+
+# Columnas que definen un cambio de estado para el modo CDC
+COLUMNAS_CDC = ("precio_min", "precio_max", "asientos_disponibles", "tiene_oferta", "precio_descuento_min", "tarifas")
+
+def _marcar_snapshots_sin_cambio(cursor):
+    """
+    Modo CDC: marca los snapshots del lote que repiten el estado anterior del
+    viaje. El estado anterior de cada snapshot es el snapshot previo del lote o,
+    para el primero, viaje_ultimo_estado. Los snapshots más antiguos que el
+    último guardado (backfill) no se marcan nunca: se insertan tal cual.
+    """
+    iguales = " AND ".join(f"{c} IS prev_{c}" for c in COLUMNAS_CDC)
+    # Un viaje puede venir repetido en la misma respuesta: como en el INSERT OR
+    # IGNORE del historial, sólo cuenta el primero (por seq) de cada snapshot
+    cursor.execute("""
+        UPDATE stg_viajes SET duplicado = 1 WHERE seq IN (
+            SELECT seq FROM (
+                SELECT seq, ROW_NUMBER() OVER (PARTITION BY viaje_id, fecha_snapshot ORDER BY seq) AS n
+                FROM stg_viajes WHERE con_snapshot
+            ) WHERE n > 1
+        )
+    """)
+    cursor.execute(f"""
+        UPDATE stg_viajes SET sin_cambio = 1 WHERE seq IN (
+            SELECT seq FROM (
+                SELECT seq, {", ".join(COLUMNAS_CDC)},
+                       LAG(fecha_snapshot) OVER w AS prev_fecha,
+                       {", ".join(f"LAG({c}) OVER w AS prev_{c}" for c in COLUMNAS_CDC)}
+                FROM (
+                    SELECT s.seq, s.viaje_id, s.fecha_snapshot, {", ".join("s." + c for c in COLUMNAS_CDC)}
+                    FROM stg_viajes s
+                    LEFT JOIN viaje_ultimo_estado u ON u.viaje_id = s.viaje_id
+                    WHERE s.con_snapshot AND NOT s.duplicado AND s.fecha_snapshot > COALESCE(u.fecha_snapshot, '')
+                    UNION ALL
+                    SELECT NULL, u.viaje_id, u.fecha_snapshot, {", ".join("u." + c for c in COLUMNAS_CDC)}
+                    FROM viaje_ultimo_estado u
+                    WHERE u.viaje_id IN (SELECT viaje_id FROM stg_viajes WHERE con_snapshot)
                 )
-                cursor.execute("INSERT OR IGNORE INTO viajes (empresa_id, ruta_id, fecha_salida, hora_salida_programada, hora_llegada_programada, duracion_programada_min, tipo_bus, es_ac, es_seater, es_sleeper, asientos_totales) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", viaje_estatico_data)
-                
-                viaje_fue_creado = cursor.lastrowid is not None
-
-                cursor.execute("SELECT id FROM viajes WHERE empresa_id=? AND ruta_id=? AND fecha_salida=? AND hora_salida_programada=? AND tipo_bus=?",
-                               (viaje_estatico_data[0], viaje_estatico_data[1], viaje_estatico_data[2], viaje_estatico_data[3], viaje_estatico_data[6]))
-                viaje_id = cursor.fetchone()[0]
-
-                # 2. REGISTRAR EL SNAPSHOT EN EL HISTORIAL
-                precio_min, precio_max = limpiar_precios(inv_item.get("fareList", []))
-                asientos_disp = validar_entero_o_none(inv_item.get("availableSeats"))
-                
-                # --- ESTA ES LA LÍNEA CORREGIDA ---
-                oferta_info = (inv_item.get("operatorOfferCampaign") or {}).get("CmpgList", [{}])[0]
-                
-                tiene_oferta = bool(oferta_info)
-                oferta_desc = oferta_info.get("CampaignDesc")
-                precios_orig = oferta_info.get("OriginalPrices", [])
-                precios_desc = oferta_info.get("DiscountedPrices", [])
-                precio_orig_min = min(precios_orig) if precios_orig else None
-                precio_desc_min = min(precios_desc) if precios_desc else None
-
-                snapshot_data = (viaje_id, fecha_snapshot, precio_min, precio_max, asientos_disp, tiene_oferta, oferta_desc, precio_orig_min, precio_desc_min, url_scrapeada)
-                cursor.execute("INSERT OR IGNORE INTO historial_viajes (viaje_id, fecha_snapshot, precio_min, precio_max, asientos_disponibles, tiene_oferta, oferta_descripcion, precio_original_min, precio_descuento_min, url_scrapeada) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", snapshot_data)
-
-                # 3. PROCESAR DATOS RELACIONADOS SOLO SI EL VIAJE ES NUEVO
-                if viaje_fue_creado:
-                    # Puntos de parada
-                    puntos = extraer_puntos_parada(inv_item, "embarque") + extraer_puntos_parada(inv_item, "desembarque")
-                    if puntos:
-                        cursor.executemany("INSERT OR IGNORE INTO puntos_parada (viaje_id, nombre, direccion, fecha_hora, tipo) VALUES (?, ?, ?, ?, ?)",
-                                           [(viaje_id, *p) for p in puntos])
-                    # Amenidades
-                    codigos_amenidades = extraer_codigos_amenidades(inv_item.get("amenities", []))
-                    for codigo in codigos_amenidades:
-                        if codigo not in cache_amenidades_por_codigo:
-                            desc = AMENIDADES_MAP.get(codigo, f"Amenidad Desconocida {codigo}")
-                            cursor.execute("INSERT OR IGNORE INTO amenidades (codigo, descripcion) VALUES (?, ?)", (codigo, desc))
-                            cursor.execute("SELECT id FROM amenidades WHERE codigo = ?", (codigo,))
-                            cache_amenidades_por_codigo[codigo] = cursor.fetchone()[0]
-                        amenidad_id = cache_amenidades_por_codigo[codigo]
-                        cursor.execute("INSERT OR IGNORE INTO viaje_amenidades (viaje_id, amenidad_id) VALUES (?, ?)", (viaje_id, amenidad_id))
-
-            except (TypeError, IndexError, sqlite3.Error, ValueError) as e:
-                registrar_error(cursor, ruta_archivo, "Error procesando un item de inventario.", e)
-
-def cargar_datos_desde_carpeta(carpeta_raiz_json, db_path):
+                WINDOW w AS (PARTITION BY viaje_id ORDER BY fecha_snapshot, seq)
+            )
+            WHERE seq IS NOT NULL AND prev_fecha IS NOT NULL AND {iguales}
+        )
+    """)
+
+def _extender_ultima_vista(cursor):
+    """
+    Modo CDC: en lugar de insertar los snapshots repetidos, extiende
+    fecha_ultima_vista de la fila de historial que ya tenía ese estado (el
+    snapshot guardado inmediatamente anterior).
+    """
+    cursor.execute("""
+        UPDATE historial_viajes
+        SET fecha_ultima_vista = MAX(COALESCE(historial_viajes.fecha_ultima_vista, historial_viajes.fecha_snapshot), r.ultima)
+        FROM (
+            SELECT (
+                SELECT h.id FROM historial_viajes h
+                WHERE h.viaje_id = s.viaje_id AND h.fecha_snapshot < s.fecha_snapshot
+                ORDER BY h.fecha_snapshot DESC LIMIT 1
+            ) AS historial_id, MAX(s.fecha_snapshot) AS ultima
+            FROM stg_viajes s
+            WHERE s.sin_cambio
+            GROUP BY historial_id
+        ) AS r
+        WHERE historial_viajes.id = r.historial_id
+    """)
+    cursor.execute("""
+        UPDATE viaje_ultimo_estado SET fecha_ultima_vista = h.fecha_ultima_vista
+        FROM historial_viajes h
+        WHERE h.id = viaje_ultimo_estado.historial_id
+          AND viaje_ultimo_estado.viaje_id IN (SELECT viaje_id FROM stg_viajes WHERE sin_cambio)
+    """)
+
+def _aplicar_staging(cursor, cdc=False):
+    """
+    Resuelve claves e inserta los hechos del lote con sentencias por conjuntos.
+    Con `cdc=True` sólo se guardan los snapshots que cambian el estado del viaje.
+    """
+    # 1. Catálogo de viajes
+    with metricas.cronometro("loader_aplicar_segundos", paso="viajes"):
+        cursor.execute("""
+            INSERT OR IGNORE INTO viajes (empresa_id, ruta_id, fecha_salida, hora_salida_programada, hora_llegada_programada, duracion_programada_min, tipo_bus, es_ac, es_seater, es_sleeper, asientos_totales)
+            SELECT empresa_id, ruta_id, fecha_salida, hora_salida_programada, hora_llegada_programada, duracion_programada_min, tipo_bus, es_ac, es_seater, es_sleeper, asientos_totales
+            FROM stg_viajes ORDER BY seq
+        """)
+        _contar_filas(cursor, "viajes")
+        cursor.execute("""
+            UPDATE stg_viajes SET viaje_id = (
+                SELECT v.id FROM viajes v
+                WHERE v.empresa_id = stg_viajes.empresa_id AND v.ruta_id = stg_viajes.ruta_id
+                  AND v.fecha_salida = stg_viajes.fecha_salida AND v.hora_salida_programada = stg_viajes.hora_salida_programada
+                  AND v.tipo_bus = stg_viajes.tipo_bus
+            )
+        """)
+    # 2. Snapshots
+    with metricas.cronometro("loader_aplicar_segundos", paso="historial"):
+        if cdc:
+            _marcar_snapshots_sin_cambio(cursor)
+        cursor.execute("""
+            INSERT OR IGNORE INTO historial_viajes (viaje_id, fecha_snapshot, fecha_ultima_vista, precio_min, precio_max, asientos_disponibles, tiene_oferta, oferta_descripcion, precio_original_min, precio_descuento_min, tarifas, url_scrapeada)
+            SELECT viaje_id, fecha_snapshot, fecha_snapshot, precio_min, precio_max, asientos_disponibles, tiene_oferta, oferta_descripcion, precio_original_min, precio_descuento_min, tarifas, url_scrapeada
+            FROM stg_viajes WHERE con_snapshot AND NOT sin_cambio AND NOT duplicado ORDER BY seq
+        """)
+        _contar_filas(cursor, "historial_viajes")
+        if cdc:
+            _extender_ultima_vista(cursor)
+    with metricas.cronometro("loader_aplicar_segundos", paso="ultimo_estado"):
+        actualizar_ultimo_estado(cursor)
+    with metricas.cronometro("loader_aplicar_segundos", paso="resumenes"):
+        actualizar_resumenes(cursor)
+    # 3. Datos relacionados
+    with metricas.cronometro("loader_aplicar_segundos", paso="relacionados"):
+        # Un punto por (viaje, tipo, hora, nombre de parada), como antes de la dimensión
+        # paradas: si la misma terminal llega con otra dirección gana la primera vista
+        cursor.execute("""
+            INSERT OR IGNORE INTO puntos_parada (viaje_id, parada_id, fecha_hora, tipo)
+            SELECT c.viaje_id, c.parada_id, c.fecha_hora, c.tipo FROM (
+                SELECT s.viaje_id, p.parada_id, p.fecha_hora, p.tipo, d.nombre, p.rowid AS orden,
+                       ROW_NUMBER() OVER (PARTITION BY s.viaje_id, p.tipo, p.fecha_hora, d.nombre ORDER BY p.rowid) AS n
+                FROM stg_puntos_parada p JOIN stg_viajes s ON s.seq = p.seq JOIN paradas d ON d.id = p.parada_id
+            ) c
+            WHERE c.n = 1 AND NOT EXISTS (
+                SELECT 1 FROM puntos_parada pp JOIN paradas d ON d.id = pp.parada_id
+                WHERE pp.viaje_id = c.viaje_id AND pp.tipo = c.tipo AND pp.fecha_hora = c.fecha_hora AND d.nombre = c.nombre
+            )
+            ORDER BY c.orden
+        """)
+        _contar_filas(cursor, "puntos_parada")
+        cursor.execute("""
+            INSERT OR IGNORE INTO viaje_amenidades (viaje_id, amenidad_id)
+            SELECT s.viaje_id, a.amenidad_id
+            FROM stg_viaje_amenidades a JOIN stg_viajes s ON s.seq = a.seq ORDER BY a.rowid
+        """)
+        _contar_filas(cursor, "viaje_amenidades")
+    cursor.execute("DELETE FROM stg_puntos_parada")
+    cursor.execute("DELETE FROM stg_viaje_amenidades")
+    cursor.execute("DELETE FROM stg_viajes")
+
+# --- ÚLTIMO ESTADO POR VIAJE ---
+
+_COLUMNAS_ESTADO = "fecha_ultima_vista, precio_min, precio_max, asientos_disponibles, tiene_oferta, oferta_descripcion, precio_original_min, precio_descuento_min, tarifas"
+
+def actualizar_ultimo_estado(cursor):
+    """
+    Lleva a viaje_ultimo_estado los snapshots del lote que son más recientes que
+    el guardado. Lee las filas ya insertadas en historial_viajes (no el staging),
+    así que ante snapshots duplicados queda la misma fila que conservó el historial.
+    """
+    cursor.execute(f"""
+        INSERT INTO viaje_ultimo_estado (viaje_id, historial_id, fecha_snapshot, {_COLUMNAS_ESTADO})
+        SELECT h.viaje_id, h.id, h.fecha_snapshot, {", ".join("h." + c for c in _COLUMNAS_ESTADO.split(", "))}
+        FROM stg_viajes s
+        JOIN historial_viajes h ON h.viaje_id = s.viaje_id AND h.fecha_snapshot = s.fecha_snapshot
+        WHERE s.con_snapshot
+        ORDER BY h.fecha_snapshot, h.id
+        ON CONFLICT(viaje_id) DO UPDATE SET
+            historial_id = excluded.historial_id, fecha_snapshot = excluded.fecha_snapshot,
+            {", ".join(f"{c} = excluded.{c}" for c in _COLUMNAS_ESTADO.split(", "))}
+        WHERE excluded.fecha_snapshot > viaje_ultimo_estado.fecha_snapshot
+    """)
+
+def reconstruir_ultimo_estado(cursor):
+    """Rehace viaje_ultimo_estado desde historial_viajes (bases existentes o tras borrados)."""
+    cursor.execute("DELETE FROM viaje_ultimo_estado")
+    cursor.execute(f"""
+        INSERT INTO viaje_ultimo_estado (viaje_id, historial_id, fecha_snapshot, {_COLUMNAS_ESTADO})
+        SELECT viaje_id, id, fecha_snapshot, {_COLUMNAS_ESTADO}
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY viaje_id ORDER BY fecha_snapshot DESC, id DESC) AS n
+            FROM historial_viajes
+        )
+        WHERE n = 1
+    """)
+    filas = cursor.rowcount
+    reconstruir_resumenes(cursor)
+    incrementar_version_datos(cursor)
+    return filas
+
+def compactar_historial(cursor):
+    """
+    Lleva un historial_viajes existente al formato CDC: cada racha de snapshots
+    consecutivos con el mismo estado queda en su primera fila, con
+    fecha_ultima_vista igual a la última vez que se vio. Devuelve las filas borradas.
+    """
+    distinto = " OR ".join(f"{c} IS NOT LAG({c}) OVER w" for c in COLUMNAS_CDC)
+    cursor.execute("DROP TABLE IF EXISTS temp.tmp_rachas")
+    cursor.execute(f"""
+        CREATE TEMP TABLE tmp_rachas AS
+        SELECT id, vista, FIRST_VALUE(id) OVER (PARTITION BY viaje_id, racha ORDER BY fecha_snapshot, id) AS representante
+        FROM (
+            SELECT id, viaje_id, fecha_snapshot, vista,
+                   SUM(cambia) OVER (PARTITION BY viaje_id ORDER BY fecha_snapshot, id ROWS UNBOUNDED PRECEDING) AS racha
+            FROM (
+                SELECT id, viaje_id, fecha_snapshot, COALESCE(fecha_ultima_vista, fecha_snapshot) AS vista,
+                       CASE WHEN LAG(id) OVER w IS NULL OR {distinto} THEN 1 ELSE 0 END AS cambia
+                FROM historial_viajes
+                WINDOW w AS (PARTITION BY viaje_id ORDER BY fecha_snapshot, id)
+            )
+        )
+    """)
+    cursor.execute("""
+        UPDATE historial_viajes SET fecha_ultima_vista = r.vista
+        FROM (SELECT representante, MAX(vista) AS vista FROM tmp_rachas GROUP BY representante) AS r
+        WHERE historial_viajes.id = r.representante
+    """)
+    cursor.execute("DELETE FROM historial_viajes WHERE id IN (SELECT id FROM tmp_rachas WHERE id <> representante)")
+    borradas = cursor.rowcount
+    cursor.execute("DROP TABLE temp.tmp_rachas")
+    reconstruir_ultimo_estado(cursor)
+    return borradas
+
+def procesar_lote_registros(cursor, lote_registros, cdc=False):
+    """
+    Escribe un lote de registros normalizados. Las dimensiones se resuelven con
+    las cachés precargadas y los hechos pasan por tablas de staging, de modo que
+    el lote cuesta un puñado de sentencias en lugar de varias por item.
+    """
+    observar_registros(lote_registros)
+    with metricas.cronometro("loader_lote_segundos", etapa="dimensiones"):
+        _resolver_dimensiones(cursor, lote_registros)
+    with metricas.cronometro("loader_lote_segundos", etapa="staging"):
+        _cargar_staging(cursor, lote_registros)
+    with metricas.cronometro("loader_lote_segundos", etapa="aplicar"):
+        _aplicar_staging(cursor, cdc)
+    with metricas.cronometro("loader_lote_segundos", etapa="manifiesto"):
+        actualizar_manifiesto(cursor, lote_registros)
+        incrementar_version_datos(cursor)
+
+def observar_registros(lote_registros):
+    """
+    Pasa a las métricas lo que trajeron los registros normalizados: tiempos de
+    parseo medidos en el pool, estados, inventarios, items descartados y errores
+    por categoría (los mismos que van a errores_procesamiento).
+    """
+    for registro in lote_registros:
+        for etapa, segundos in registro.get("tiempos", {}).items():
+            metricas.observar("loader_archivo_segundos", segundos, etapa=etapa)
+        if registro["sin_cambios"]:
+            metricas.contar("loader_registros_total", estado="sin_cambios")
+        elif not registro["valido"]:
+            metricas.contar("loader_registros_total", estado="invalido")
+            metricas.contar("loader_errores_total", categoria="json_invalido")
+        else:
+            metricas.contar("loader_registros_total", estado="nuevo")
+            metricas.contar("loader_inventarios_total", len(registro["items"]) + registro["descartados"])
+            metricas.contar("loader_items_descartados_total", registro["descartados"])
+            if registro["errores"]:
+                metricas.contar("loader_errores_total", len(registro["errores"]), categoria="item_inventario")
+
+# --- MANIFIESTO (carga incremental) ---
+
+def cargar_manifiesto(cursor):
+    """
+    Devuelve {ruta: (tamano, mtime, hash)} de los archivos ya cargados. En los
+    shards `tamano` y `hash` corresponden al prefijo ya cargado.
+    """
+    cursor.execute("SELECT ruta, tamano, mtime, hash FROM archivos_cargados")
+    return {ruta: (tamano, mtime, hash_) for ruta, tamano, mtime, hash_ in cursor.fetchall()}
+
+def actualizar_manifiesto(cursor, lote_registros):
+    """Marca los archivos del lote como cargados, dentro de la misma transacción que sus datos."""
+    fecha_carga = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.executemany("""
+        INSERT INTO archivos_cargados (ruta, tamano, mtime, hash, fecha_snapshot, fecha_carga) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ruta) DO UPDATE SET tamano = excluded.tamano, mtime = excluded.mtime, hash = excluded.hash,
+            fecha_snapshot = excluded.fecha_snapshot, fecha_carga = excluded.fecha_carga
+    """, [(*r["manifiesto"], fecha_carga) for r in lote_registros if r["manifiesto"]])
+
+def filtrar_archivos_pendientes(archivos, manifiesto):
+    """
+    Descarta (de forma perezosa) los archivos cuyo tamaño y mtime coinciden con el
+    manifiesto y entrega (ruta, entrada previa o None) para el resto. Los que
+    cambiaron se vuelven a leer; si su contenido resulta igual, sólo se refresca
+    su entrada.
+    """
+    for ruta_archivo in archivos:
+        previo = manifiesto.get(ruta_archivo.replace("\\", "/"))
+        if previo:
+            try:
+                estado = os.stat(ruta_archivo)
+            except OSError:
+                continue
+            if (estado.st_size, estado.st_mtime) == previo[:2]:
+                continue
+        yield ruta_archivo, previo
+
+def _iterar_lotes_normalizados(fuentes, workers):
+    """
+    Produce lotes con los registros normalizados de hasta LOTE_TAMANO fuentes, en
+    el mismo orden que `fuentes`, que puede ser un iterador perezoso. Todos los
+    registros de una fuente caen en el mismo lote (y transacción) que su entrada
+    del manifiesto. Con workers > 1 el parseo corre en un pool de procesos con a
+    lo sumo 2 * LOTE_TAMANO fuentes en vuelo, mientras el proceso principal,
+    único escritor de SQLite, inserta el lote anterior.
+    """
+    fuentes = iter(fuentes)
+    if workers <= 1:
+        while True:
+            lote = [r for fuente in islice(fuentes, LOTE_TAMANO) for r in normalizar_fuente(fuente)]
+            if not lote:
+                return
+            yield lote
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        en_vuelo = deque(pool.submit(normalizar_fuente, f) for f in islice(fuentes, 2 * LOTE_TAMANO))
+        lote, fuentes_en_lote = [], 0
+        while en_vuelo:
+            lote.extend(en_vuelo.popleft().result())
+            fuentes_en_lote += 1
+            siguiente = next(fuentes, None)
+            if siguiente is not None:
+                en_vuelo.append(pool.submit(normalizar_fuente, siguiente))
+            if fuentes_en_lote == LOTE_TAMANO:
+                yield lote
+                lote, fuentes_en_lote = [], 0
+        if lote:
+            yield lote
+
+def cargar_datos_desde_carpeta(carpeta_raiz_json, db_path, workers=1, forzar=False, cdc=False,
+                               metricas_dir=None, perfilar_lote=None):
+    """
+    Carga incremental de la carpeta. Las métricas `loader_*` se reinician al
+    empezar; con `metricas_dir` se exportan al terminar (loader.prom y un JSON
+    por corrida). Con `perfilar_lote=N` el lote N (0 = el primero) corre bajo
+    cProfile, incluida la espera por su parseo; con workers > 1 el parseo
+    ocurre en otros procesos y el perfil sólo muestra la escritura.
+    """
     if not os.path.isdir(carpeta_raiz_json):
         logging.error(f"La carpeta raíz no existe: {carpeta_raiz_json}")
         return
 
-    conn = sqlite3.connect(db_path)
+    # Conexión de escritura en WAL: el dashboard puede seguir leyendo durante la carga
+    conn = conectar(db_path)
     cursor = conn.cursor()
-    cursor.execute("PRAGMA foreign_keys = ON;")
-
-    archivos_json = [os.path.join(root, file) for root, _, files in os.walk(carpeta_raiz_json) for file in files if file.lower().endswith(".json")]
-    if not archivos_json:
-        logging.info("No se encontraron archivos JSON para procesar.")
-        conn.close()
-        return
+    crear_tablas_staging(cursor)
+    # Las cachés son del proceso: una carga anterior sobre otra base dejaría sus ids
+    vaciar_caches()
+    precargar_caches(cursor)
+    # Bases anteriores a viaje_ultimo_estado: se rellena una vez antes de cargar
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM historial_viajes), EXISTS(SELECT 1 FROM viaje_ultimo_estado)")
+    if cursor.fetchone() == (1, 0):
+        logging.info(f"Rellenando viaje_ultimo_estado: {reconstruir_ultimo_estado(cursor)} viajes.")
+        conn.commit()
+    # Bases anteriores a los resúmenes del dashboard: igual, una sola vez
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM viajes), EXISTS(SELECT 1 FROM resumen_ruta_fecha_empresa)")
+    if cursor.fetchone() == (1, 0):
+        logging.info(f"Rellenando resúmenes del dashboard: {reconstruir_resumenes(cursor)} filas.")
+        incrementar_version_datos(cursor)
+        conn.commit()
 
-    num_lotes = (len(archivos_json) + LOTE_TAMANO - 1) // LOTE_TAMANO
-    logging.info(f"Iniciando carga de {len(archivos_json)} archivos en {num_lotes} lotes.")
+    manifiesto = {} if forzar else cargar_manifiesto(cursor)
+    archivos = iterar_archivos_json(carpeta_raiz_json, extensiones=(".json", EXTENSION_SHARD))
+    fuentes = filtrar_archivos_pendientes(archivos, manifiesto)
+    logging.info(f"Iniciando carga incremental en lotes de {LOTE_TAMANO} ({workers} procesos de parseo, backend {BACKEND_JSON}"
+                 f"{', sólo cambios (CDC)' if cdc else ''}).")
 
-    for i in tqdm(range(0, len(archivos_json), LOTE_TAMANO), desc="Procesando lotes de JSONs"):
-        lote_actual = archivos_json[i:i + LOTE_TAMANO]
-        try:
-            cursor.execute("BEGIN TRANSACTION")
-            procesar_lote_archivos(cursor, lote_actual)
-            conn.commit()
-        except sqlite3.Error as e:
-            conn.rollback()
-            logging.error(f"Error de SQLite en un lote, revirtiendo: {e}")
+    metricas.reiniciar("loader_")
+    inicio_carga = time.perf_counter()
+    registros_procesados = 0
+    lotes = _iterar_lotes_normalizados(fuentes, workers)
+    barra = tqdm(desc="Procesando lotes de JSONs")
+    for numero_lote in count():
+        ruta_perfil = Path(metricas_dir or ".") / f"loader_perfil_lote{numero_lote}.prof"
+        with perfilar(ruta_perfil) if numero_lote == perfilar_lote else nullcontext():
+            # Con workers=1 la espera es el parseo mismo; con el pool, lo que no alcanzó a solaparse
+            with metricas.cronometro("loader_lote_segundos", etapa="espera_parseo"):
+                lote_registros = next(lotes, None)
+            if lote_registros is None:
+                break
+            registros_procesados += sum(1 for r in lote_registros if not r["sin_cambios"])
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                procesar_lote_registros(cursor, lote_registros, cdc)
+                with metricas.cronometro("loader_lote_segundos", etapa="commit"):
+                    conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                metricas.contar("loader_errores_total", categoria="sqlite_lote")
+                logging.error(f"Error de SQLite en un lote, revirtiendo: {e}")
+                # Las cachés pueden apuntar a filas que ya no existen tras el rollback
+                vaciar_caches()
+                precargar_caches(cursor)
+        barra.update(1)
+    barra.close()
 
+    if not registros_procesados:
+        logging.info(f"No hay archivos JSON nuevos o modificados para procesar ({len(manifiesto)} ya cargados).")
+    if metricas_dir:
+        metricas.exportar(metricas_dir, "loader", prefijo="loader_", extra={
+            "segundos": round(time.perf_counter() - inicio_carga, 3), "lotes": numero_lote,
+            "workers": workers, "cdc": cdc, "backend_json": BACKEND_JSON,
+        })
     logging.info("--- Carga de datos finalizada ---")
     conn.close()
\ No newline at end of file
@@ -0,0 +1,60 @@
+# Contenido para: backend/database/redbus_loader/resumenes.py
+# Tablas de resumen (rollups) para el dashboard: ruta × fecha_salida × empresa
+# sobre la última oferta de cada viaje (viaje_ultimo_estado).
+#
+# Se guardan sumas y conteos en lugar de promedios para que el dashboard pueda
+# volver a agregar (por ruta, por empresa, por fecha) sumando filas, sin tocar
+# historial_viajes ni viajes. El loader recalcula sólo las claves tocadas por
+# cada lote, dentro de la misma transacción.
+
+_AGREGADOS = """
+    COUNT(*) AS n_viajes,
+    COUNT(u.precio_min) AS n_con_precio,
+    SUM(u.precio_min) AS suma_precio,
+    MIN(u.precio_min) AS precio_min,
+    MAX(COALESCE(u.precio_max, u.precio_min)) AS precio_max,
+    COUNT(v.duracion_programada_min) AS n_con_duracion,
+    SUM(v.duracion_programada_min) AS suma_duracion,
+    SUM(CASE WHEN u.tiene_oferta THEN 1 ELSE 0 END) AS n_con_oferta,
+    SUM(COALESCE(u.asientos_disponibles, 0)) AS asientos_disponibles
+"""
+
+_COLUMNAS = ("ruta_id, fecha_salida, empresa_id, n_viajes, n_con_precio, suma_precio, precio_min, precio_max, "
+             "n_con_duracion, suma_duracion, n_con_oferta, asientos_disponibles, actualizado_en")
+
+def actualizar_resumenes(cursor):
+    """
+    Recalcula las filas de resumen_ruta_fecha_empresa de las claves presentes en
+    stg_viajes (el lote en curso). Cada clave agrupa pocas decenas de viajes, así
+    que recalcularla entera es exacto y barato.
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.stg_claves_resumen")
+    cursor.execute("""
+        CREATE TEMP TABLE stg_claves_resumen AS
+        SELECT DISTINCT ruta_id, fecha_salida, empresa_id FROM stg_viajes
+    """)
+    cursor.execute("""
+        DELETE FROM resumen_ruta_fecha_empresa
+        WHERE (ruta_id, fecha_salida, empresa_id) IN (SELECT ruta_id, fecha_salida, empresa_id FROM stg_claves_resumen)
+    """)
+    cursor.execute(f"""
+        INSERT INTO resumen_ruta_fecha_empresa ({_COLUMNAS})
+        SELECT v.ruta_id, v.fecha_salida, v.empresa_id, {_AGREGADOS}, CURRENT_TIMESTAMP
+        FROM stg_claves_resumen k
+        JOIN viajes v ON v.ruta_id = k.ruta_id AND v.fecha_salida = k.fecha_salida AND v.empresa_id = k.empresa_id
+        LEFT JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        GROUP BY v.ruta_id, v.fecha_salida, v.empresa_id
+    """)
+    cursor.execute("DROP TABLE temp.stg_claves_resumen")
+
+def reconstruir_resumenes(cursor):
+    """Rehace todos los resúmenes desde viajes + viaje_ultimo_estado. Devuelve cuántas filas generó."""
+    cursor.execute("DELETE FROM resumen_ruta_fecha_empresa")
+    cursor.execute(f"""
+        INSERT INTO resumen_ruta_fecha_empresa ({_COLUMNAS})
+        SELECT v.ruta_id, v.fecha_salida, v.empresa_id, {_AGREGADOS}, CURRENT_TIMESTAMP
+        FROM viajes v
+        LEFT JOIN viaje_ultimo_estado u ON u.viaje_id = v.id
+        GROUP BY v.ruta_id, v.fecha_salida, v.empresa_id
+    """)
+    return cursor.rowcount
@@ -2,15 +2,81 @@
 import sqlite3
 import logging
 
+from ..db_manager import conectar
+
+def _agregar_columna_si_falta(cursor, tabla, columna, tipo):
+    """Migración mínima para bases creadas con un esquema anterior. Devuelve True si la agregó."""
+    cursor.execute(f"PRAGMA table_info({tabla});")
+    if any(fila[1] == columna for fila in cursor.fetchall()):
+        return False
+    cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo};")
+    return True
+
+# Un punto de parada = (viaje, parada, hora, tipo); nombre y dirección viven en paradas
+DDL_PUNTOS_PARADA = """
+CREATE TABLE IF NOT EXISTS puntos_parada (
+    viaje_id INTEGER NOT NULL,
+    parada_id INTEGER NOT NULL,
+    fecha_hora DATETIME NOT NULL,
+    tipo TEXT CHECK(tipo IN ('embarque', 'desembarque')) NOT NULL,
+    FOREIGN KEY (viaje_id) REFERENCES viajes(id) ON DELETE CASCADE,
+    FOREIGN KEY (parada_id) REFERENCES paradas(id),
+    PRIMARY KEY (viaje_id, tipo, fecha_hora, parada_id)
+) WITHOUT ROWID;
+"""
+
+def _migrar_puntos_parada(cursor):
+    """
+    Bases anteriores a la dimensión paradas: puntos_parada guardaba nombre y
+    dirección en cada fila. Se internan en paradas y la tabla se reescribe con
+    parada_id. Conviene un VACUUM después para recuperar el espacio.
+    """
+    cursor.execute("PRAGMA table_info(puntos_parada);")
+    if not any(fila[1] == "nombre" for fila in cursor.fetchall()):
+        return
+    cursor.execute("""
+        INSERT OR IGNORE INTO paradas (nombre, direccion)
+        SELECT nombre, COALESCE(direccion, '') FROM puntos_parada GROUP BY 1, 2 ORDER BY MIN(id)
+    """)
+    cursor.execute("ALTER TABLE puntos_parada RENAME TO puntos_parada_anterior;")
+    cursor.execute(DDL_PUNTOS_PARADA)
+    cursor.execute("""
+        INSERT OR IGNORE INTO puntos_parada (viaje_id, parada_id, fecha_hora, tipo)
+        SELECT a.viaje_id, p.id, a.fecha_hora, a.tipo
+        FROM puntos_parada_anterior a
+        JOIN paradas p ON p.nombre = a.nombre AND p.direccion = COALESCE(a.direccion, '')
+    """)
+    cursor.execute("DROP TABLE puntos_parada_anterior;")
+    cursor.execute("SELECT COUNT(*), (SELECT COUNT(*) FROM paradas) FROM puntos_parada;")
+    puntos, paradas = cursor.fetchone()
+    logging.info(f"🚏 puntos_parada migrada a la dimensión paradas: {puntos} puntos sobre {paradas} paradas (ejecuta VACUUM para liberar espacio).")
+
+def deduplicar_puntos_parada(cursor):
+    """
+    Bases cargadas mientras puntos_parada distinguía la dirección: deja un solo
+    punto por (viaje, tipo, hora, nombre de parada), el de la parada registrada
+    primero. Devuelve cuántas filas borró.
+    """
+    cursor.execute("""
+        DELETE FROM puntos_parada WHERE (viaje_id, tipo, fecha_hora, parada_id) IN (
+            SELECT viaje_id, tipo, fecha_hora, parada_id FROM (
+                SELECT pp.viaje_id, pp.tipo, pp.fecha_hora, pp.parada_id,
+                       ROW_NUMBER() OVER (PARTITION BY pp.viaje_id, pp.tipo, pp.fecha_hora, d.nombre ORDER BY pp.parada_id) AS n
+                FROM puntos_parada pp JOIN paradas d ON d.id = pp.parada_id
+            ) WHERE n > 1
+        )
+    """)
+    return cursor.rowcount
+
 def crear_tablas(db_path):
     """
     Crea/verifica el esquema completo de la base de datos, incluyendo las nuevas
     columnas para ofertas y características del bus.
     """
+    conn = None
     try:
-        conn = sqlite3.connect(db_path)
+        conn = conectar(db_path)
         cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
 
         # --- TABLAS DE CATÁLOGO ---
         cursor.execute("""
@@ -71,6 +137,7 @@ def crear_tablas(db_path):
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             viaje_id INTEGER NOT NULL,
             fecha_snapshot DATETIME NOT NULL,
+            fecha_ultima_vista DATETIME,
             precio_min REAL,
             precio_max REAL,
             asientos_disponibles INTEGER,
@@ -78,26 +145,59 @@ def crear_tablas(db_path):
             oferta_descripcion TEXT,
             precio_original_min REAL,
             precio_descuento_min REAL,
+            tarifas BLOB,
             url_scrapeada TEXT,
             FOREIGN KEY (viaje_id) REFERENCES viajes(id) ON DELETE CASCADE,
             UNIQUE(viaje_id, fecha_snapshot)
         );
         """)
 
-        # --- TABLAS DE RELACIÓN ---
+        # fecha_ultima_vista: última vez que se observó este mismo estado (modo CDC).
+        # En bases anteriores se agrega la columna y vale lo mismo que fecha_snapshot.
+        if _agregar_columna_si_falta(cursor, "historial_viajes", "fecha_ultima_vista", "DATETIME"):
+            cursor.execute("UPDATE historial_viajes SET fecha_ultima_vista = fecha_snapshot WHERE fecha_ultima_vista IS NULL;")
+
+        # --- ÚLTIMO ESTADO POR VIAJE (lo mantiene el loader en cada lote) ---
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS viaje_ultimo_estado (
+            viaje_id INTEGER PRIMARY KEY,
+            historial_id INTEGER NOT NULL,
+            fecha_snapshot DATETIME NOT NULL,
+            fecha_ultima_vista DATETIME,
+            precio_min REAL,
+            precio_max REAL,
+            asientos_disponibles INTEGER,
+            tiene_oferta BOOLEAN DEFAULT FALSE,
+            oferta_descripcion TEXT,
+            precio_original_min REAL,
+            precio_descuento_min REAL,
+            tarifas BLOB,
+            FOREIGN KEY (viaje_id) REFERENCES viajes(id) ON DELETE CASCADE,
+            FOREIGN KEY (historial_id) REFERENCES historial_viajes(id) ON DELETE CASCADE
+        );
+        """)
+
+        if _agregar_columna_si_falta(cursor, "viaje_ultimo_estado", "fecha_ultima_vista", "DATETIME"):
+            cursor.execute("UPDATE viaje_ultimo_estado SET fecha_ultima_vista = fecha_snapshot WHERE fecha_ultima_vista IS NULL;")
+
+        # tarifas: fareList completa (ver redbus_loader/tarifas.py). Las filas anteriores quedan en NULL.
+        _agregar_columna_si_falta(cursor, "historial_viajes", "tarifas", "BLOB")
+        _agregar_columna_si_falta(cursor, "viaje_ultimo_estado", "tarifas", "BLOB")
+
+        # --- DIMENSIÓN DE PARADAS (terminales; se repiten en miles de viajes) ---
         cursor.execute("""
-        CREATE TABLE IF NOT EXISTS puntos_parada (
+        CREATE TABLE IF NOT EXISTS paradas (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            viaje_id INTEGER NOT NULL,
             nombre TEXT NOT NULL,
-            direccion TEXT,
-            fecha_hora DATETIME,
-            tipo TEXT CHECK(tipo IN ('embarque', 'desembarque')) NOT NULL,
-            FOREIGN KEY (viaje_id) REFERENCES viajes(id) ON DELETE CASCADE,
-            UNIQUE(viaje_id, nombre, fecha_hora, tipo)
+            direccion TEXT NOT NULL DEFAULT '',
+            UNIQUE(nombre, direccion)
         );
         """)
 
+        # --- TABLAS DE RELACIÓN ---
+        _migrar_puntos_parada(cursor)
+        cursor.execute(DDL_PUNTOS_PARADA)
+
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS viaje_amenidades (
             viaje_id INTEGER NOT NULL,
@@ -119,9 +219,88 @@ def crear_tablas(db_path):
         );
         """)
 
+        # --- MANIFIESTO DE ARCHIVOS CARGADOS (carga incremental) ---
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archivos_cargados (
+            ruta TEXT PRIMARY KEY,
+            tamano INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            hash TEXT NOT NULL,
+            fecha_snapshot DATETIME,
+            fecha_carga DATETIME NOT NULL
+        );
+        """)
+
+        # --- VERSIÓN DE DATOS (la incrementa cada lote del loader; invalida cachés) ---
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS version_datos (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            actualizado_en DATETIME
+        );
+        """)
+        cursor.execute("INSERT OR IGNORE INTO version_datos (id, version, actualizado_en) VALUES (1, 0, CURRENT_TIMESTAMP);")
+
+        # --- RESÚMENES PARA EL DASHBOARD (ruta × fecha de salida × empresa sobre el último estado) ---
+        # Sumas y conteos en lugar de promedios: se pueden volver a agregar sumando filas.
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_ruta_fecha_empresa (
+            ruta_id INTEGER NOT NULL,
+            fecha_salida DATE NOT NULL,
+            empresa_id INTEGER NOT NULL,
+            n_viajes INTEGER NOT NULL,
+            n_con_precio INTEGER NOT NULL,
+            suma_precio REAL,
+            precio_min REAL,
+            precio_max REAL,
+            n_con_duracion INTEGER NOT NULL,
+            suma_duracion REAL,
+            n_con_oferta INTEGER NOT NULL,
+            asientos_disponibles INTEGER NOT NULL,
+            actualizado_en DATETIME,
+            PRIMARY KEY (ruta_id, fecha_salida, empresa_id)
+        ) WITHOUT ROWID;
+        """)
+
+        # --- CLIMA DIARIO POR CIUDAD (lo llena backend/scraping/weather_downloader.py) ---
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS clima (
+            ciudad TEXT NOT NULL,
+            fecha DATE NOT NULL,
+            temp_max REAL,
+            temp_min REAL,
+            temp_prom REAL,
+            precipitacion REAL,
+            humedad REAL,
+            condiciones TEXT,
+            icono TEXT,
+            fuente_hash TEXT,
+            PRIMARY KEY (ciudad, fecha)
+        ) WITHOUT ROWID;
+        """)
+
+        # --- IMÁGENES LOCALES (las llena backend/scraping/image_downloader.py) ---
+        # tipo 'destino' (clave = ciudad) o 'logo' (clave = empresa_id). Los hash
+        # apuntan al almacén por contenido de IMAGENES_DIR.
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS imagenes (
+            tipo TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            url_origen TEXT,
+            hash TEXT NOT NULL,
+            extension TEXT NOT NULL,
+            miniatura_hash TEXT,
+            miniatura_extension TEXT,
+            actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tipo, clave)
+        ) WITHOUT ROWID;
+        """)
+
         # --- ÍNDICES ---
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_viajes_viaje_id ON historial_viajes(viaje_id);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_viajes_ruta_fecha ON viajes(ruta_id, fecha_salida);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_puntos_parada_parada ON puntos_parada(parada_id, tipo, fecha_hora);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumen_fecha ON resumen_ruta_fecha_empresa(fecha_salida);")
 
         conn.commit()
         logging.info("Esquema de base de datos verificado/creado exitosamente.")
@@ -0,0 +1,82 @@
+# Contenido para: backend/database/redbus_loader/tarifas.py
+# Distribución completa de tarifas (fareList) de cada snapshot, guardada en una
+# sola columna BLOB: cabecera de 8 bytes + float32 little-endian ordenados.
+#
+#   b"TF" | versión (uint8) | relleno | n (uint32) | n × float32
+#
+# Una fila de historial sigue siendo una fila (sin tabla hija que multiplique el
+# conteo) y la decodificación es un np.frombuffer sin copias. Como las tarifas
+# se guardan ordenadas, los percentiles de muchos viajes a la vez salen de una
+# sola indexación vectorizada sobre el arreglo concatenado.
+import struct
+
+import numpy as np
+
+MAGIA = b"TF"
+VERSION = 1
+CABECERA = struct.Struct("<2sBxI")
+_DTYPE = np.dtype("<f4")
+
+def codificar_tarifas(precios):
+    """Lista de precios válidos -> BLOB (None si la lista está vacía)."""
+    if not precios:
+        return None
+    precios = sorted(precios)
+    return CABECERA.pack(MAGIA, VERSION, len(precios)) + struct.pack(f"<{len(precios)}f", *precios)
+
+def _leer_cabecera(blob):
+    magia, version, n = CABECERA.unpack_from(blob)
+    if magia != MAGIA or version != VERSION:
+        raise ValueError(f"BLOB de tarifas desconocido (magia={magia!r}, versión={version})")
+    return n
+
+def decodificar_tarifas(blob):
+    """BLOB -> np.ndarray float32 de sólo lectura (vacío si el snapshot no tenía tarifas)."""
+    if not blob:
+        return np.empty(0, dtype=_DTYPE)
+    n = _leer_cabecera(blob)
+    return np.frombuffer(blob, dtype=_DTYPE, count=n, offset=CABECERA.size)
+
+def concatenar_tarifas(blobs):
+    """
+    Varios BLOBs -> (valores, inicios, conteos): todas las tarifas en un único
+    arreglo float32 y, por cada BLOB, dónde empieza su tramo y cuántas tiene.
+    """
+    conteos = np.fromiter((_leer_cabecera(b) if b else 0 for b in blobs), dtype=np.int64)
+    cuerpo = b"".join(b[CABECERA.size:] for b in blobs if b)
+    valores = np.frombuffer(cuerpo, dtype=_DTYPE)
+    inicios = np.zeros(len(conteos), dtype=np.int64)
+    np.cumsum(conteos[:-1], out=inicios[1:])
+    return valores, inicios, conteos
+
+def percentiles_por_viaje(blobs, percentiles=(10, 50, 90)):
+    """
+    Matriz (len(blobs), len(percentiles)) con los percentiles de cada snapshot,
+    con la misma interpolación lineal que np.percentile. NaN si no hay tarifas.
+    """
+    valores, inicios, conteos = concatenar_tarifas(blobs)
+    q = np.asarray(percentiles, dtype=np.float64) / 100.0
+    posicion = (np.maximum(conteos, 1) - 1)[:, None] * q[None, :]
+    abajo = np.floor(posicion).astype(np.int64)
+    arriba = np.minimum(abajo + 1, np.maximum(conteos, 1)[:, None] - 1)
+    peso = posicion - abajo
+    base = inicios[:, None]
+    if len(valores) == 0:
+        return np.full(posicion.shape, np.nan)
+    v_abajo = valores[np.minimum(base + abajo, len(valores) - 1)].astype(np.float64)
+    v_arriba = valores[np.minimum(base + arriba, len(valores) - 1)].astype(np.float64)
+    resultado = v_abajo + (v_arriba - v_abajo) * peso
+    resultado[conteos == 0] = np.nan
+    return resultado
+
+def percentiles_conjuntos(blobs, percentiles=(10, 50, 90)):
+    """Percentiles de todas las tarifas juntas (p. ej. de una ruta en un mes)."""
+    valores, _, _ = concatenar_tarifas(blobs)
+    if len(valores) == 0:
+        return np.full(len(percentiles), np.nan)
+    return np.percentile(valores, percentiles)
+
+def histograma_tarifas(blobs, bins=20, rango=None):
+    """np.histogram sobre todas las tarifas de los BLOBs: (conteos, bordes)."""
+    valores, _, _ = concatenar_tarifas(blobs)
+    return np.histogram(valores, bins=bins, range=rango)
@@ -20,6 +20,31 @@ cache_empresas_por_nombre = {}
 cache_empresas_por_operator_id = {}
 cache_rutas = {}
 cache_amenidades_por_codigo = {}
+cache_paradas = {}  # (nombre, direccion) -> paradas.id; sin dirección se guarda ''
+
+def vaciar_caches():
+    for cache in (cache_empresas_por_nombre, cache_empresas_por_operator_id, cache_rutas, cache_amenidades_por_codigo, cache_paradas):
+        cache.clear()
+
+def precargar_caches(cursor):
+    """Llena las cachés de dimensiones con lo que ya existe en la BD en una sola consulta."""
+    cursor.execute("""
+        SELECT 'ruta', id, origen, destino FROM rutas
+        UNION ALL SELECT 'empresa', id, nombre, operator_id FROM empresas
+        UNION ALL SELECT 'amenidad', id, codigo, NULL FROM amenidades
+        UNION ALL SELECT 'parada', id, nombre, direccion FROM paradas
+        ORDER BY 1, 2
+    """)
+    for tipo, id_, a, b in cursor.fetchall():
+        if tipo == "ruta":
+            cache_rutas.setdefault((a, b), id_)
+        elif tipo == "empresa":
+            if b is not None: cache_empresas_por_operator_id.setdefault(b, id_)
+            cache_empresas_por_nombre.setdefault((a, b), id_)
+        elif tipo == "amenidad":
+            cache_amenidades_por_codigo.setdefault(a, id_)
+        else:
+            cache_paradas.setdefault((a, b), id_)
 
 def obtener_origen_destino(json_data):
     origen = json_data.get("parentSrcCityName", "Desconocido").strip()
@@ -35,11 +60,14 @@ def extraer_fecha_desde_nombre_archivo(nombre_archivo):
         except ValueError: return None
     return None
 
+def precios_validos(fare_list):
+    if not fare_list: return []
+    return [float(p) for p in fare_list if isinstance(p, (int, float)) or (isinstance(p, str) and p.replace('.', '', 1).isdigit())]
+
 def limpiar_precios(fare_list):
-    if not fare_list: return 0.0, 0.0
-    precios_validos = [float(p) for p in fare_list if isinstance(p, (int, float)) or (isinstance(p, str) and p.replace('.', '', 1).isdigit())]
-    if not precios_validos: return 0.0, 0.0
-    return min(precios_validos), max(precios_validos)
+    validos = precios_validos(fare_list)
+    if not validos: return 0.0, 0.0
+    return min(validos), max(validos)
 
 def limpiar_tipo_bus(service_name, bus_type):
     s_name = str(service_name).strip() if service_name else ""
@@ -47,6 +75,10 @@ def limpiar_tipo_bus(service_name, bus_type):
     if s_name and b_type and s_name.lower() != b_type.lower(): return f"{s_name} ({b_type})"
     return s_name or b_type or "No especificado"
 
+def clave_parada(nombre, direccion):
+    """Clave de la dimensión paradas: la dirección vacía se normaliza a '' para que UNIQUE la compare."""
+    return nombre, direccion or ""
+
 def extraer_puntos_parada(inventario_viaje, tipo_punto):
     puntos = []
     json_key = "bpData" if tipo_punto == "embarque" else "dpData"
@@ -64,6 +96,14 @@ def extraer_codigos_amenidades(lista_codigos_json):
     if not isinstance(lista_codigos_json, list): return []
     return [int(codigo) for codigo in lista_codigos_json if isinstance(codigo, (int, str)) and str(codigo).isdigit()]
 
+def obtener_fecha_scrapeo(json_data, mtime):
+    """
+    Momento en que se scrapeó la respuesta: el campo `fechaScrapeo` que añade el
+    extractor o, para archivos antiguos, la fecha de modificación del archivo.
+    """
+    embebida = validar_formato_datetime(json_data.get("fechaScrapeo")) if isinstance(json_data, dict) else None
+    return embebida or datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+
 def cargar_json_desde_archivo(ruta_archivo):
     try:
         with open(ruta_archivo, "r", encoding="utf-8") as f:
@@ -86,6 +126,15 @@ def validar_flotante_o_none(valor):
 
 def validar_formato_datetime(datetime_str, formato_entrada="%Y-%m-%d %H:%M:%S"):
     if not datetime_str or not isinstance(datetime_str, str): return None
+    # Camino rápido: la API casi siempre envía 'YYYY-MM-DD HH:MM:SS' ya canónico,
+    # y fromisoformat lo valida mucho más barato que strptime.
+    if (formato_entrada == "%Y-%m-%d %H:%M:%S" and len(datetime_str) == 19 and datetime_str[4] == "-"
+            and datetime_str[7] == "-" and datetime_str[10] == " " and datetime_str[13] == ":" and datetime_str[16] == ":"):
+        try:
+            datetime.fromisoformat(datetime_str)
+            return datetime_str
+        except ValueError:
+            pass
     try:
         dt_obj = datetime.strptime(datetime_str, formato_entrada)
         return dt_obj.strftime("%Y-%m-%d %H:%M:%S")
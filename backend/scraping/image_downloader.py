@@ -0,0 +1,113 @@
+# Contenido para: backend/scraping/image_downloader.py
+# Descarga las fotos de destinos (Pixabay) y los logos de empresas
+# (empresas.logo_url), genera sus miniaturas y las registra en la tabla `imagenes`.
+#
+# - Todo corre en paralelo sobre una sola sesión aiohttp con límite de
+#   concurrencia y un TokenBucket global.
+# - Los bytes van a un AlmacenContenido en IMAGENES_DIR: cada URL se baja una
+#   vez por ejecución y los logos idénticos se guardan una sola vez en disco.
+# - Las miniaturas se generan aquí (en hilos), no al renderizar: el frontend
+#   sólo lee rutas locales con images_api.ruta_imagen / rutas_imagenes.
+#
+# Uso: python -m backend.scraping.image_downloader [--solo logos] [--offline]
+import asyncio
+import logging
+import argparse
+
+from .shared.rate_limiter import TokenBucket
+from .shared.almacen_contenido import AlmacenContenido
+from ..apis.cliente_http import crear_sesion
+from ..apis.images_api import url_imagen_destino, descargar_imagen, generar_miniatura
+from ..core.config import (
+    IMAGENES_DIR, IMAGENES_MAX_CONCURRENTES, IMAGENES_TASA_POR_SEGUNDO, MINIATURA_DESTINO, MINIATURA_LOGO,
+    PIXABAY_API_KEY,
+)
+from ..database.db_manager import obtener_gestor, incrementar_version_datos, DB_PATH_POR_DEFECTO
+from ..database.redbus_loader.schema import crear_tablas
+
+COLUMNAS_IMAGENES = ("tipo", "clave", "url_origen", "hash", "extension", "miniatura_hash", "miniatura_extension")
+
+def objetivos(db_path):
+    """(destinos, {logo_url: [empresa_id, ...]}) a partir de las rutas y empresas ya cargadas."""
+    gestor = obtener_gestor(db_path)
+    destinos = sorted({destino for _, _, destino in gestor.consultar("rutas")})
+    logos = {}
+    for empresa_id, _, _, _, logo_url, _ in gestor.consultar("empresas"):
+        if logo_url:
+            logos.setdefault(logo_url, []).append(empresa_id)
+    return destinos, logos
+
+async def descargar_imagenes(destinos, logos, almacen, base_url=None, offline=False, offline_busqueda=False,
+                             max_concurrentes=IMAGENES_MAX_CONCURRENTES, tasa=IMAGENES_TASA_POR_SEGUNDO):
+    """
+    Devuelve las filas de `imagenes` (ver COLUMNAS_IMAGENES) de todo lo que se
+    pudo obtener. Cada logo_url se baja una sola vez aunque la compartan varias empresas.
+    """
+    limitador = TokenBucket(tasa)
+    semaforo = asyncio.Semaphore(max_concurrentes)
+
+    async with crear_sesion(max_conexiones=max_concurrentes) as session:
+        async def _bajar(url, tamano, recortar):
+            async with semaforo:
+                original = await descargar_imagen(session, limitador, almacen, url, offline)
+            if original is None:
+                return None
+            miniatura = await asyncio.to_thread(generar_miniatura, almacen, *original, tamano, recortar)
+            return (url, *original, *(miniatura or (None, None)))
+
+        async def _destino(destino):
+            async with semaforo:
+                url = await url_imagen_destino(session, limitador, almacen, destino, base_url, offline or offline_busqueda)
+            fila = await _bajar(url, MINIATURA_DESTINO, True) if url else None
+            return [("destino", destino, *fila)] if fila else []
+
+        async def _logo(url, empresa_ids):
+            fila = await _bajar(url, MINIATURA_LOGO, False)
+            return [("logo", str(empresa_id), *fila) for empresa_id in empresa_ids] if fila else []
+
+        grupos = await asyncio.gather(*(_destino(d) for d in destinos), *(_logo(u, ids) for u, ids in logos.items()))
+
+    filas = [fila for grupo in grupos for fila in grupo]
+    logging.info(f"🖼️ Imágenes: {sum(f[0] == 'destino' for f in filas)}/{len(destinos)} destinos, "
+                 f"{sum(f[0] == 'logo' for f in filas)}/{sum(map(len, logos.values()))} logos.")
+    return filas
+
+def guardar_imagenes(db_path, filas):
+    """UPSERT en `imagenes` en una sola transacción; sube version_datos para invalidar la caché de consultas."""
+    if not filas:
+        return 0
+    actualizar = ", ".join(f"{c} = excluded.{c}" for c in COLUMNAS_IMAGENES[2:])
+    with obtener_gestor(db_path).escritura() as conn:
+        conn.executemany(f"""
+            INSERT INTO imagenes ({", ".join(COLUMNAS_IMAGENES)}) VALUES ({", ".join("?" * len(COLUMNAS_IMAGENES))})
+            ON CONFLICT(tipo, clave) DO UPDATE SET {actualizar}, actualizado_en = CURRENT_TIMESTAMP
+        """, filas)
+        incrementar_version_datos(conn.cursor())
+    return len(filas)
+
+def ejecutar(db_path=DB_PATH_POR_DEFECTO, raiz=IMAGENES_DIR, base_url=None, offline=False, solo=None):
+    crear_tablas(db_path)
+    destinos, logos = objetivos(db_path)
+    if solo == "logos":
+        destinos = []
+    elif solo == "destinos":
+        logos = {}
+    sin_clave = bool(destinos) and not offline and not base_url and not PIXABAY_API_KEY
+    if sin_clave:
+        logging.warning("⚠️ PIXABAY_API_KEY no está definida: las búsquedas de destinos sólo saldrán de la caché local.")
+    almacen = AlmacenContenido(raiz)
+    filas = asyncio.run(descargar_imagenes(destinos, logos, almacen, base_url, offline, sin_clave))
+    escritas = guardar_imagenes(db_path, filas)
+    logging.info(f"✅ {escritas} imágenes registradas en {db_path} | almacén: {almacen.estadisticas()}")
+    return escritas
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Fotos de destinos y logos de empresas → almacén local + tabla imagenes.")
+    parser.add_argument("--db", default=DB_PATH_POR_DEFECTO)
+    parser.add_argument("--dir", default=str(IMAGENES_DIR), help="Directorio del almacén de imágenes.")
+    parser.add_argument("--base-url", default=None, help="URL alternativa de la búsqueda de Pixabay (p. ej. un servidor local).")
+    parser.add_argument("--offline", action="store_true", help="No sale a la red: sólo usa lo ya descargado.")
+    parser.add_argument("--solo", choices=("destinos", "logos"), default=None)
+    args = parser.parse_args()
+    ejecutar(args.db, args.dir, args.base_url, args.offline, args.solo)
@@ -1,4 +1,5 @@
 # scraper/redbus_scraper/config/config.py
+import os
 
 HEADERS = {
     "accept": "application/json, text/plain, */*",
@@ -32,4 +33,15 @@ BODY = {
     "bpIdentifier": [],
     "bcf": [],
     "opBusTypeFilterList": []
-}
\ No newline at end of file
+}
+
+# Formato del almacenamiento crudo:
+#   "shard" -> un .jsonl.gz append-only por ruta y mes (ver backend/scraping/shared/shards.py)
+#   "json"  -> un api_response_YYYYMMDD.json indentado por ruta y fecha (formato antiguo)
+FORMATO_ALMACENAMIENTO = "shard"
+
+# Endpoint de búsqueda. REDBUS_BASE_URL (o --base-url en runner_batch) permite
+# apuntar el extractor a otro servidor, p. ej. el simulador local
+# (python -m backend.scraping.redbus.servidor_simulado) para pruebas de carga.
+BASE_URL_PRODUCCION = "https://www.redbus.pe/search/SearchV4Results"
+REDBUS_BASE_URL = os.environ.get("REDBUS_BASE_URL", BASE_URL_PRODUCCION)
@@ -5,31 +5,55 @@ import json
 import time
 import random
 import logging
+import threading
 from datetime import datetime
 import requests
 
-from .config.config import HEADERS, COOKIES, BODY
-
-def scrape_redbus(from_city_id, to_city_id, from_name, to_name, date_str, output_dir):
-    """
-    Realiza scraping a la API de RedBus y guarda el JSON crudo aunque no haya viajes,
-    para poder inspeccionar la estructura de la respuesta.
-    """
-    try:
-        date_obj = datetime.strptime(date_str, "%d-%b-%Y")
-    except ValueError:
-        logging.error(f"❌ Fecha inválida: '{date_str}'. Usa formato 'DD-MMM-YYYY' (ej. 15-Jun-2025)")
-        return
-
-    os.makedirs(output_dir, exist_ok=True)
-
-    # --- INICIO DE LA MODIFICACIÓN ---
-
-    # 1. Definimos la URL base sin parámetros
-    base_url = "https://www.redbus.pe/search/SearchV4Results"
-
-    # 2. Creamos un diccionario con todos los parámetros de la URL
-    params = {
+from .config.config import HEADERS, COOKIES, BODY, FORMATO_ALMACENAMIENTO, REDBUS_BASE_URL
+from ..shared.shards import agregar_registro, ruta_shard_para, fechas_en_shard
+from ..shared.metricas import metricas
+
+BASE_URL = REDBUS_BASE_URL
+TAMANO_PAGINA = 20  # Máximo de salidas que la API entrega por página
+
+# Tope de peticiones HTTP del proceso (None = sin tope). Cuenta cada petición
+# real, incluidas las páginas siguientes y los reintentos del modo async.
+LIMITE_PETICIONES = None
+_peticiones_realizadas = 0
+_lock_presupuesto = threading.Lock()
+
+class PresupuestoAgotado(Exception):
+    """Se alcanzó LIMITE_PETICIONES: la tarea en curso queda sin guardar."""
+
+def configurar_base_url(url):
+    """Cambia el endpoint para todo el proceso (hilos y modo async lo leen en cada petición)."""
+    global BASE_URL
+    BASE_URL = url or REDBUS_BASE_URL
+    logging.info(f"🌐 Endpoint de búsqueda: {BASE_URL}")
+
+def configurar_presupuesto(limite):
+    """Fija el tope de peticiones para todo el proceso (None lo quita) y reinicia la cuenta."""
+    global LIMITE_PETICIONES, _peticiones_realizadas
+    with _lock_presupuesto:
+        LIMITE_PETICIONES, _peticiones_realizadas = limite, 0
+
+def peticiones_realizadas():
+    return _peticiones_realizadas
+
+def presupuesto_agotado():
+    return LIMITE_PETICIONES is not None and _peticiones_realizadas >= LIMITE_PETICIONES
+
+def reservar_peticion():
+    """Cuenta una petición antes de hacerla; lanza PresupuestoAgotado si ya no quedan."""
+    global _peticiones_realizadas
+    with _lock_presupuesto:
+        if LIMITE_PETICIONES is not None and _peticiones_realizadas >= LIMITE_PETICIONES:
+            raise PresupuestoAgotado(f"presupuesto de {LIMITE_PETICIONES} peticiones agotado")
+        _peticiones_realizadas += 1
+
+def construir_params(from_city_id, to_city_id, from_name, to_name, date_str, limit=TAMANO_PAGINA, offset=0):
+    """Parámetros de URL que espera SearchV4Results."""
+    return {
         "fromCity": from_city_id,
         "toCity": to_city_id,
         "src": from_name,
@@ -37,43 +61,153 @@ def scrape_redbus(from_city_id, to_city_id, from_name, to_name, date_str, output
         "DOJ": date_str,
         "sectionId": 0,
         "groupId": 0,
-        "limit": 20,
-        "offset": 0,
+        "limit": limit,
+        "offset": offset,
         "sort": 0,
         "sortOrder": 0,
         "meta": "true",
         "returnSearch": 0,
     }
 
-    logging.info(f"🔍 Buscando: {from_name} → {to_name} | Fecha: {date_str}")
+def total_resultados(data):
+    """Total de salidas que anuncia la primera página (metaData.totalCount)."""
+    meta = data.get("metaData") or {}
+    try:
+        return int(meta.get("totalCount"))
+    except (TypeError, ValueError):
+        return len(data.get("inventories") or [])
+
+def offsets_pendientes(data, tamano_pagina=None):
+    """
+    Offsets de las páginas que faltan tras la primera. Por defecto avanza según
+    lo que trajo la primera página, por si el servidor entrega menos que `limit`.
+    """
+    tamano_pagina = tamano_pagina or len(data.get("inventories") or []) or TAMANO_PAGINA
+    return list(range(tamano_pagina, total_resultados(data), tamano_pagina))
+
+def _post(params):
+    """POST al endpoint actual midiendo la latencia por código de estado (o tipo de fallo)."""
+    reservar_peticion()
+    estado = "red"
+    inicio = time.perf_counter()
+    try:
+        response = requests.post(BASE_URL, params=params, headers=HEADERS, cookies=COOKIES, json=BODY, timeout=15)
+        estado = str(response.status_code)
+        return response
+    except requests.exceptions.Timeout:
+        estado = "timeout"
+        raise
+    finally:
+        metricas.observar("scraper_peticion_segundos", time.perf_counter() - inicio, modo="hilos", estado=estado)
+
+def _dormir(minimo, maximo, motivo):
+    with metricas.cronometro("scraper_pausa_segundos", modo="hilos", motivo=motivo):
+        time.sleep(random.uniform(minimo, maximo))
+
+def _clave_inventario(inv_item):
+    return (inv_item.get("operatorId"), inv_item.get("routeId"), inv_item.get("serviceId"), inv_item.get("departureTime"))
+
+def combinar_paginas(data, paginas):
+    """
+    Agrega los `inventories` de las páginas siguientes a la primera respuesta
+    (sin duplicados) para guardar un único JSON que el loader consume tal cual.
+    """
+    inventarios = data.get("inventories") or []
+    vistos = {_clave_inventario(i) for i in inventarios if isinstance(i, dict)}
+    for pagina in paginas:
+        for inv_item in (pagina or {}).get("inventories") or []:
+            clave = _clave_inventario(inv_item) if isinstance(inv_item, dict) else None
+            if clave is None or clave not in vistos:
+                inventarios.append(inv_item)
+                vistos.add(clave)
+    data["inventories"] = inventarios
+    data["paginasDescargadas"] = 1 + len(paginas)
+    return data
+
+def guardar_respuesta(data, date_obj, output_dir, formato=None):
+    """
+    Guarda la respuesta cruda y devuelve dónde quedó. Con formato "shard" se agrega
+    al shard `<output_dir>.jsonl.gz` de la ruta y mes; con "json" se escribe
+    `<output_dir>/api_response_YYYYMMDD.json` como antes.
+    """
+    # Momento real del scraping: el loader lo usa como fecha_snapshot
+    data["fechaScrapeo"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    fecha_formato = date_obj.strftime("%Y%m%d")
+    formato = formato or FORMATO_ALMACENAMIENTO
+
+    with metricas.cronometro("scraper_escritura_segundos", formato=formato):
+        if formato == "shard":
+            ruta_shard = ruta_shard_para(output_dir)
+            agregar_registro(ruta_shard, fecha_formato, data)
+            return f"{ruta_shard}#{fecha_formato}"
+
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f"api_response_{fecha_formato}.json")
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return output_path
 
+def fechas_guardadas(output_dir):
+    """Fechas (YYYYMMDD) ya scrapeadas para una ruta y mes, en cualquiera de los dos formatos."""
+    fechas = fechas_en_shard(ruta_shard_para(output_dir))
+    if os.path.isdir(output_dir):
+        for nombre in os.listdir(output_dir):
+            if nombre.startswith("api_response_") and nombre.endswith(".json"):
+                fechas.add(nombre[len("api_response_"):-len(".json")])
+    return fechas
+
+def scrape_redbus(from_city_id, to_city_id, from_name, to_name, date_str, output_dir):
+    """
+    Realiza scraping a la API de RedBus y guarda el JSON crudo aunque no haya viajes,
+    para poder inspeccionar la estructura de la respuesta. Devuelve True si la
+    respuesta quedó guardada. Si se agota el presupuesto de peticiones
+    (configurar_presupuesto) lanza PresupuestoAgotado sin guardar nada.
+    """
     try:
-        # 3. Pasamos la URL base y el diccionario de 'params' a requests.
-        # La librería se encargará de construir la URL final correctamente.
-        response = requests.post(base_url, params=params, headers=HEADERS, cookies=COOKIES, json=BODY, timeout=15)
+        date_obj = datetime.strptime(date_str, "%d-%b-%Y")
+    except ValueError:
+        logging.error(f"❌ Fecha inválida: '{date_str}'. Usa formato 'DD-MMM-YYYY' (ej. 15-Jun-2025)")
+        return False
+
+    params = construir_params(from_city_id, to_city_id, from_name, to_name, date_str)
+    guardado = False
 
-    # --- FIN DE LA MODIFICACIÓN ---
+    logging.info(f"🔍 Buscando: {from_name} → {to_name} | Fecha: {date_str}")
+
+    try:
+        # requests se encarga de construir la URL final a partir de 'params'
+        response = _post(params)
 
         if response.status_code == 429:
             logging.warning("⚠️ Código 429: Rate limiting. Aumentando delay.")
-            time.sleep(random.uniform(10, 20))
-            return
+            _dormir(10, 20, "429")
+            metricas.contar("scraper_tareas_total", modo="hilos", resultado="fallida")
+            return False
 
         if response.status_code == 403:
             logging.error("⛔ Código 403: IP posiblemente bloqueada.")
-            return
+            metricas.contar("scraper_tareas_total", modo="hilos", resultado="fallida")
+            return False
 
         logging.info(f"📡 Código de estado: {response.status_code}")
         response.raise_for_status() # Esto es lo que lanza el error con el código 500
 
         data = response.json()
 
-        # Guardamos SIEMPRE el JSON completo para inspección
-        fecha_formato = date_obj.strftime("%Y%m%d")
-        output_path = os.path.join(output_dir, f"api_response_{fecha_formato}.json")
+        # Páginas restantes: rutas como Lima↔Arequipa superan las 20 salidas
+        for offset in offsets_pendientes(data):
+            _dormir(1, 3, "pagina")
+            pagina = _post({**params, "offset": offset})
+            if pagina.status_code in (429, 403):
+                logging.warning(f"⚠️ Código {pagina.status_code} en la página offset={offset}; se descarta la respuesta incompleta.")
+                _dormir(10, 20, str(pagina.status_code))
+                metricas.contar("scraper_tareas_total", modo="hilos", resultado="fallida")
+                return False
+            pagina.raise_for_status()
+            combinar_paginas(data, [pagina.json()])
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Guardamos SIEMPRE el JSON completo para inspección
+        output_path = guardar_respuesta(data, date_obj, output_dir)
 
         logging.info(f"📁 Archivo (debug) guardado: {output_path}")
 
@@ -85,6 +219,11 @@ def scrape_redbus(from_city_id, to_city_id, from_name, to_name, date_str, output
         else:
             logging.info(f"✅ {len(results)} resultados encontrados")
 
+        metricas.contar("scraper_inventarios_total", len(results or []), modo="hilos")
+        guardado = True
+
+    except PresupuestoAgotado:
+        raise
     except requests.exceptions.Timeout:
         logging.error("⏱️ Timeout: El servidor no respondió a tiempo.")
     except requests.RequestException as e:
@@ -93,5 +232,7 @@ def scrape_redbus(from_city_id, to_city_id, from_name, to_name, date_str, output
     except Exception as e:
         logging.error(f"❌ Error inesperado: {e}")
 
+    metricas.contar("scraper_tareas_total", modo="hilos", resultado="guardada" if guardado else "fallida")
     # El sleep se ejecuta incluso si hay un error, para no martillar el servidor
-    time.sleep(random.uniform(5, 10))
\ No newline at end of file
+    _dormir(5, 10, "cortesia")
+    return guardado
\ No newline at end of file
@@ -0,0 +1,148 @@
+# Contenido para: backend/scraping/redbus/extractor_async.py
+# Versión asíncrona de scrape_redbus: una sola sesión aiohttp con keep-alive y
+# gzip para todas las peticiones, y un TokenBucket global en lugar de sleeps por hilo.
+import time
+import asyncio
+import logging
+import random
+from datetime import datetime
+
+import aiohttp
+
+from .config.config import HEADERS, COOKIES, BODY
+from . import extractor
+from .extractor import construir_params, guardar_respuesta, offsets_pendientes, combinar_paginas
+from ..shared.rate_limiter import TokenBucket
+from ..shared.metricas import metricas
+
+# --- CONFIGURACIÓN POR DEFECTO ---
+TASA_POR_SEGUNDO = 1.5      # Peticiones/s sostenidas para todo el proceso
+MAX_CONEXIONES = 8          # Conexiones keep-alive del pool
+MAX_INTENTOS = 4
+PAUSA_429 = (10, 20)        # Segundos de pausa global ante rate limiting
+PAUSA_403 = (60, 120)       # Pausa más larga si el servidor empieza a bloquear
+
+def crear_sesion(max_conexiones=MAX_CONEXIONES, timeout=15):
+    """Sesión compartida: pool de conexiones keep-alive y respuestas comprimidas."""
+    conector = aiohttp.TCPConnector(limit=max_conexiones, ttl_dns_cache=300, keepalive_timeout=60)
+    headers = {**HEADERS, "accept-encoding": "gzip, deflate"}
+    return aiohttp.ClientSession(
+        connector=conector, headers=headers, cookies=COOKIES,
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    )
+
+async def _post_json(session, limitador, params, etiqueta):
+    """
+    POST con reintentos bajo el limitador global. Devuelve el JSON o None.
+    Los 429/403 no duermen la corrutina a ciegas: penalizan el limitador global y
+    la petición se reintenta cuando éste vuelve a entregar fichas.
+    """
+    for intento in range(1, MAX_INTENTOS + 1):
+        with metricas.cronometro("scraper_espera_limitador_segundos", modo="async"):
+            await limitador.adquirir()
+        extractor.reservar_peticion()
+        estado = "red"
+        inicio = time.perf_counter()
+        try:
+            async with session.post(extractor.BASE_URL, params=params, json=BODY) as response:
+                estado = str(response.status)
+                if response.status == 429:
+                    logging.warning(f"⚠️ Código 429 en {etiqueta} (intento {intento}).")
+                    metricas.contar("scraper_penalizaciones_total", codigo="429")
+                    limitador.penalizar(random.uniform(*PAUSA_429))
+                    continue
+                if response.status == 403:
+                    logging.error(f"⛔ Código 403 en {etiqueta}: IP posiblemente bloqueada.")
+                    metricas.contar("scraper_penalizaciones_total", codigo="403")
+                    limitador.penalizar(random.uniform(*PAUSA_403))
+                    continue
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+            limitador.recompensar()
+            return data
+
+        except asyncio.TimeoutError:
+            estado = "timeout"
+            logging.error(f"⏱️ Timeout en {etiqueta} (intento {intento}).")
+        except aiohttp.ClientError as e:
+            logging.error(f"❌ Error de red en {etiqueta} (intento {intento}): {e}")
+        finally:
+            metricas.observar("scraper_peticion_segundos", time.perf_counter() - inicio, modo="async", estado=estado)
+        # Errores transitorios: backoff exponencial sólo para esta petición
+        with metricas.cronometro("scraper_pausa_segundos", modo="async", motivo="backoff"):
+            await asyncio.sleep(min(60, 2 ** intento) + random.uniform(0, 1))
+
+    logging.error(f"❌ Se agotaron los intentos para {etiqueta}.")
+    return None
+
+async def scrape_redbus_async(session, limitador, from_city_id, to_city_id, from_name, to_name, date_str, output_dir):
+    """
+    Equivalente asíncrono de `scrape_redbus`. Devuelve True si la respuesta se guardó
+    (lanza PresupuestoAgotado, igual que aquél, si se llega al tope de peticiones).
+    Tras la primera página lee metaData.totalCount y pide el resto de páginas en
+    paralelo (bajo el mismo limitador); si alguna falla no se guarda nada, para
+    no dejar inventarios truncados en disco.
+    """
+    try:
+        date_obj = datetime.strptime(date_str, "%d-%b-%Y")
+    except ValueError:
+        logging.error(f"❌ Fecha inválida: '{date_str}'. Usa formato 'DD-MMM-YYYY' (ej. 15-Jun-2025)")
+        return False
+
+    params = construir_params(from_city_id, to_city_id, from_name, to_name, date_str)
+    etiqueta = f"{from_name} → {to_name} {date_str}"
+
+    data = await _post_json(session, limitador, params, etiqueta)
+    if data is None:
+        metricas.contar("scraper_tareas_total", modo="async", resultado="fallida")
+        return False
+
+    offsets = offsets_pendientes(data)
+    if offsets:
+        paginas = await asyncio.gather(*(
+            _post_json(session, limitador, {**params, "offset": offset}, f"{etiqueta} offset={offset}")
+            for offset in offsets
+        ))
+        if any(p is None for p in paginas):
+            logging.error(f"❌ Paginación incompleta en {etiqueta}; no se guarda la respuesta.")
+            metricas.contar("scraper_tareas_total", modo="async", resultado="paginacion_incompleta")
+            return False
+        combinar_paginas(data, paginas)
+
+    output_path = await asyncio.to_thread(guardar_respuesta, data, date_obj, output_dir)
+    results = data.get("inventories") or []
+    metricas.contar("scraper_tareas_total", modo="async", resultado="guardada")
+    metricas.contar("scraper_inventarios_total", len(results), modo="async")
+    logging.info(f"✅ {etiqueta}: {len(results)} resultados en {1 + len(offsets)} página(s) | {output_path}")
+    return True
+
+async def ejecutar_tareas_async(tareas, tasa=TASA_POR_SEGUNDO, max_conexiones=MAX_CONEXIONES, al_terminar=None):
+    """
+    Ejecuta una lista de tuplas con los argumentos de `scrape_redbus` sobre una
+    única sesión y un único limitador. `al_terminar(tarea, ok)` se llama al
+    completar cada tarea (p. ej. para actualizar una barra de progreso).
+    Devuelve (exitos, fallos).
+    """
+    limitador = TokenBucket(tasa)
+    # Acota las peticiones en vuelo; el ritmo real lo marca el limitador.
+    semaforo = asyncio.Semaphore(max_conexiones * 2)
+    exitos = fallos = 0
+
+    async with crear_sesion(max_conexiones) as session:
+        async def _una(tarea):
+            nonlocal exitos, fallos
+            async with semaforo:
+                try:
+                    ok = await scrape_redbus_async(session, limitador, *tarea)
+                except Exception as exc:
+                    logging.error(f"❌ Tarea {tarea[2]}->{tarea[3]} en {tarea[4]} generó una excepción: {exc}")
+                    ok = False
+            if ok:
+                exitos += 1
+            else:
+                fallos += 1
+            if al_terminar:
+                al_terminar(tarea, ok)
+
+        await asyncio.gather(*(_una(t) for t in tareas))
+    return exitos, fallos
@@ -0,0 +1,188 @@
+# Contenido para: backend/scraping/redbus/planificador.py
+# Planificador adaptativo: decide QUÉ ruta×fecha vale la pena volver a scrapear
+# a partir de lo que ya hay en historial_viajes, y reparte un presupuesto fijo
+# de peticiones entre las más valiosas.
+#
+# Para cada ruta×fecha de salida dentro del horizonte se calculan tres señales
+# en [0, 1]:
+#   - urgencia:    qué tan pronto sale (los precios cerca de la salida se mueven más).
+#   - volatilidad: cuánto cambiaron precio_min y asientos_disponibles entre los
+#                  dos últimos snapshots de cada viaje.
+#   - antigüedad:  cuántas horas pasaron desde la última vez que se vio (fecha_ultima_vista).
+# El valor final es antigüedad × (urgencia + volatilidad + base): una ruta recién
+# scrapeada vale ~0 aunque sea volátil, y una que nunca se scrapeó vale lo máximo.
+import json
+import math
+import logging
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+
+from .extractor import TAMANO_PAGINA
+from ..shared.cola_trabajos import ColaTrabajos
+from ...database.db_manager import conectar
+
+# --- PARÁMETROS DEL PUNTAJE ---
+PESO_URGENCIA = 0.45
+PESO_VOLATILIDAD = 0.40
+PESO_BASE = 0.15               # Valor mínimo de refrescar algo viejo aunque esté quieto
+DIAS_MEDIA_URGENCIA = 7        # A los 7 días de la salida la urgencia vale 0.5
+HORAS_ANTIGUEDAD_MAX = 48      # A partir de aquí el snapshot se considera vencido del todo
+VOLATILIDAD_REFERENCIA = 0.20  # Cambio relativo (precio + asientos) que ya cuenta como volatilidad 1
+VOLATILIDAD_DESCONOCIDA = 0.5  # Prior cuando sólo hay un snapshot
+DIAS_HORIZONTE = 30
+
+MESES_ES = {
+    1: "enero", 2: "febrero", 3: "marzo", 4: "abril", 5: "mayo", 6: "junio",
+    7: "julio", 8: "agosto", 9: "septiembre", 10: "octubre", 11: "noviembre", 12: "diciembre",
+}
+
+CITY_IDS_PATH = Path(__file__).parent / "config" / "city_ids.json"
+
+def _nombre_limpio(nombre):
+    return nombre.split('(')[0].strip()
+
+def generar_candidatos(city_ids, desde=None, dias_horizonte=DIAS_HORIZONTE):
+    """
+    Todas las combinaciones ruta×fecha desde `desde` (hoy por defecto) y los
+    `dias_horizonte` días siguientes, como tuplas de argumentos de scrape_redbus.
+    """
+    desde = desde or datetime.now().date()
+    candidatos = []
+    for from_name, from_id in city_ids.items():
+        for to_name, to_id in city_ids.items():
+            if from_name == to_name:
+                continue
+            for i in range(dias_horizonte + 1):
+                dia = desde + timedelta(days=i)
+                output_dir = Path(f"data/raw/redbus/{_nombre_limpio(from_name)}/{_nombre_limpio(to_name)}/{MESES_ES[dia.month]}")
+                candidatos.append((from_id, to_id, from_name, to_name, dia.strftime("%d-%b-%Y"), output_dir))
+    return candidatos
+
+def leer_senales(db_path, desde):
+    """
+    Una sola consulta sobre historial_viajes: para cada (origen, destino, fecha_salida)
+    desde `desde` devuelve (n_viajes, último snapshot, cambio relativo medio de
+    precio, cambio relativo medio de asientos). Los cambios son None si ningún
+    viaje tiene dos snapshots.
+    """
+    if not Path(db_path).exists():
+        return {}
+    conn = conectar(db_path, solo_lectura=True)
+    try:
+        filas = conn.execute("""
+            WITH ultimos AS (
+                SELECT h.viaje_id, COALESCE(h.fecha_ultima_vista, h.fecha_snapshot) AS fecha_vista,
+                       h.precio_min, h.asientos_disponibles,
+                       ROW_NUMBER() OVER (PARTITION BY h.viaje_id ORDER BY h.fecha_snapshot DESC) AS n
+                FROM historial_viajes h
+                JOIN viajes v ON v.id = h.viaje_id
+                WHERE v.fecha_salida >= ?
+            )
+            SELECT r.origen, r.destino, v.fecha_salida,
+                   COUNT(*),
+                   MAX(a.fecha_vista),
+                   AVG(CASE WHEN b.precio_min > 0 THEN ABS(a.precio_min - b.precio_min) / b.precio_min END),
+                   AVG(CASE WHEN v.asientos_totales > 0 AND b.viaje_id IS NOT NULL
+                            THEN ABS(a.asientos_disponibles - b.asientos_disponibles) * 1.0 / v.asientos_totales END)
+            FROM ultimos a
+            JOIN viajes v ON v.id = a.viaje_id
+            JOIN rutas r ON r.id = v.ruta_id
+            LEFT JOIN ultimos b ON b.viaje_id = a.viaje_id AND b.n = 2
+            WHERE a.n = 1
+            GROUP BY r.id, v.fecha_salida
+        """, (desde.strftime("%Y-%m-%d"),)).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"❌ No se pudieron leer señales de {db_path}: {e}")
+        return {}
+    finally:
+        conn.close()
+    return {(f[0], f[1], f[2]): f[3:] for f in filas}
+
+def puntuar(dias_para_salida, horas_desde_snapshot, cambio_precio, cambio_asientos):
+    """Puntaje en [0, 1] de una ruta×fecha; `horas_desde_snapshot` es None si nunca se scrapeó."""
+    urgencia = 1.0 / (1.0 + max(0, dias_para_salida) / DIAS_MEDIA_URGENCIA)
+    if horas_desde_snapshot is None:
+        antiguedad = 1.0
+    else:
+        antiguedad = min(1.0, max(0.0, horas_desde_snapshot) / HORAS_ANTIGUEDAD_MAX)
+    if cambio_precio is None and cambio_asientos is None:
+        volatilidad = VOLATILIDAD_DESCONOCIDA
+    else:
+        volatilidad = min(1.0, ((cambio_precio or 0) + (cambio_asientos or 0)) / VOLATILIDAD_REFERENCIA)
+    return antiguedad * (PESO_URGENCIA * urgencia + PESO_VOLATILIDAD * volatilidad + PESO_BASE)
+
+def priorizar(candidatos, db_path, ahora=None):
+    """
+    Devuelve [(puntaje, costo_estimado, tarea)] ordenado de mayor a menor puntaje.
+    El costo es el número de páginas de SearchV4Results que se esperan según los
+    viajes vistos la última vez (1 si la ruta×fecha es nueva).
+    """
+    ahora = ahora or datetime.now()
+    senales = leer_senales(db_path, ahora.date())
+    priorizados = []
+    for tarea in candidatos:
+        fecha = datetime.strptime(tarea[4], "%d-%b-%Y")
+        clave = (_nombre_limpio(tarea[2]), _nombre_limpio(tarea[3]), fecha.strftime("%Y-%m-%d"))
+        n_viajes, ultimo, cambio_precio, cambio_asientos = senales.get(clave, (0, None, None, None))
+        horas = (ahora - datetime.strptime(ultimo, "%Y-%m-%d %H:%M:%S")).total_seconds() / 3600 if ultimo else None
+        puntaje = puntuar((fecha.date() - ahora.date()).days, horas, cambio_precio, cambio_asientos)
+        costo = max(1, math.ceil(n_viajes / TAMANO_PAGINA))
+        priorizados.append((puntaje, costo, tarea))
+    priorizados.sort(key=lambda p: p[0], reverse=True)
+    return priorizados
+
+def seleccionar(priorizados, presupuesto):
+    """Recorre por puntaje y se queda con lo que cabe en `presupuesto` peticiones."""
+    elegidos, gastado = [], 0
+    for puntaje, costo, tarea in priorizados:
+        if puntaje <= 0:
+            break
+        if gastado + costo > presupuesto:
+            continue  # Una ruta grande no bloquea a las pequeñas que aún caben
+        elegidos.append((puntaje, tarea))
+        gastado += costo
+        if gastado >= presupuesto:
+            break
+    return elegidos, gastado
+
+def planificar(db_path, cola_db, presupuesto, dias_horizonte=DIAS_HORIZONTE, city_ids=None, ahora=None):
+    """
+    Puntúa el horizonte, elige lo más valioso dentro del presupuesto y lo encola
+    (reabriendo trabajos ya completados) con el puntaje como prioridad.
+    Devuelve la lista de tareas elegidas.
+    """
+    if city_ids is None:
+        with open(CITY_IDS_PATH, "r", encoding="utf-8") as f:
+            city_ids = json.load(f)
+    ahora = ahora or datetime.now()
+    candidatos = generar_candidatos(city_ids, ahora.date(), dias_horizonte)
+    elegidos, gastado = seleccionar(priorizar(candidatos, db_path, ahora), presupuesto)
+
+    cola = ColaTrabajos(cola_db)
+    encolados = 0
+    # Una llamada por puntaje redondeado: agrupa las tareas sin perder el orden relativo
+    por_prioridad = {}
+    for puntaje, tarea in elegidos:
+        por_prioridad.setdefault(round(puntaje, 4), []).append(tarea)
+    for prioridad, tareas in por_prioridad.items():
+        encolados += cola.encolar(tareas, prioridad=prioridad, reabrir=True)
+
+    logging.info(f"🧭 Planificador: {len(candidatos)} candidatos | {len(elegidos)} elegidos | "
+                 f"~{gastado}/{presupuesto} peticiones | {encolados} encolados o reabiertos en {cola_db}")
+    return [tarea for _, tarea in elegidos]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Encola las ruta×fecha más valiosas según la volatilidad observada.")
+    parser.add_argument("--db", default="data/processed/viajes.db", help="Base con historial_viajes.")
+    parser.add_argument("--cola", default="data/processed/cola_scraping.db")
+    parser.add_argument("--presupuesto", type=int, required=True, help="Peticiones a RedBus para esta pasada.")
+    parser.add_argument("--dias", type=int, default=DIAS_HORIZONTE, help="Horizonte de fechas de salida.")
+    parser.add_argument("--mostrar", type=int, default=0, help="Imprime las N ruta×fecha con más puntaje.")
+    args = parser.parse_args()
+
+    elegidas = planificar(args.db, args.cola, args.presupuesto, args.dias)
+    for tarea in elegidas[:args.mostrar]:
+        print(f"   {tarea[2]} → {tarea[3]} | {tarea[4]}")
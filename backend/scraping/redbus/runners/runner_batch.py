@@ -1,16 +1,26 @@
 # Contenido de ALTO RENDIMIENTO para: backend/scraping/redbus/runners/runner_batch.py
 
+import argparse
+import asyncio
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta
 import sys
 import calendar
 import json
+import time
+import threading
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed # <-- 1. Importamos las herramientas de concurrencia
 
 # Importar las herramientas necesarias
-from ..extractor import scrape_redbus
+from ..extractor import (
+    scrape_redbus, fechas_guardadas, configurar_base_url, configurar_presupuesto, peticiones_realizadas,
+    presupuesto_agotado, PresupuestoAgotado,
+)
+from ...shared.cola_trabajos import ColaTrabajos
+from ...shared.metricas import metricas
+from ..planificador import planificar
 
 # ========== CONFIGURACIÓN DEL LOTE ==========
 logging.basicConfig(
@@ -36,14 +46,38 @@ except (FileNotFoundError, json.JSONDecodeError) as e:
 
 # ========== LÓGICA DE EJECUCIÓN AUTOMÁTICA Y CONCURRENTE ==========
 
-def run_batch_scraping():
+def run_batch_scraping(modo="hilos", tasa=None, cola_db=None, presupuesto=None, db_path="data/processed/viajes.db"):
     """
     Ejecuta el scraping de forma concurrente para ser mucho más rápido.
+    modo="hilos" usa el ThreadPoolExecutor con scrape_redbus; modo="async" usa
+    un único event loop con pool de conexiones y limitador de tasa global
+    (`tasa` peticiones/s) en lugar de sleeps por hilo.
+    Con `cola_db` las tareas se encolan en una cola SQLite persistente y se
+    consumen con leases: se puede relanzar tras una caída o arrancar varios
+    procesos (o máquinas) sobre la misma cola.
+    Con `presupuesto` no se recorre el mes fijo: el planificador elige las
+    ruta×fecha más valiosas según historial_viajes (`db_path`) y las encola.
+    Sólo se consumen esos trabajos (no lo que otras pasadas dejaron en la cola)
+    y se para al llegar a `presupuesto` peticiones HTTP reales, páginas
+    siguientes y reintentos incluidos.
     """
+    if presupuesto:
+        cola_db = cola_db or "data/processed/cola_scraping.db"
+        logging.info(f"🧭 INICIANDO SCRAPING PLANIFICADO (modo {modo}) | presupuesto: {presupuesto} peticiones")
+        elegidas = planificar(db_path, cola_db, presupuesto)
+        ids = ColaTrabajos(cola_db).ids_de(elegidas)
+        configurar_presupuesto(presupuesto)
+        try:
+            _run_cola([], cola_db, modo, tasa, ids=ids)
+        finally:
+            logging.info(f"💸 Peticiones realizadas: {peticiones_realizadas()}/{presupuesto}")
+            configurar_presupuesto(None)
+        return
+
     meses_es = {7: "julio"}
     nombre_mes_str = meses_es.get(TARGET_MONTH, f"mes_{TARGET_MONTH}")
 
-    logging.info(f"🚀 INICIANDO SCRAPING CONCURRENTE (hasta {MAX_WORKERS} trabajadores) PARA: {nombre_mes_str.capitalize()} {TARGET_YEAR}")
+    logging.info(f"🚀 INICIANDO SCRAPING CONCURRENTE (modo {modo}) PARA: {nombre_mes_str.capitalize()} {TARGET_YEAR}")
 
     all_cities = list(city_ids.keys())
     
@@ -55,6 +89,7 @@ def run_batch_scraping():
 
     # --- 2. PREPARAMOS TODAS LAS TAREAS ANTES DE EMPEZAR ---
     tasks_to_run = []
+    fechas_por_carpeta = {}  # Un solo listado/lectura de índice por ruta y mes
     for from_name in all_cities:
         for to_name in all_cities:
             if from_name == to_name:
@@ -66,10 +101,11 @@ def run_batch_scraping():
             for date_str in fechas_mes:
                 output_dir = Path(f"data/raw/redbus/{from_name_clean}/{to_name_clean}/{nombre_mes_str}")
                 fecha_archivo = datetime.strptime(date_str, "%d-%b-%Y").strftime("%Y%m%d")
-                archivo_json = output_dir / f"api_response_{fecha_archivo}.json"
+                if output_dir not in fechas_por_carpeta:
+                    fechas_por_carpeta[output_dir] = fechas_guardadas(output_dir)
 
-                # Si el archivo ya existe, no lo añadimos a la lista de tareas
-                if archivo_json.exists():
+                # Si la fecha ya está guardada (JSON o shard), no la añadimos a la lista de tareas
+                if fecha_archivo in fechas_por_carpeta[output_dir]:
                     continue
                 
                 # Añadimos una tupla con todos los argumentos que necesita scrape_redbus
@@ -77,12 +113,20 @@ def run_batch_scraping():
                     city_ids[from_name], city_ids[to_name], from_name, to_name, date_str, output_dir
                 ))
 
+    if cola_db:
+        _run_cola(tasks_to_run, cola_db, modo, tasa)
+        return
+
     if not tasks_to_run:
         logging.info("✅ No hay tareas nuevas que ejecutar. ¡Todo está al día!")
         return
 
     logging.info(f"📰 Tareas pendientes encontradas: {len(tasks_to_run)}")
 
+    if modo == "async":
+        _run_async(tasks_to_run, tasa)
+        return
+
     # --- 3. EJECUTAMOS LAS TAREAS CON EL EQUIPO DE TRABAJADORES ---
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         # Creamos un diccionario para mapear futuros a sus argumentos
@@ -105,5 +149,176 @@ def run_batch_scraping():
 
     logging.info("\n✅✅✅ PROCESO CONCURRENTE COMPLETADO ✅✅✅")
 
+def _run_async(tasks_to_run, tasa):
+    # Import diferido: aiohttp sólo es necesario en este modo
+    from ..extractor_async import ejecutar_tareas_async, TASA_POR_SEGUNDO
+
+    progress_bar = tqdm(total=len(tasks_to_run), desc="Procesando rutas (async)")
+    exitos, fallos = asyncio.run(ejecutar_tareas_async(
+        tasks_to_run, tasa=tasa or TASA_POR_SEGUNDO, al_terminar=lambda tarea, ok: progress_bar.update(1)
+    ))
+    progress_bar.close()
+    logging.info(f"\n✅✅✅ PROCESO ASÍNCRONO COMPLETADO | Éxitos: {exitos} | Fallos: {fallos} ✅✅✅")
+
+# ========== MODO COLA (REANUDABLE, MULTI-PROCESO) ==========
+
+def _run_cola(tasks_to_run, cola_db, modo, tasa, ids=None):
+    """Encola `tasks_to_run` y drena la cola (o sólo los trabajos `ids`, si se dan)."""
+    cola = ColaTrabajos(cola_db)
+    nuevas = cola.encolar(tasks_to_run)
+    logging.info(f"📥 Cola {cola_db}: {nuevas} tareas nuevas encoladas | worker {cola.worker_id}")
+
+    if modo == "async":
+        exitos, fallos = asyncio.run(_consumir_cola_async(cola, tasa, ids))
+    else:
+        exitos, fallos = _consumir_cola_hilos(cola, ids)
+
+    e = cola.estado()["por_estado"]
+    logging.info(f"\n✅✅✅ COLA DRENADA | Éxitos: {exitos} | Reintentos/fallos: {fallos} | "
+                 f"Completados: {e['completado']} | Fallidos definitivos: {e['fallido']} ✅✅✅")
+
+def _esperar_trabajo(cola, ids=None):
+    """Duerme hasta que haya trabajo listo. Devuelve False cuando la cola está drenada o no queda presupuesto."""
+    while True:
+        espera = cola.proximo_disponible(ids)
+        if espera is None or presupuesto_agotado():
+            return False
+        if espera == 0:
+            return True
+        # Trabajos en backoff o en curso en otro worker: se vuelve a mirar cada poco
+        time.sleep(min(espera, 30))
+
+def _registrar_resultado(cola, trabajo_id, intento, task_args, ok, error):
+    """
+    Completa o falla el trabajo. Devuelve False si el lease se perdió (otro
+    worker lo retomó): ese resultado no cuenta como éxito ni como fallo.
+    """
+    registrado = cola.completar(trabajo_id, intento) if ok else cola.fallar(trabajo_id, intento, error)
+    if not registrado:
+        logging.warning(f"⚠️ Lease perdido: {task_args[2]}->{task_args[3]} en {task_args[4]} "
+                        f"(trabajo {trabajo_id}) lo retomó otro worker; se descarta este resultado.")
+    return registrado
+
+def _devolver_sin_presupuesto(cola, trabajo_id, intento, task_args):
+    logging.info(f"💸 Presupuesto agotado: {task_args[2]}->{task_args[3]} en {task_args[4]} vuelve a la cola sin gastar intento.")
+    cola.liberar(trabajo_id, intento)
+
+def _consumir_cola_hilos(cola, ids=None):
+    contadores = {"exitos": 0, "fallos": 0}
+    lock = threading.Lock()
+    progress_bar = tqdm(desc="Procesando cola")
+
+    def _worker(latido):
+        while not presupuesto_agotado():
+            tomados = cola.tomar(1, ids)
+            if not tomados:
+                if not _esperar_trabajo(cola, ids):
+                    return
+                continue
+            trabajo_id, task_args, intento = tomados[0]
+            latido.agregar(trabajo_id, intento)
+            try:
+                ok = scrape_redbus(*task_args)
+                error = None if ok else "sin respuesta guardada"
+            except PresupuestoAgotado:
+                _devolver_sin_presupuesto(cola, trabajo_id, intento, task_args)
+                return
+            except Exception as exc:
+                logging.error(f'❌ Tarea {task_args[2]}->{task_args[3]} en {task_args[4]} generó una excepción: {exc}')
+                ok, error = False, str(exc)
+            finally:
+                latido.quitar(trabajo_id)
+            if not _registrar_resultado(cola, trabajo_id, intento, task_args, ok, error):
+                continue
+            with lock:
+                contadores["exitos" if ok else "fallos"] += 1
+                progress_bar.update(1)
+
+    with cola.latido() as latido, ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for future in [executor.submit(_worker, latido) for _ in range(MAX_WORKERS)]:
+            future.result()
+    progress_bar.close()
+    return contadores["exitos"], contadores["fallos"]
+
+async def _consumir_cola_async(cola, tasa, ids=None):
+    from ..extractor_async import crear_sesion, scrape_redbus_async, TASA_POR_SEGUNDO, MAX_CONEXIONES
+    from ...shared.rate_limiter import TokenBucket
+
+    limitador = TokenBucket(tasa or TASA_POR_SEGUNDO)
+    exitos = fallos = 0
+    progress_bar = tqdm(desc="Procesando cola (async)")
+
+    async def _una(trabajo_id, task_args, intento):
+        nonlocal exitos, fallos
+        latido.agregar(trabajo_id, intento)
+        try:
+            ok = await scrape_redbus_async(session, limitador, *task_args)
+            error = None if ok else "sin respuesta guardada"
+        except PresupuestoAgotado:
+            await asyncio.to_thread(_devolver_sin_presupuesto, cola, trabajo_id, intento, task_args)
+            return
+        except Exception as exc:
+            logging.error(f'❌ Tarea {task_args[2]}->{task_args[3]} en {task_args[4]} generó una excepción: {exc}')
+            ok, error = False, str(exc)
+        finally:
+            latido.quitar(trabajo_id)
+        # Las operaciones de la cola son SQLite síncrono: fuera del event loop
+        if not await asyncio.to_thread(_registrar_resultado, cola, trabajo_id, intento, task_args, ok, error):
+            return
+        if ok:
+            exitos += 1
+        else:
+            fallos += 1
+        progress_bar.update(1)
+
+    # Una tarea puede pasar varias pausas del limitador (403: 60–120 s por intento):
+    # el latido mantiene su lease mientras tanto
+    with cola.latido() as latido:
+        async with crear_sesion(MAX_CONEXIONES) as session:
+            en_vuelo = set()
+            while True:
+                # Se reservan sólo los trabajos que caben en vuelo, para no retener leases de más
+                libres = 0 if presupuesto_agotado() else MAX_CONEXIONES * 2 - len(en_vuelo)
+                tomados = await asyncio.to_thread(cola.tomar, libres, ids) if libres > 0 else []
+                for trabajo_id, task_args, intento in tomados:
+                    en_vuelo.add(asyncio.create_task(_una(trabajo_id, task_args, intento)))
+                if en_vuelo:
+                    _, en_vuelo = await asyncio.wait(en_vuelo, timeout=5, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                if not await asyncio.to_thread(_esperar_trabajo, cola, ids):
+                    break
+    progress_bar.close()
+    return exitos, fallos
+
 if __name__ == "__main__":
-    run_batch_scraping()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scraping por lotes de RedBus para el mes configurado.")
+    parser.add_argument("--modo", choices=["hilos", "async"], default="hilos",
+                        help="'hilos' (ThreadPoolExecutor) o 'async' (aiohttp + limitador global).")
+    parser.add_argument("--tasa", type=float, default=None,
+                        help="Peticiones por segundo en modo async.")
+    parser.add_argument("--cola", metavar="DB_PATH", default=None,
+                        help="Usa una cola SQLite persistente (p. ej. data/processed/cola_scraping.db): "
+                             "reanudable y compartible entre procesos.")
+    parser.add_argument("--presupuesto", type=int, default=None,
+                        help="Peticiones a gastar en las ruta×fecha más valiosas según el historial "
+                             "(en lugar de todo el mes configurado). Usa la cola.")
+    parser.add_argument("--db", default="data/processed/viajes.db",
+                        help="Base con historial_viajes que usa el planificador.")
+    parser.add_argument("--base-url", default=None,
+                        help="Endpoint alternativo de SearchV4Results (p. ej. el simulador local "
+                             "http://127.0.0.1:8780/search/SearchV4Results).")
+    parser.add_argument("--metricas", metavar="DIR", default=None,
+                        help="Exporta latencias por petición, pausas, escrituras y resultados a DIR "
+                             "(scraper.prom para Prometheus y un JSON por corrida).")
+    args = parser.parse_args()
+    if args.base_url:
+        configurar_base_url(args.base_url)
+    inicio = time.perf_counter()
+    try:
+        run_batch_scraping(modo=args.modo, tasa=args.tasa, cola_db=args.cola,
+                           presupuesto=args.presupuesto, db_path=args.db)
+    finally:
+        # También tras un Ctrl+C: una corrida interrumpida es justo la que interesa mirar
+        if args.metricas:
+            metricas.exportar(args.metricas, "scraper", prefijo="scraper_",
+                              extra={"modo": args.modo, "segundos": round(time.perf_counter() - inicio, 3)})
\ No newline at end of file
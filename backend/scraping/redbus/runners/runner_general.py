@@ -8,7 +8,7 @@ import sys
 import calendar # Módulo necesario para calcular los días del mes
 
 # ... (el resto de los imports y la configuración de logging no cambian) ...
-from ..extractor import scrape_redbus
+from ..extractor import scrape_redbus, fechas_guardadas
 
 logging.basicConfig(
     level=logging.INFO,
@@ -124,11 +124,9 @@ for i, fecha_str in enumerate(fechas, start=1):
         fecha_archivo = fecha_obj.strftime("%Y%m%d")
 
         output_dir = Path(f"data/raw/redbus/{from_name_clean}/{to_name_clean}/{nombre_mes}")
-        output_dir.mkdir(parents=True, exist_ok=True)
 
-        archivo_json = output_dir / f"api_response_{fecha_archivo}.json"
-        if archivo_json.exists():
-            logging.info(f"📁 Ya existe: {archivo_json}, saltando...")
+        if fecha_archivo in fechas_guardadas(output_dir):
+            logging.info(f"📁 Ya existe: {output_dir} ({fecha_archivo}), saltando...")
             continue
 
         logging.info(f"📆 Procesando fecha {i}/{total}: {fecha_str}")
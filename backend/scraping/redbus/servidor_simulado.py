@@ -0,0 +1,196 @@
+# Contenido para: backend/scraping/redbus/servidor_simulado.py
+# Servidor local que se hace pasar por /search/SearchV4Results de redbus.pe para
+# probar el extractor (hilos, async, cola) sin salir de la máquina.
+#
+# - Responde con lo ya scrapeado en data/raw/redbus (JSON sueltos o shards),
+#   buscando por fromCity/toCity (ids de city_ids.json, o src/dst por nombre)
+#   y DOJ. Si no hay datos para esa fecha devuelve 0 inventarios, como la API real.
+# - Pagina con limit/offset y metaData.totalCount (--max-por-pagina fuerza
+#   páginas pequeñas aunque el cliente pida más).
+# - Inyecta latencia (--latencia-ms ± --jitter-ms), 429/403/500 con
+#   probabilidades dadas y, opcionalmente, un límite real de peticiones/s que
+#   responde 429 al excederse.
+# - GET /__estadisticas devuelve los contadores (por código, páginas, aciertos);
+#   ?reiniciar=1 los pone a cero.
+#
+# Uso: python -m backend.scraping.redbus.servidor_simulado --puerto 8780 --tasa-429 0.05 --latencia-ms 80
+#      python -m backend.scraping.redbus.runners.runner_batch --modo async \
+#             --base-url http://127.0.0.1:8780/search/SearchV4Results
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+from collections import Counter, OrderedDict
+
+from aiohttp import web
+
+from ..shared.shards import PATRON_ARCHIVO, EXTENSION_SHARD, leer_indice, leer_registro
+
+CITY_IDS_PATH = Path(__file__).parent / "config" / "city_ids.json"
+RUTA_BUSQUEDA = "/search/SearchV4Results"
+MAX_POR_PAGINA = 20
+RESPUESTAS_EN_MEMORIA = 256
+
+def _nombre_ciudad(nombre):
+    return str(nombre).split("(")[0].strip()
+
+class ServidorRedBus:
+    """Estado del simulador: índice de respuestas, fallos configurados y contadores."""
+
+    def __init__(self, carpeta="data/raw/redbus", latencia_ms=0.0, jitter_ms=0.0, tasa_429=0.0, tasa_403=0.0,
+                 tasa_500=0.0, limite_rps=None, max_por_pagina=MAX_POR_PAGINA, semilla=None):
+        self.carpeta = Path(carpeta)
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.tasas = ((429, tasa_429), (403, tasa_403), (500, tasa_500))
+        self.limite_rps = limite_rps
+        self.max_por_pagina = max_por_pagina
+        self.rng = random.Random(semilla)
+        self._fichas = float(limite_rps or 0)
+        self._ultimo = time.monotonic()
+        self._respuestas = OrderedDict()
+        with open(CITY_IDS_PATH, "r", encoding="utf-8") as f:
+            self.ciudad_por_id = {str(id_): _nombre_ciudad(nombre) for nombre, id_ in json.load(f).items()}
+        self.indice = self.indexar()
+        self.estadisticas = Counter()
+
+    # --- ÍNDICE DE RESPUESTAS ---
+
+    def indexar(self):
+        """
+        {(origen, destino, 'YYYYMMDD'): ubicación} con ubicación = ruta de un JSON
+        o (shard, offset, longitud). Si una fecha se re-scrapeó gana lo último.
+        """
+        indice = {}
+        for raiz, _, archivos in os.walk(self.carpeta):
+            relativa = Path(raiz).relative_to(self.carpeta).parts
+            for nombre in sorted(archivos):
+                ruta = os.path.join(raiz, nombre)
+                coincidencia = PATRON_ARCHIVO.search(nombre)
+                if coincidencia and len(relativa) == 3:
+                    indice[(relativa[0], relativa[1], coincidencia.group(1))] = ruta
+                elif nombre.endswith(EXTENSION_SHARD) and len(relativa) == 2:
+                    for entrada in leer_indice(ruta):
+                        indice[(relativa[0], relativa[1], entrada["fecha"])] = (ruta, entrada["offset"], entrada["longitud"])
+        logging.info(f"🗂️ Simulador: {len(indice)} respuestas indexadas desde {self.carpeta}")
+        return indice
+
+    def leer_respuesta(self, ubicacion):
+        """Respuesta completa de una ubicación, con una pequeña caché LRU."""
+        clave = ubicacion if isinstance(ubicacion, tuple) else (ubicacion,)
+        if clave in self._respuestas:
+            self._respuestas.move_to_end(clave)
+            return self._respuestas[clave]
+        if isinstance(ubicacion, tuple):
+            data = leer_registro(*ubicacion).get("respuesta") or {}
+        else:
+            with open(ubicacion, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        self._respuestas[clave] = data
+        if len(self._respuestas) > RESPUESTAS_EN_MEMORIA:
+            self._respuestas.popitem(last=False)
+        return data
+
+    def respuesta(self, origen, destino, fecha, limit, offset):
+        """Página `offset`/`limit` de la respuesta guardada (o una vacía) con totalCount del total."""
+        ubicacion = self.indice.get((origen, destino, fecha))
+        self.estadisticas["aciertos" if ubicacion else "sin_datos"] += 1
+        data = self.leer_respuesta(ubicacion) if ubicacion else {"parentSrcCityName": origen, "parentDstCityName": destino,
+                                                        "metaData": {}, "inventories": []}
+        inventarios = data.get("inventories") or []
+        tamano = max(1, min(limit, self.max_por_pagina))
+        pagina = {k: v for k, v in data.items() if k not in ("inventories", "fechaScrapeo", "paginasDescargadas")}
+        pagina["metaData"] = {**(data.get("metaData") or {}), "totalCount": len(inventarios)}
+        pagina["inventories"] = inventarios[offset:offset + tamano]
+        return pagina
+
+    # --- FALLOS INYECTADOS ---
+
+    def _excede_limite(self):
+        if not self.limite_rps:
+            return False
+        ahora = time.monotonic()
+        self._fichas = min(self.limite_rps, self._fichas + (ahora - self._ultimo) * self.limite_rps)
+        self._ultimo = ahora
+        if self._fichas < 1:
+            return True
+        self._fichas -= 1
+        return False
+
+    def _fallo(self):
+        if self._excede_limite():
+            self.estadisticas["limite_rps"] += 1
+            return 429
+        tirada = self.rng.random()
+        for codigo, tasa in self.tasas:
+            if tirada < tasa:
+                return codigo
+            tirada -= tasa
+        return None
+
+    # --- HTTP ---
+
+    async def buscar(self, request):
+        self.estadisticas["peticiones"] += 1
+        if self.latencia_ms or self.jitter_ms:
+            await asyncio.sleep(max(0.0, self.rng.gauss(self.latencia_ms, self.jitter_ms)) / 1000)
+
+        codigo = self._fallo()
+        if codigo:
+            self.estadisticas[str(codigo)] += 1
+            return web.json_response({"error": f"simulado {codigo}"}, status=codigo)
+
+        q = request.query
+        origen = self.ciudad_por_id.get(q.get("fromCity", ""), _nombre_ciudad(q.get("src", "")))
+        destino = self.ciudad_por_id.get(q.get("toCity", ""), _nombre_ciudad(q.get("dst", "")))
+        try:
+            fecha = datetime.strptime(q.get("DOJ", ""), "%d-%b-%Y").strftime("%Y%m%d")
+            limit, offset = int(q.get("limit", MAX_POR_PAGINA)), int(q.get("offset", 0))
+        except ValueError:
+            self.estadisticas["400"] += 1
+            return web.json_response({"error": "parámetros inválidos"}, status=400)
+
+        pagina = self.respuesta(origen, destino, fecha, limit, offset)
+        self.estadisticas["200"] += 1
+        self.estadisticas["paginas_siguientes" if offset else "primeras_paginas"] += 1
+        respuesta = web.json_response(pagina)
+        respuesta.enable_compression()
+        return respuesta
+
+    async def ver_estadisticas(self, request):
+        datos = dict(self.estadisticas)
+        if request.query.get("reiniciar"):
+            self.estadisticas.clear()
+        return web.json_response(datos)
+
+    def aplicacion(self):
+        app = web.Application()
+        app.router.add_route("POST", RUTA_BUSQUEDA, self.buscar)
+        app.router.add_route("GET", RUTA_BUSQUEDA, self.buscar)
+        app.router.add_get("/__estadisticas", self.ver_estadisticas)
+        return app
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Simulador local de SearchV4Results a partir de data/raw/redbus.")
+    parser.add_argument("--carpeta", default="data/raw/redbus")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8780)
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia media por petición.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Desviación estándar de la latencia.")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Probabilidad de responder 429.")
+    parser.add_argument("--tasa-403", type=float, default=0.0, help="Probabilidad de responder 403.")
+    parser.add_argument("--tasa-500", type=float, default=0.0, help="Probabilidad de responder 500.")
+    parser.add_argument("--limite-rps", type=float, default=None, help="Peticiones/s aceptadas; el exceso recibe 429.")
+    parser.add_argument("--max-por-pagina", type=int, default=MAX_POR_PAGINA)
+    parser.add_argument("--semilla", type=int, default=None)
+    args = parser.parse_args()
+    servidor = ServidorRedBus(args.carpeta, args.latencia_ms, args.jitter_ms, args.tasa_429, args.tasa_403,
+                              args.tasa_500, args.limite_rps, args.max_por_pagina, args.semilla)
+    logging.info(f"🚏 Simulador en http://{args.host}:{args.puerto}{RUTA_BUSQUEDA}")
+    web.run_app(servidor.aplicacion(), host=args.host, port=args.puerto, print=None)
@@ -0,0 +1,109 @@
+# Contenido para: backend/scraping/shared/almacen_contenido.py
+# Almacén direccionado por contenido para respuestas de APIs e imágenes.
+#
+# Cada objeto se guarda una sola vez bajo el SHA-256 de sus bytes
+# (<raiz>/objetos/ab/abcdef....json); dos descargas idénticas (el mismo logo
+# para varias empresas, la misma respuesta de clima) ocupan un solo archivo.
+# Un índice SQLite en <raiz>/indice.db relaciona cada petición (una clave
+# estable, p. ej. la URL sin la API key) con el hash de lo que devolvió, así que
+# volver a ejecutar un descargador no sale a la red si la petición ya está.
+import os
+import time
+import hashlib
+import sqlite3
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+
+def hash_contenido(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+def clave_peticion(*partes):
+    """Clave estable de una petición a partir de sus partes (URL, parámetros ordenados...)."""
+    return hashlib.sha256("\x1f".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+
+def ruta_objeto(raiz, hash_, extension=""):
+    """Ruta de un objeto en disco; sirve para leer sin abrir el índice (p. ej. desde el frontend)."""
+    return Path(raiz) / "objetos" / hash_[:2] / f"{hash_}{extension}"
+
+class AlmacenContenido:
+    """Objetos por SHA-256 en disco + índice petición → hash en SQLite."""
+
+    def __init__(self, raiz):
+        self.raiz = Path(raiz)
+        (self.raiz / "objetos").mkdir(parents=True, exist_ok=True)
+        self.db_path = str(self.raiz / "indice.db")
+        self.crear_tablas()
+
+    @contextmanager
+    def _conexion(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def crear_tablas(self):
+        with self._conexion() as conn:
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS peticiones (
+                clave TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                extension TEXT NOT NULL,
+                origen TEXT,
+                obtenido_en REAL NOT NULL
+            );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_peticiones_hash ON peticiones(hash);")
+
+    # --- OBJETOS ---
+
+    def ruta(self, hash_, extension=""):
+        return ruta_objeto(self.raiz, hash_, extension)
+
+    def guardar(self, datos, extension=""):
+        """Guarda los bytes (si no estaban ya) y devuelve su hash."""
+        hash_ = hash_contenido(datos)
+        destino = self.ruta(hash_, extension)
+        if not destino.exists():
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            temporal = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+            temporal.write_bytes(datos)
+            os.replace(temporal, destino)
+        return hash_
+
+    def leer(self, hash_, extension=""):
+        return self.ruta(hash_, extension).read_bytes()
+
+    # --- ÍNDICE DE PETICIONES ---
+
+    def registrar(self, clave, datos, extension="", origen=None):
+        """Guarda la respuesta de una petición y la asocia a `clave`. Devuelve el hash."""
+        hash_ = self.guardar(datos, extension)
+        with self._conexion() as conn:
+            conn.execute("""
+                INSERT INTO peticiones (clave, hash, extension, origen, obtenido_en) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(clave) DO UPDATE SET hash = excluded.hash, extension = excluded.extension,
+                                                 origen = excluded.origen, obtenido_en = excluded.obtenido_en
+            """, (clave, hash_, extension, origen, time.time()))
+        return hash_
+
+    def buscar(self, clave):
+        """(hash, extension) de una petición ya guardada, o None."""
+        with self._conexion() as conn:
+            fila = conn.execute("SELECT hash, extension FROM peticiones WHERE clave = ?", (clave,)).fetchone()
+        if fila and not self.ruta(*fila).exists():
+            logging.warning(f"⚠️ Objeto {fila[0]} indexado pero ausente en disco; se volverá a pedir.")
+            return None
+        return fila
+
+    def obtener(self, clave):
+        """Bytes de una petición ya guardada, o None."""
+        encontrado = self.buscar(clave)
+        return self.leer(*encontrado) if encontrado else None
+
+    def estadisticas(self):
+        with self._conexion() as conn:
+            peticiones, objetos = conn.execute("SELECT COUNT(*), COUNT(DISTINCT hash) FROM peticiones").fetchone()
+        return {"peticiones": peticiones, "objetos": objetos}
@@ -0,0 +1,367 @@
+# Contenido para: backend/scraping/shared/cola_trabajos.py
+# Cola persistente de trabajos de scraping sobre SQLite.
+#
+# Cada trabajo es una combinación ruta × fecha. Los runners toman trabajos con
+# un lease (préstamo con vencimiento): si el proceso muere, el lease expira y
+# otro runner lo retoma. Los fallos se reintentan con backoff exponencial hasta
+# MAX_INTENTOS. Varios procesos (o máquinas que comparten el archivo) pueden
+# trabajar sobre la misma cola: la toma de trabajos es un único UPDATE ...
+# RETURNING dentro de BEGIN IMMEDIATE. Mientras una tarea corre, un Latido
+# renueva su lease; completar/fallar sólo tienen efecto si la toma sigue siendo
+# de este worker (worker + número de intento), así un worker rezagado no pisa
+# el resultado de quien retomó el trabajo.
+#
+# Nota: para compartir el archivo por red se mantiene el journal por defecto
+# (DELETE); WAL necesita memoria compartida y no funciona sobre NFS/SMB.
+import os
+import json
+import time
+import random
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+
+ESTADOS = ("pendiente", "en_curso", "completado", "fallido")
+LEASE_SEGUNDOS = 180
+MAX_INTENTOS = 5
+BACKOFF_BASE = 30       # Segundos antes del primer reintento
+BACKOFF_MAXIMO = 3600
+
+def id_worker_por_defecto():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class ColaTrabajos:
+    """Cola de trabajos de scraping respaldada por un archivo SQLite."""
+
+    def __init__(self, db_path, worker_id=None, lease_segundos=LEASE_SEGUNDOS, max_intentos=MAX_INTENTOS):
+        self.db_path = str(db_path)
+        self.worker_id = worker_id or id_worker_por_defecto()
+        self.lease_segundos = lease_segundos
+        self.max_intentos = max_intentos
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.crear_tablas()
+
+    @contextmanager
+    def _conexion(self):
+        # Una conexión corta por operación: la cola se usa desde varios hilos
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaccion(self):
+        with self._conexion() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def crear_tablas(self):
+        with self._conexion() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS trabajos_scraping (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_city_id INTEGER NOT NULL,
+                to_city_id INTEGER NOT NULL,
+                origen TEXT NOT NULL,
+                destino TEXT NOT NULL,
+                fecha TEXT NOT NULL,
+                output_dir TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pendiente' CHECK(estado IN ('pendiente', 'en_curso', 'completado', 'fallido')),
+                prioridad REAL NOT NULL DEFAULT 0,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                disponible_desde REAL NOT NULL DEFAULT 0,
+                lease_hasta REAL,
+                worker TEXT,
+                ultimo_error TEXT,
+                creado_en REAL NOT NULL,
+                actualizado_en REAL NOT NULL,
+                completado_en REAL,
+                UNIQUE(origen, destino, fecha)
+            );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_cola ON trabajos_scraping(estado, prioridad DESC, disponible_desde);")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_completado ON trabajos_scraping(completado_en);")
+
+    # --- PRODUCTORES ---
+
+    def encolar(self, tareas, prioridad=0, reabrir=False):
+        """
+        Encola tuplas con los argumentos de scrape_redbus
+        (from_city_id, to_city_id, from_name, to_name, date_str, output_dir).
+        Los trabajos que ya existen no se duplican; con `reabrir=True` los
+        completados o fallidos vuelven a 'pendiente' (p. ej. para refrescar precios)
+        y los que seguían pendientes toman la nueva prioridad, sin tocar sus
+        intentos ni su backoff. Devuelve cuántos trabajos quedaron nuevos o reabiertos.
+        """
+        ahora = time.time()
+        filas = [(t[0], t[1], t[2], t[3], t[4], str(t[5]), prioridad, ahora, ahora) for t in tareas]
+        accion = """DO UPDATE SET estado = 'pendiente', intentos = 0, disponible_desde = 0, prioridad = excluded.prioridad,
+                        ultimo_error = NULL, actualizado_en = excluded.actualizado_en
+                    WHERE estado IN ('completado', 'fallido')""" if reabrir else "DO NOTHING"
+        with self._transaccion() as conn:
+            antes = conn.total_changes
+            conn.executemany(f"""
+                INSERT INTO trabajos_scraping (from_city_id, to_city_id, origen, destino, fecha, output_dir, prioridad, creado_en, actualizado_en)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(origen, destino, fecha) {accion}
+            """, filas)
+            nuevos = conn.total_changes - antes
+            if reabrir:
+                # Pendientes de una pasada anterior (interrumpida o sin presupuesto): puntaje vigente
+                conn.executemany("""
+                    UPDATE trabajos_scraping SET prioridad = ?, actualizado_en = ?
+                    WHERE origen = ? AND destino = ? AND fecha = ? AND estado = 'pendiente' AND prioridad <> ?
+                """, [(prioridad, ahora, t[2], t[3], t[4], prioridad) for t in tareas])
+            return nuevos
+
+    def ids_de(self, tareas):
+        """Ids de los trabajos de `tareas` (las tuplas que se encolaron), p. ej. para consumir sólo esos."""
+        with self._conexion() as conn:
+            return [fila[0] for t in tareas for fila in conn.execute(
+                "SELECT id FROM trabajos_scraping WHERE origen = ? AND destino = ? AND fecha = ?", (t[2], t[3], t[4]))]
+
+    # --- CONSUMIDORES ---
+    # `ids` (opcional) restringe los consumidores a un subconjunto de la cola, p. ej.
+    # los trabajos que eligió el planificador en esta pasada.
+    _FILTRO_IDS = "(? IS NULL OR id IN (SELECT value FROM json_each(?)))"
+
+    @staticmethod
+    def _parametros_ids(ids):
+        lista = None if ids is None else json.dumps(sorted(ids))
+        return lista, lista
+
+    def tomar(self, n=1, ids=None):
+        """
+        Reserva hasta `n` trabajos para este worker: pendientes cuyo backoff ya
+        venció o en curso con lease expirado, por prioridad. Devuelve una lista de
+        (id, tarea, intento) donde tarea es la tupla de argumentos de scrape_redbus
+        e intento identifica esta toma: hay que pasarlo a completar/fallar.
+        """
+        ahora = time.time()
+        with self._transaccion() as conn:
+            filas = conn.execute(f"""
+                UPDATE trabajos_scraping
+                SET estado = 'en_curso', worker = ?, lease_hasta = ?, intentos = intentos + 1, actualizado_en = ?
+                WHERE id IN (
+                    SELECT id FROM trabajos_scraping
+                    WHERE ((estado = 'pendiente' AND disponible_desde <= ?)
+                           OR (estado = 'en_curso' AND lease_hasta < ?))
+                      AND {self._FILTRO_IDS}
+                    ORDER BY prioridad DESC, id
+                    LIMIT ?
+                )
+                RETURNING id, from_city_id, to_city_id, origen, destino, fecha, output_dir, prioridad, intentos
+            """, (self.worker_id, ahora + self.lease_segundos, ahora, ahora, ahora, *self._parametros_ids(ids), n)).fetchall()
+        filas.sort(key=lambda f: (-f[7], f[0]))
+        return [(f[0], tuple(f[1:7]), f[8]) for f in filas]
+
+    # Condición de propiedad: la toma (worker, intento) sigue vigente
+    _ES_MIA = "id = ? AND estado = 'en_curso' AND worker = ? AND intentos = ?"
+
+    def renovar_lease(self, trabajo_id, intento):
+        """Extiende el lease de un trabajo largo; False si otro worker ya lo retomó."""
+        return not self.renovar_leases({trabajo_id: intento})
+
+    def renovar_leases(self, tomas):
+        """Extiende en una transacción los leases de {id: intento}; devuelve los ids perdidos."""
+        ahora = time.time()
+        perdidos = set()
+        with self._transaccion() as conn:
+            for trabajo_id, intento in tomas.items():
+                cur = conn.execute(f"""
+                    UPDATE trabajos_scraping SET lease_hasta = ?, actualizado_en = ? WHERE {self._ES_MIA}
+                """, (ahora + self.lease_segundos, ahora, trabajo_id, self.worker_id, intento))
+                if cur.rowcount != 1:
+                    perdidos.add(trabajo_id)
+        return perdidos
+
+    def latido(self, intervalo=None):
+        """Latido que mantiene vivos los leases de este worker (ver Latido)."""
+        return Latido(self, intervalo)
+
+    def completar(self, trabajo_id, intento):
+        """Marca el trabajo como completado. False si la toma ya no era de este worker (lease perdido)."""
+        ahora = time.time()
+        with self._transaccion() as conn:
+            cur = conn.execute(f"""
+                UPDATE trabajos_scraping
+                SET estado = 'completado', lease_hasta = NULL, ultimo_error = NULL, completado_en = ?, actualizado_en = ?
+                WHERE {self._ES_MIA}
+            """, (ahora, ahora, trabajo_id, self.worker_id, intento))
+            return cur.rowcount == 1
+
+    def fallar(self, trabajo_id, intento, error=None):
+        """
+        Devuelve el trabajo a la cola con backoff exponencial, o lo marca 'fallido'
+        si agotó los intentos. False si la toma ya no era de este worker.
+        """
+        ahora = time.time()
+        with self._transaccion() as conn:
+            fila = conn.execute(f"SELECT intentos FROM trabajos_scraping WHERE {self._ES_MIA}",
+                                (trabajo_id, self.worker_id, intento)).fetchone()
+            if fila is None:
+                return False
+            intentos = fila[0]
+            if intentos >= self.max_intentos:
+                conn.execute(f"""
+                    UPDATE trabajos_scraping SET estado = 'fallido', lease_hasta = NULL, ultimo_error = ?, actualizado_en = ?
+                    WHERE {self._ES_MIA}
+                """, (error, ahora, trabajo_id, self.worker_id, intento))
+                return True
+            espera = min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** (intentos - 1)) * random.uniform(0.8, 1.2)
+            conn.execute(f"""
+                UPDATE trabajos_scraping
+                SET estado = 'pendiente', lease_hasta = NULL, disponible_desde = ?, ultimo_error = ?, actualizado_en = ?
+                WHERE {self._ES_MIA}
+            """, (ahora + espera, error, ahora, trabajo_id, self.worker_id, intento))
+            return True
+
+    def liberar(self, trabajo_id, intento):
+        """
+        Devuelve a 'pendiente' un trabajo que no llegó a intentarse de verdad (p. ej.
+        se agotó el presupuesto de peticiones), sin gastar uno de sus intentos.
+        """
+        with self._transaccion() as conn:
+            return conn.execute(f"""
+                UPDATE trabajos_scraping SET estado = 'pendiente', intentos = intentos - 1, lease_hasta = NULL, actualizado_en = ?
+                WHERE {self._ES_MIA}
+            """, (time.time(), trabajo_id, self.worker_id, intento)).rowcount == 1
+
+    def reintentar_fallidos(self):
+        """Devuelve los trabajos 'fallido' a la cola con los intentos a cero."""
+        with self._transaccion() as conn:
+            return conn.execute("""
+                UPDATE trabajos_scraping SET estado = 'pendiente', intentos = 0, disponible_desde = 0, actualizado_en = ?
+                WHERE estado = 'fallido'
+            """, (time.time(),)).rowcount
+
+    def proximo_disponible(self, ids=None):
+        """
+        Segundos hasta que haya trabajo que tomar: 0 si ya hay, None si no queda
+        nada pendiente ni en curso (la cola está drenada).
+        """
+        ahora = time.time()
+        with self._conexion() as conn:
+            fila = conn.execute(f"""
+                SELECT MIN(CASE WHEN estado = 'pendiente' THEN disponible_desde ELSE lease_hasta END)
+                FROM trabajos_scraping WHERE estado IN ('pendiente', 'en_curso') AND {self._FILTRO_IDS}
+            """, self._parametros_ids(ids)).fetchone()
+        if fila[0] is None:
+            return None
+        return max(0.0, fila[0] - ahora)
+
+    # --- ESTADO ---
+
+    def estado(self, ventana_minutos=15):
+        """Profundidad de la cola por estado y throughput de los últimos `ventana_minutos`."""
+        ahora = time.time()
+        with self._conexion() as conn:
+            conteos = dict(conn.execute("SELECT estado, COUNT(*) FROM trabajos_scraping GROUP BY estado").fetchall())
+            listos = conn.execute("""
+                SELECT COUNT(*) FROM trabajos_scraping WHERE estado = 'pendiente' AND disponible_desde <= ?
+            """, (ahora,)).fetchone()[0]
+            vencidos = conn.execute("""
+                SELECT COUNT(*) FROM trabajos_scraping WHERE estado = 'en_curso' AND lease_hasta < ?
+            """, (ahora,)).fetchone()[0]
+            recientes = conn.execute("""
+                SELECT COUNT(*) FROM trabajos_scraping WHERE completado_en >= ?
+            """, (ahora - ventana_minutos * 60,)).fetchone()[0]
+            workers = conn.execute("""
+                SELECT worker, COUNT(*) FROM trabajos_scraping WHERE estado = 'en_curso' GROUP BY worker
+            """).fetchall()
+        por_minuto = recientes / ventana_minutos
+        pendientes = conteos.get("pendiente", 0) + conteos.get("en_curso", 0)
+        return {
+            "por_estado": {e: conteos.get(e, 0) for e in ESTADOS},
+            "listos_para_tomar": listos,
+            "leases_vencidos": vencidos,
+            "completados_ventana": recientes,
+            "ventana_minutos": ventana_minutos,
+            "throughput_por_minuto": por_minuto,
+            "eta_minutos": (pendientes / por_minuto) if por_minuto else None,
+            "workers_activos": dict(workers),
+        }
+
+class Latido:
+    """
+    Hilo que renueva cada `intervalo` segundos (por defecto un tercio del lease)
+    el lease de los trabajos que este worker tiene en curso. Sirve igual para
+    los hilos y para el modo async: usa sus propias conexiones a la cola.
+    """
+
+    def __init__(self, cola, intervalo=None):
+        self.cola = cola
+        self.intervalo = intervalo or cola.lease_segundos / 3
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._latir, name="latido-cola", daemon=True)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+
+    def agregar(self, trabajo_id, intento):
+        with self._lock:
+            self._en_curso[trabajo_id] = intento
+
+    def quitar(self, trabajo_id):
+        with self._lock:
+            self._en_curso.pop(trabajo_id, None)
+
+    def _latir(self):
+        while not self._parar.wait(self.intervalo):
+            with self._lock:
+                tomas = dict(self._en_curso)
+            if not tomas:
+                continue
+            try:
+                perdidos = self.cola.renovar_leases(tomas)
+            except sqlite3.Error as e:
+                logging.error(f"❌ No se pudieron renovar los leases: {e}")
+                continue
+            for trabajo_id in perdidos:
+                logging.warning(f"⚠️ Lease perdido del trabajo {trabajo_id}: otro worker lo retomó.")
+                self.quitar(trabajo_id)
+
+def imprimir_estado(cola, ventana_minutos=15):
+    e = cola.estado(ventana_minutos)
+    print(f"📋 Cola: {cola.db_path}")
+    for nombre, total in e["por_estado"].items():
+        print(f"   {nombre:<11} {total:>7}")
+    print(f"   listos ahora: {e['listos_para_tomar']} | leases vencidos: {e['leases_vencidos']}")
+    print(f"   throughput: {e['throughput_por_minuto']:.1f} trabajos/min (últimos {e['ventana_minutos']} min)")
+    if e["eta_minutos"] is not None:
+        print(f"   ETA: {e['eta_minutos']:.0f} min")
+    for worker, n in e["workers_activos"].items():
+        print(f"   worker {worker}: {n} en curso")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Estado y mantenimiento de la cola de scraping.")
+    parser.add_argument("--db", default="data/processed/cola_scraping.db")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_estado = sub.add_parser("estado", help="Muestra profundidad de la cola y throughput.")
+    p_estado.add_argument("--ventana", type=int, default=15, help="Minutos para calcular el throughput.")
+    sub.add_parser("reintentar-fallidos", help="Devuelve los trabajos fallidos a 'pendiente'.")
+    args = parser.parse_args()
+
+    cola = ColaTrabajos(args.db)
+    if args.comando == "estado":
+        imprimir_estado(cola, args.ventana)
+    else:
+        n = cola.reintentar_fallidos()
+        logging.info(f"♻️ {n} trabajos fallidos devueltos a la cola.")
@@ -0,0 +1,225 @@
+# Contenido para: backend/scraping/shared/metricas.py
+# Métricas por etapa para el scraper y el loader: contadores e histogramas de
+# latencia en memoria, exportables como texto de Prometheus (para el textfile
+# collector de node_exporter) y como resumen JSON por corrida.
+#
+# - Un único registro por proceso (`metricas`), seguro entre hilos: lo usan a la
+#   vez los trabajadores de scrape_redbus y el event loop del modo async.
+# - Los procesos del pool del loader no escriben aquí: devuelven sus tiempos en
+#   cada registro normalizado y el proceso principal los observa.
+# - `perfilar` envuelve un bloque con cProfile (p. ej. un solo lote del loader).
+#
+# Uso:
+#   with metricas.cronometro("loader_lote_segundos", etapa="staging"): ...
+#   metricas.contar("loader_filas_insertadas_total", cursor.rowcount, tabla="viajes")
+#   metricas.exportar("data/metricas", "loader")
+import os
+import io
+import json
+import time
+import pstats
+import bisect
+import logging
+import cProfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+PREFIJO_PROMETHEUS = "chaskiway_"
+# Límites superiores (segundos) de los buckets: de medio milisegundo a un minuto
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+AYUDA = {
+    "loader_archivo_segundos": "Tiempo por archivo o registro de shard en los procesos de parseo.",
+    "loader_lote_segundos": "Tiempo por lote en el proceso escritor, por etapa.",
+    "loader_aplicar_segundos": "Tiempo por lote de cada paso de _aplicar_staging.",
+    "loader_registros_total": "Respuestas normalizadas, por estado.",
+    "loader_inventarios_total": "Items de inventario leídos de respuestas válidas.",
+    "loader_items_descartados_total": "Items sin empresa o con fechas de salida/llegada inválidas.",
+    "loader_filas_insertadas_total": "Filas insertadas, por tabla.",
+    "loader_errores_total": "Errores del loader, por categoría.",
+    "scraper_peticion_segundos": "Latencia de cada petición a SearchV4Results, por modo y estado.",
+    "scraper_espera_limitador_segundos": "Espera por una ficha del limitador global (modo async).",
+    "scraper_pausa_segundos": "Pausas deliberadas (cortesía, paginación, 429, backoff).",
+    "scraper_escritura_segundos": "Tiempo de guardar_respuesta, por formato.",
+    "scraper_penalizaciones_total": "Respuestas que penalizaron el limitador, por código.",
+    "scraper_tareas_total": "Tareas ruta × fecha terminadas, por modo y resultado.",
+    "scraper_inventarios_total": "Inventarios guardados, por modo.",
+}
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _etiquetas_prometheus(etiquetas, extra=()):
+    pares = [*etiquetas, *extra]
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}" if pares else ""
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Histograma:
+    """Buckets fijos + suma, cantidad y extremos exactos."""
+
+    def __init__(self, limites=BUCKETS_SEGUNDOS):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.n = 0
+        self.minimo = None
+        self.maximo = None
+
+    def observar(self, valor):
+        self.conteos[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.n += 1
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+    def percentil(self, q):
+        """Estimación por interpolación lineal dentro del bucket (como histogram_quantile)."""
+        if not self.n:
+            return None
+        objetivo, acumulado = q * self.n, 0
+        for i, conteo in enumerate(self.conteos):
+            if conteo and acumulado + conteo >= objetivo:
+                inferior = self.limites[i - 1] if i else 0.0
+                superior = self.limites[i] if i < len(self.limites) else self.maximo
+                inferior, superior = max(inferior, self.minimo), min(superior, self.maximo)
+                return inferior + (superior - inferior) * (objetivo - acumulado) / conteo
+            acumulado += conteo
+        return self.maximo
+
+    def resumen(self):
+        return {
+            "n": self.n, "suma_seg": round(self.suma, 6),
+            "media_ms": round(self.suma / self.n * 1000, 3) if self.n else None,
+            **{f"p{int(q * 100)}_ms": round(self.percentil(q) * 1000, 3) if self.n else None for q in (0.5, 0.9, 0.99)},
+            "max_ms": round(self.maximo * 1000, 3) if self.n else None,
+        }
+
+class Metricas:
+    """Registro de contadores e histogramas identificados por nombre + etiquetas."""
+
+    def __init__(self):
+        self._contadores = {}
+        self._histogramas = {}
+        self._lock = threading.Lock()
+
+    # --- REGISTRO ---
+
+    def contar(self, nombre, cantidad=1, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma()
+            histograma.observar(valor)
+
+    @contextmanager
+    def cronometro(self, nombre, **etiquetas):
+        """Observa en `nombre` la duración del bloque (también si lanza una excepción)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def reiniciar(self, prefijo=None):
+        """Borra todas las métricas, o sólo las que empiezan por `prefijo` (p. ej. 'loader_')."""
+        with self._lock:
+            for tabla in (self._contadores, self._histogramas):
+                for clave in [c for c in tabla if prefijo is None or c[0].startswith(prefijo)]:
+                    del tabla[clave]
+
+    # --- EXPORTACIÓN ---
+
+    def _copia(self, prefijo):
+        with self._lock:
+            contadores = {c: v for c, v in self._contadores.items() if prefijo is None or c[0].startswith(prefijo)}
+            histogramas = {c: (list(h.conteos), h.suma, h.n, h.resumen())
+                           for c, h in self._histogramas.items() if prefijo is None or c[0].startswith(prefijo)}
+        return dict(sorted(contadores.items())), dict(sorted(histogramas.items()))
+
+    def texto_prometheus(self, prefijo=None):
+        """Formato de exposición de texto de Prometheus (0.0.4)."""
+        contadores, histogramas = self._copia(prefijo)
+        lineas, tipos_escritos = [], set()
+
+        def _cabecera(nombre, tipo):
+            if nombre not in tipos_escritos:
+                tipos_escritos.add(nombre)
+                if nombre in AYUDA:
+                    lineas.append(f"# HELP {PREFIJO_PROMETHEUS}{nombre} {AYUDA[nombre]}")
+                lineas.append(f"# TYPE {PREFIJO_PROMETHEUS}{nombre} {tipo}")
+
+        for (nombre, etiquetas), valor in contadores.items():
+            _cabecera(nombre, "counter")
+            lineas.append(f"{PREFIJO_PROMETHEUS}{nombre}{_etiquetas_prometheus(etiquetas)} {_numero(valor)}")
+        for (nombre, etiquetas), (conteos, suma, n, _) in histogramas.items():
+            _cabecera(nombre, "histogram")
+            acumulado = 0
+            for limite, conteo in zip((*map(repr, BUCKETS_SEGUNDOS), "+Inf"), conteos):
+                acumulado += conteo
+                lineas.append(f"{PREFIJO_PROMETHEUS}{nombre}_bucket{_etiquetas_prometheus(etiquetas, [('le', limite)])} {acumulado}")
+            lineas.append(f"{PREFIJO_PROMETHEUS}{nombre}_sum{_etiquetas_prometheus(etiquetas)} {suma!r}")
+            lineas.append(f"{PREFIJO_PROMETHEUS}{nombre}_count{_etiquetas_prometheus(etiquetas)} {n}")
+        return "\n".join(lineas) + "\n"
+
+    def resumen(self, prefijo=None):
+        """Dict serializable: contadores y, por histograma, n/suma/media/p50/p90/p99/máx."""
+        contadores, histogramas = self._copia(prefijo)
+        return {
+            "contadores": [{"nombre": n, "etiquetas": dict(e), "valor": v} for (n, e), v in contadores.items()],
+            "histogramas": [{"nombre": n, "etiquetas": dict(e), **r} for (n, e), (_, _, _, r) in histogramas.items()],
+        }
+
+    def exportar(self, directorio, nombre, prefijo=None, extra=None):
+        """
+        Escribe `<directorio>/<nombre>.prom` (se reemplaza de forma atómica, como
+        espera el textfile collector) y `<directorio>/<nombre>_<fecha>.json`, que
+        queda como histórico de la corrida. Devuelve ambas rutas.
+        """
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        ruta_prom = directorio / f"{nombre}.prom"
+        temporal = ruta_prom.with_suffix(f".prom.{os.getpid()}.tmp")
+        temporal.write_text(self.texto_prometheus(prefijo), encoding="utf-8")
+        os.replace(temporal, ruta_prom)
+
+        ahora = datetime.now()
+        ruta_json = directorio / f"{nombre}_{ahora:%Y%m%d_%H%M%S}.json"
+        datos = {"fecha": ahora.strftime("%Y-%m-%d %H:%M:%S"), **(extra or {}), **self.resumen(prefijo)}
+        ruta_json.write_text(json.dumps(datos, indent=2, ensure_ascii=False), encoding="utf-8")
+        logging.info(f"📈 Métricas exportadas: {ruta_prom} | {ruta_json}")
+        return ruta_prom, ruta_json
+
+metricas = Metricas()
+
+@contextmanager
+def perfilar(ruta, top=30):
+    """
+    Perfila el bloque con cProfile: guarda `<ruta>` (.prof, para snakeviz o
+    pstats) y `<ruta>.txt` con las `top` funciones por tiempo acumulado.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield perfil
+    finally:
+        perfil.disable()
+        perfil.dump_stats(str(ruta))
+        salida = io.StringIO()
+        pstats.Stats(perfil, stream=salida).sort_stats("cumulative").print_stats(top)
+        Path(f"{ruta}.txt").write_text(salida.getvalue(), encoding="utf-8")
+        logging.info(f"🔬 Perfil guardado en {ruta} (resumen en {ruta}.txt)")
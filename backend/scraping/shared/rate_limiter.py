@@ -0,0 +1,68 @@
+# Contenido para: backend/scraping/shared/rate_limiter.py
+# Limitador de tasa global (token bucket) para los scrapers asíncronos.
+# Reemplaza los time.sleep por hilo: todas las corrutinas comparten un mismo
+# cubo de fichas, así el proceso mantiene una tasa estable hacia el servidor.
+import asyncio
+import logging
+import time
+
+class TokenBucket:
+    """
+    Token bucket asíncrono con ajuste adaptativo (AIMD).
+
+    - `tasa`: peticiones por segundo sostenidas.
+    - `capacidad`: ráfaga máxima permitida.
+    - Ante un 429/403 (`penalizar`) la tasa se reduce a la mitad y se pausa todo
+      el cubo; cada respuesta correcta (`recompensar`) la recupera poco a poco
+      hasta la tasa configurada.
+    """
+
+    def __init__(self, tasa, capacidad=None, tasa_minima=0.05, paso_recuperacion=0.02):
+        self.tasa_objetivo = float(tasa)
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad if capacidad is not None else max(1.0, tasa))
+        self.tasa_minima = tasa_minima
+        self.paso_recuperacion = paso_recuperacion
+        self._fichas = self.capacidad
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = asyncio.Lock()
+
+    def _rellenar(self, ahora):
+        self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    async def adquirir(self):
+        """Espera hasta que haya una ficha disponible y la consume."""
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                if ahora < self._pausa_hasta:
+                    await asyncio.sleep(self._pausa_hasta - ahora)
+                    continue
+                self._rellenar(ahora)
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                await asyncio.sleep((1 - self._fichas) / self.tasa)
+
+    def penalizar(self, pausa_segundos):
+        """
+        Reduce la tasa a la mitad y detiene el cubo durante `pausa_segundos`.
+        Los 429/403 que llegan con la pausa ya en curso son el mismo episodio
+        (peticiones que estaban en vuelo): sólo alargan la pausa, no vuelven a
+        reducir la tasa.
+        """
+        ahora = time.monotonic()
+        self._fichas = 0.0
+        if ahora < self._pausa_hasta:
+            self._pausa_hasta = max(self._pausa_hasta, ahora + pausa_segundos)
+            return
+        self.tasa = max(self.tasa_minima, self.tasa / 2)
+        self._pausa_hasta = ahora + pausa_segundos
+        logging.warning(f"🐢 Backoff global: tasa reducida a {self.tasa:.2f} req/s, pausa de {pausa_segundos:.1f}s")
+
+    def recompensar(self):
+        """Recupera la tasa de forma aditiva tras una respuesta correcta."""
+        if self.tasa < self.tasa_objetivo:
+            self.tasa = min(self.tasa_objetivo, self.tasa + self.paso_recuperacion * self.tasa_objetivo)
@@ -0,0 +1,183 @@
+# Contenido para: backend/scraping/shared/shards.py
+# Almacenamiento crudo compacto: un shard append-only por ruta y mes en lugar de
+# un JSON indentado por ruta y fecha.
+#
+#   data/raw/redbus/<origen>/<destino>/<mes>.jsonl.gz   registros comprimidos
+#   data/raw/redbus/<origen>/<destino>/<mes>.idx.jsonl  índice de offsets
+#
+# Cada registro es un miembro gzip independiente con una línea JSON
+# {"fecha": "YYYYMMDD", "respuesta": {...}}. Un archivo gzip multi-miembro sigue
+# siendo un gzip válido (zcat lo lee entero), se puede ampliar con un simple
+# append y, con el índice, leer un único registro sin descomprimir el resto.
+import os
+import re
+import sys
+import gzip
+import json
+import zlib
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+try:
+    import fcntl  # Bloqueo entre procesos (no disponible en Windows)
+except ImportError:
+    fcntl = None
+
+EXTENSION_SHARD = ".jsonl.gz"
+EXTENSION_INDICE = ".idx.jsonl"
+NIVEL_COMPRESION = 6
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _lock_para(ruta):
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(ruta), threading.Lock())
+
+def ruta_shard_para(output_dir):
+    """`.../<origen>/<destino>/<mes>` -> `.../<origen>/<destino>/<mes>.jsonl.gz`"""
+    return str(output_dir).rstrip("/\\") + EXTENSION_SHARD
+
+def ruta_indice_para(ruta_shard):
+    return ruta_shard[: -len(EXTENSION_SHARD)] + EXTENSION_INDICE
+
+def es_shard(ruta):
+    return str(ruta).lower().endswith(EXTENSION_SHARD)
+
+def agregar_registro(ruta_shard, fecha, respuesta):
+    """
+    Agrega una respuesta al shard (append) y su entrada al índice. Es seguro entre
+    hilos del mismo proceso y, donde existe fcntl, también entre procesos.
+    Devuelve el offset del registro.
+    """
+    linea = json.dumps({"fecha": fecha, "respuesta": respuesta}, ensure_ascii=False, separators=(",", ":"))
+    miembro = gzip.compress((linea + "\n").encode("utf-8"), compresslevel=NIVEL_COMPRESION)
+    os.makedirs(os.path.dirname(ruta_shard) or ".", exist_ok=True)
+
+    with _lock_para(ruta_shard), open(ruta_shard, "ab") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            offset = os.fstat(f.fileno()).st_size
+            f.write(miembro)
+            f.flush()
+            entrada = {"fecha": fecha, "offset": offset, "longitud": len(miembro)}
+            with open(ruta_indice_para(ruta_shard), "a", encoding="utf-8") as idx:
+                idx.write(json.dumps(entrada) + "\n")
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    return offset
+
+def leer_indice(ruta_shard):
+    """Entradas del índice en orden de escritura (una fecha puede repetirse si se re-scrapeó)."""
+    entradas = []
+    try:
+        with open(ruta_indice_para(ruta_shard), "r", encoding="utf-8") as idx:
+            for linea in idx:
+                try:
+                    entradas.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    continue  # Línea a medio escribir
+    except FileNotFoundError:
+        pass
+    return entradas
+
+def fechas_en_shard(ruta_shard):
+    return {e["fecha"] for e in leer_indice(ruta_shard)}
+
+def leer_registro(ruta_shard, offset, longitud):
+    """Lee un único registro usando su offset del índice."""
+    with open(ruta_shard, "rb") as f:
+        f.seek(offset)
+        return json.loads(gzip.decompress(f.read(longitud)))
+
+def iterar_miembros(contenido, desde=0):
+    """
+    Recorre los miembros gzip de `contenido` (bytes) a partir de `desde` y entrega
+    (offset, longitud, datos_descomprimidos). Un miembro truncado al final (escritura
+    interrumpida) se ignora.
+    """
+    vista = memoryview(contenido)
+    pos = desde
+    while pos < len(contenido):
+        descompresor = zlib.decompressobj(wbits=31)
+        try:
+            datos = descompresor.decompress(vista[pos:])
+        except zlib.error as e:
+            logging.error(f"Shard corrupto en el offset {pos}: {e}")
+            return
+        if not descompresor.eof:
+            return
+        fin = len(contenido) - len(descompresor.unused_data)
+        yield pos, fin - pos, datos
+        pos = fin
+
+def iterar_registros(ruta_shard, desde=0):
+    """Entrega (offset, fecha, respuesta) de cada registro del shard desde el offset `desde`."""
+    with open(ruta_shard, "rb") as f:
+        contenido = f.read()
+    for offset, _, datos in iterar_miembros(contenido, desde):
+        registro = json.loads(datos)
+        yield offset, registro.get("fecha"), registro.get("respuesta")
+
+# --- CONVERSIÓN DEL ÁRBOL ANTIGUO (un JSON por ruta y fecha) ---
+
+PATRON_ARCHIVO = re.compile(r"api_response_(\d{8})\.json$", re.IGNORECASE)
+
+def convertir_arbol(carpeta_raiz, borrar_originales=False):
+    """
+    Convierte `<origen>/<destino>/<mes>/api_response_YYYYMMDD.json` en shards por
+    ruta y mes. Es idempotente: las fechas que ya están en el índice se saltan.
+    La fecha de scraping se toma del mtime del JSON si no viene embebida, igual
+    que hace el loader, para que los snapshots coincidan.
+    """
+    convertidos = saltados = 0
+    bytes_origen = bytes_destino = 0
+    for raiz, carpetas, archivos in os.walk(carpeta_raiz):
+        carpetas.sort()
+        jsons = sorted(a for a in archivos if PATRON_ARCHIVO.search(a))
+        if not jsons:
+            continue
+        ruta_shard = ruta_shard_para(raiz)
+        ya_guardadas = fechas_en_shard(ruta_shard)
+        for nombre in jsons:
+            ruta_json = os.path.join(raiz, nombre)
+            fecha = PATRON_ARCHIVO.search(nombre).group(1)
+            if fecha in ya_guardadas:
+                saltados += 1
+            else:
+                try:
+                    with open(ruta_json, "r", encoding="utf-8") as f:
+                        respuesta = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logging.error(f"No se pudo convertir {ruta_json}: {e}")
+                    continue
+                if isinstance(respuesta, dict) and not respuesta.get("fechaScrapeo"):
+                    respuesta["fechaScrapeo"] = datetime.fromtimestamp(os.path.getmtime(ruta_json)).strftime("%Y-%m-%d %H:%M:%S")
+                agregar_registro(ruta_shard, fecha, respuesta)
+                convertidos += 1
+            bytes_origen += os.path.getsize(ruta_json)
+            if borrar_originales:
+                os.remove(ruta_json)
+        if os.path.exists(ruta_shard):
+            bytes_destino += os.path.getsize(ruta_shard) + os.path.getsize(ruta_indice_para(ruta_shard))
+        if borrar_originales and not os.listdir(raiz):
+            os.rmdir(raiz)
+
+    logging.info(f"Convertidos: {convertidos} | Ya existentes: {saltados} | "
+                 f"{bytes_origen / 2**20:.1f} MB en JSON -> {bytes_destino / 2**20:.1f} MB en shards")
+    return convertidos
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Convierte el árbol de JSONs de RedBus a shards comprimidos por ruta y mes.")
+    parser.add_argument("carpeta", nargs="?", default="data/raw/redbus")
+    parser.add_argument("--borrar", action="store_true", help="Elimina los JSON originales tras convertirlos.")
+    args = parser.parse_args()
+    if not os.path.isdir(args.carpeta):
+        logging.error(f"La carpeta raíz no existe: {args.carpeta}")
+        sys.exit(1)
+    convertir_arbol(args.carpeta, borrar_originales=args.borrar)
@@ -0,0 +1,103 @@
+# Contenido para: backend/scraping/weather_downloader.py
+# Descarga el historial diario de clima de cada destino (Visual Crossing) y lo
+# carga en la tabla `clima` (ciudad, fecha).
+#
+# - Las peticiones se parten en tramos de CLIMA_DIAS_POR_PETICION días y corren
+#   en paralelo con un límite de concurrencia y un TokenBucket global.
+# - Las respuestas crudas quedan en un AlmacenContenido (data/cache/clima): una
+#   segunda ejecución no sale a la red, y --offline sólo usa lo que ya está.
+# - --base-url (o VISUAL_CROSSING_BASE_URL) apunta a un servidor local en pruebas.
+#
+# Uso: python -m backend.scraping.weather_downloader --desde 2024-07-01 --hasta 2024-07-31
+import json
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import date
+
+from .shared.rate_limiter import TokenBucket
+from .shared.almacen_contenido import AlmacenContenido, hash_contenido
+from ..apis.cliente_http import crear_sesion
+from ..apis.weather_api import obtener_historial, parsear_dias, partir_rango
+from ..core.config import CLIMA_CACHE_DIR, CLIMA_MAX_CONCURRENTES, CLIMA_TASA_POR_SEGUNDO, VISUAL_CROSSING_API_KEY
+from ..database.db_manager import obtener_gestor, incrementar_version_datos, DB_PATH_POR_DEFECTO
+from ..database.redbus_loader.schema import crear_tablas
+
+CITY_IDS_PATH = Path(__file__).parent / "redbus" / "config" / "city_ids.json"
+COLUMNAS_CLIMA = ("ciudad", "fecha", "temp_max", "temp_min", "temp_prom", "precipitacion", "humedad",
+                  "condiciones", "icono", "fuente_hash")
+
+def ciudades_por_defecto():
+    """Destinos de city_ids.json sin el sufijo '(Todos)', con los mismos nombres que la tabla rutas."""
+    with open(CITY_IDS_PATH, "r", encoding="utf-8") as f:
+        return [nombre.split("(")[0].strip() for nombre in json.load(f)]
+
+async def descargar_clima(ciudades, desde, hasta, almacen, base_url=None, offline=False,
+                          max_concurrentes=CLIMA_MAX_CONCURRENTES, tasa=CLIMA_TASA_POR_SEGUNDO):
+    """
+    Devuelve {ciudad: [bytes de cada tramo]} con las respuestas obtenidas (de la
+    caché o de la red). Los tramos que fallan simplemente no aparecen.
+    """
+    limitador = TokenBucket(tasa)
+    semaforo = asyncio.Semaphore(max_concurrentes)
+    tareas = [(ciudad, inicio, fin) for ciudad in ciudades for inicio, fin in partir_rango(desde, hasta)]
+
+    async with crear_sesion(max_conexiones=max_concurrentes) as session:
+        async def _uno(ciudad, inicio, fin):
+            async with semaforo:
+                return ciudad, await obtener_historial(session, limitador, almacen, ciudad, inicio, fin, base_url, offline)
+
+        resultados = await asyncio.gather(*(_uno(*t) for t in tareas))
+
+    respuestas, faltantes = {}, 0
+    for ciudad, datos in resultados:
+        if datos is None:
+            faltantes += 1
+            continue
+        respuestas.setdefault(ciudad, []).append(datos)
+    logging.info(f"🌤️ Clima: {len(tareas) - faltantes}/{len(tareas)} tramos disponibles para {len(ciudades)} ciudades.")
+    return respuestas
+
+def guardar_clima(db_path, respuestas):
+    """UPSERT de los días de cada respuesta en `clima`, en una sola transacción. Devuelve las filas escritas."""
+    filas = []
+    for ciudad, lista in respuestas.items():
+        for datos in lista:
+            fuente = hash_contenido(datos)
+            filas.extend((ciudad, *(dia[c] for c in COLUMNAS_CLIMA[1:-1]), fuente) for dia in parsear_dias(datos))
+    if not filas:
+        return 0
+    actualizar = ", ".join(f"{c} = excluded.{c}" for c in COLUMNAS_CLIMA[2:])
+    with obtener_gestor(db_path).escritura() as conn:
+        conn.executemany(f"""
+            INSERT INTO clima ({", ".join(COLUMNAS_CLIMA)}) VALUES ({", ".join("?" * len(COLUMNAS_CLIMA))})
+            ON CONFLICT(ciudad, fecha) DO UPDATE SET {actualizar}
+        """, filas)
+        incrementar_version_datos(conn.cursor())
+    return len(filas)
+
+def ejecutar(ciudades, desde, hasta, db_path=DB_PATH_POR_DEFECTO, cache_dir=CLIMA_CACHE_DIR, base_url=None, offline=False):
+    if not offline and not base_url and not VISUAL_CROSSING_API_KEY:
+        logging.warning("⚠️ VISUAL_CROSSING_API_KEY no está definida: sólo se usará la caché local.")
+        offline = True
+    crear_tablas(db_path)
+    almacen = AlmacenContenido(cache_dir)
+    respuestas = asyncio.run(descargar_clima(ciudades, desde, hasta, almacen, base_url, offline))
+    escritas = guardar_clima(db_path, respuestas)
+    logging.info(f"✅ {escritas} días de clima guardados en {db_path} | caché: {almacen.estadisticas()}")
+    return escritas
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Historial diario de clima por destino → tabla clima.")
+    parser.add_argument("--desde", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--hasta", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--ciudades", nargs="*", default=None, help="Por defecto, las de city_ids.json.")
+    parser.add_argument("--db", default=DB_PATH_POR_DEFECTO)
+    parser.add_argument("--cache", default=str(CLIMA_CACHE_DIR), help="Directorio del almacén de respuestas.")
+    parser.add_argument("--base-url", default=None, help="URL base alternativa (p. ej. un servidor local de pruebas).")
+    parser.add_argument("--offline", action="store_true", help="No sale a la red: sólo usa respuestas ya guardadas.")
+    args = parser.parse_args()
+    ejecutar(args.ciudades or ciudades_por_defecto(), date.fromisoformat(args.desde), date.fromisoformat(args.hasta),
+             args.db, args.cache, args.base_url, args.offline)
@@ -0,0 +1,68 @@
+# Contenido para: benchmarks/bench_ingesta.py
+# Compara la lectura actual (json.load del dict completo) con la ingesta
+# proyectada de redbus_loader/ingesta.py: tiempo de parseo y pico de memoria
+# reteniendo un lote de LOTE_TAMANO respuestas, como hace el loader.
+#
+# Uso: python -m benchmarks.bench_ingesta [--carpeta data/raw/redbus] [--repeticiones 3]
+import argparse
+import json
+import time
+import tracemalloc
+from itertools import islice
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.database.redbus_loader import ingesta
+from backend.database.redbus_loader.loader import LOTE_TAMANO
+from backend.database.redbus_loader.utils import cargar_json_desde_archivo
+
+def _proyectado_stdlib(ruta_archivo):
+    with open(ruta_archivo, "rb") as f:
+        return ingesta.proyectar_respuesta(json.loads(f.read().decode("utf-8")))
+
+def _proyectado(ruta_archivo):
+    return ingesta.leer_respuesta_proyectada(ruta_archivo)[0]
+
+VARIANTES = {
+    "json.load completo (actual)": cargar_json_desde_archivo,
+    "json + proyeccion": _proyectado_stdlib,
+    f"{ingesta.BACKEND_JSON} + proyeccion": _proyectado,
+}
+
+def medir(funcion, archivos, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for ruta in archivos:
+            funcion(ruta)
+        mejor = min(mejor, time.perf_counter() - inicio)
+
+    lote = archivos[:LOTE_TAMANO]
+    tracemalloc.start()
+    retenidos = [funcion(ruta) for ruta in lote]
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retenidos
+    return {"segundos": mejor, "archivos_por_seg": len(archivos) / mejor, "pico_lote_mb": pico / 2**20}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la etapa de ingesta de JSONs de RedBus.")
+    parser.add_argument("--carpeta", default="data/raw/redbus")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--max-archivos", type=int, default=None)
+    args = parser.parse_args()
+
+    archivos = list(islice(ingesta.iterar_archivos_json(args.carpeta), args.max_archivos))
+    if not archivos:
+        print(f"No se encontraron JSONs en {args.carpeta}")
+        return
+    print(f"{len(archivos)} archivos | lote de {min(LOTE_TAMANO, len(archivos))} para medir memoria\n")
+    print(f"{'variante':<32}{'seg':>8}{'arch/s':>10}{'pico MB':>10}")
+    for nombre, funcion in VARIANTES.items():
+        r = medir(funcion, archivos, args.repeticiones)
+        print(f"{nombre:<32}{r['segundos']:>8.3f}{r['archivos_por_seg']:>10.0f}{r['pico_lote_mb']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
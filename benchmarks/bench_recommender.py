@@ -0,0 +1,111 @@
+# Contenido para: benchmarks/bench_recommender.py
+# Compara el recomendador columnar (backend/core/recommender.py) con la consulta
+# SQL equivalente (joins + viaje_ultimo_estado + puntaje con MIN/MAX OVER ()) sobre un
+# conjunto de consultas típicas, y verifica que ambos devuelven los mismos viajes.
+#
+# Uso: python -m benchmarks.bench_recommender [--db data/processed/viajes.db] [--repeticiones 20]
+import argparse
+import sqlite3
+import statistics
+import time
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.core.recommender import Recomendador, PESOS_POR_DEFECTO
+
+def consulta_sql(conn, k=10, pesos=None, origen=None, destino=None, fecha_desde=None, fecha_hasta=None,
+                 presupuesto=None, amenidades=None, asientos_min=1):
+    """La misma recomendación resuelta en SQLite en cada petición."""
+    pesos = pesos or PESOS_POR_DEFECTO
+    condiciones, parametros = ["h.precio_min IS NOT NULL"], []
+    if origen:
+        condiciones.append("r.origen = ?"); parametros.append(origen)
+    if destino:
+        condiciones.append("r.destino = ?"); parametros.append(destino)
+    if fecha_desde:
+        condiciones.append("v.fecha_salida >= ?"); parametros.append(fecha_desde)
+    if fecha_hasta:
+        condiciones.append("v.fecha_salida <= ?"); parametros.append(fecha_hasta)
+    if presupuesto is not None:
+        condiciones.append("h.precio_min <= ?"); parametros.append(presupuesto)
+    if asientos_min:
+        condiciones.append("h.asientos_disponibles >= ?"); parametros.append(asientos_min)
+    if amenidades:
+        marcas = ",".join("?" * len(amenidades))
+        condiciones.append(f"""v.id IN (
+            SELECT va.viaje_id FROM viaje_amenidades va JOIN amenidades a ON a.id = va.amenidad_id
+            WHERE a.codigo IN ({marcas}) GROUP BY va.viaje_id HAVING COUNT(*) = ?)""")
+        parametros += list(amenidades) + [len(set(amenidades))]
+
+    def _escala(col, invertir):
+        valor = f"({col} - MIN({col}) OVER ()) / (MAX({col}) OVER () - MIN({col}) OVER ())"
+        if invertir:
+            valor = f"1.0 - {valor}"
+        return f"COALESCE(CASE WHEN MAX({col}) OVER () > MIN({col}) OVER () THEN {valor} ELSE 0.5 * ({col} IS NOT NULL) END, 0)"
+
+    sql = f"""
+        WITH filtrados AS (
+            SELECT v.id, v.fecha_salida, v.hora_salida_programada, r.origen, r.destino, e.nombre,
+                   CAST(v.duracion_programada_min AS REAL) AS duracion, h.precio_min AS precio,
+                   h.asientos_disponibles, e.rating, e.bus_score
+            FROM viajes v
+            JOIN viaje_ultimo_estado h ON h.viaje_id = v.id
+            JOIN empresas e ON e.id = v.empresa_id
+            JOIN rutas r ON r.id = v.ruta_id
+            WHERE {" AND ".join(condiciones)}
+        )
+        SELECT id, precio,
+               ? * {_escala("precio", True)} + ? * {_escala("duracion", True)}
+             + ? * {_escala("rating", False)} + ? * {_escala("bus_score", False)} AS puntaje
+        FROM filtrados
+        ORDER BY ROUND(puntaje, 6) DESC, precio, id
+        LIMIT ?
+    """
+    parametros += [pesos["precio"], pesos["duracion"], pesos["rating"], pesos["bus_score"], k]
+    return conn.execute(sql, parametros).fetchall()
+
+def consultas_tipicas(recomendador):
+    rutas = sorted(set(recomendador.rutas.values()))
+    origen, destino = rutas[0]
+    codigos = list(recomendador.bit_amenidad)[:2]
+    return {
+        "todo, top 10": {},
+        "ruta": {"origen": origen, "destino": destino},
+        "ruta + presupuesto": {"origen": origen, "destino": destino, "presupuesto": 60},
+        "rango de fechas": {"fecha_desde": "2025-07-10", "fecha_hasta": "2025-07-20"},
+        "destino + amenidades": {"destino": destino, "amenidades": codigos},
+    }
+
+def _medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del recomendador columnar frente a SQL.")
+    parser.add_argument("--db", default="data/processed/viajes.db")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    recomendador = Recomendador(args.db)
+    construccion = time.perf_counter() - inicio
+    print(f"{len(recomendador)} viajes | foto construida en {construccion * 1000:.0f} ms\n")
+
+    conn = sqlite3.connect(args.db)
+    print(f"{'consulta':<24}{'numpy ms':>10}{'sql ms':>10}{'x':>8}  iguales")
+    for nombre, filtros in consultas_tipicas(recomendador).items():
+        t_np, r_np = _medir(lambda: recomendador.recomendar(k=args.k, **filtros), args.repeticiones)
+        t_sql, r_sql = _medir(lambda: consulta_sql(conn, k=args.k, **filtros), args.repeticiones)
+        iguales = [r["viaje_id"] for r in r_np] == [fila[0] for fila in r_sql]
+        print(f"{nombre:<24}{t_np:>10.2f}{t_sql:>10.2f}{t_sql / t_np:>8.1f}  {'sí' if iguales else 'NO'}")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Contenido para: benchmarks/bench_scraper.py
+# Benchmark de extremo a extremo del extractor contra el simulador local
+# (backend/scraping/redbus/servidor_simulado.py): concurrencia, limitador de tasa
+# y reintentos sin tocar redbus.pe.
+#
+# Levanta el simulador en un subproceso con los fallos pedidos, scrapea las
+# ruta×fecha que éste tiene indexadas (modo async o hilos) hacia un directorio
+# temporal y compara lo guardado con el original: mismas salidas por respuesta
+# (la paginación no pierde ni duplica inventarios).
+#
+# Uso: python -m benchmarks.bench_scraper --tareas 100 --tasa 20 --tasa-429 0.05 --latencia-ms 50 --pausa-429 0.5 1
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from urllib.request import urlopen
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.scraping.redbus import extractor, extractor_async
+from backend.scraping.redbus.servidor_simulado import ServidorRedBus, CITY_IDS_PATH, RUTA_BUSQUEDA
+from backend.scraping.shared.shards import iterar_registros, EXTENSION_SHARD
+from backend.scraping.shared.metricas import metricas
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def levantar_simulador(carpeta, puerto, opciones):
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "backend.scraping.redbus.servidor_simulado", "--carpeta", carpeta,
+         "--puerto", str(puerto), *opciones],
+        cwd=Path(__file__).resolve().parent.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urlopen(f"http://127.0.0.1:{puerto}/__estadisticas?reiniciar=1", timeout=1).read()
+            return proceso
+        except OSError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("El simulador no arrancó.")
+
+def construir_tareas(indice, salida, limite):
+    """Tareas de scrape_redbus para las ruta×fecha indexadas (sólo ciudades de city_ids.json)."""
+    with open(CITY_IDS_PATH, "r", encoding="utf-8") as f:
+        nombres = {nombre.split("(")[0].strip(): (nombre, id_) for nombre, id_ in json.load(f).items()}
+    tareas = []
+    for origen, destino, fecha in sorted(indice)[:limite]:
+        if origen not in nombres or destino not in nombres:
+            continue
+        dia = datetime.strptime(fecha, "%Y%m%d")
+        (nombre_o, id_o), (nombre_d, id_d) = nombres[origen], nombres[destino]
+        tareas.append((id_o, id_d, nombre_o, nombre_d, dia.strftime("%d-%b-%Y"), str(Path(salida) / origen / destino / "bench")))
+    return tareas
+
+def inventarios_guardados(salida):
+    """{(origen, destino, 'YYYYMMDD'): n_inventarios} de lo que escribió el extractor (shards)."""
+    conteos = {}
+    for shard in Path(salida).rglob(f"*{EXTENSION_SHARD}"):
+        destino, origen = shard.parent.name, shard.parent.parent.name
+        for _, fecha, respuesta in iterar_registros(str(shard)):
+            conteos[(origen, destino, fecha)] = len(respuesta.get("inventories") or [])
+    return conteos
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del extractor contra el simulador local de RedBus.")
+    parser.add_argument("--carpeta", default="data/raw/redbus", help="Respuestas que replica el simulador.")
+    parser.add_argument("--tareas", type=int, default=100)
+    parser.add_argument("--modo", choices=("async", "hilos"), default="async")
+    parser.add_argument("--tasa", type=float, default=10.0, help="Peticiones/s del limitador (modo async).")
+    parser.add_argument("--hilos", type=int, default=16, help="Trabajadores en modo hilos.")
+    parser.add_argument("--pausa-429", type=float, nargs=2, default=None, metavar=("MIN", "MAX"),
+                        help="Pausa global ante 429 en modo async (por defecto la de producción).")
+    parser.add_argument("--salida", default=None, help="JSON de resultados.")
+    parser.add_argument("--latencia-ms", default="0")
+    parser.add_argument("--jitter-ms", default="0")
+    parser.add_argument("--tasa-429", default="0")
+    parser.add_argument("--tasa-403", default="0")
+    parser.add_argument("--tasa-500", default="0")
+    parser.add_argument("--limite-rps", default=None)
+    parser.add_argument("--max-por-pagina", default="20")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    opciones = ["--latencia-ms", args.latencia_ms, "--jitter-ms", args.jitter_ms, "--tasa-429", args.tasa_429,
+                "--tasa-403", args.tasa_403, "--tasa-500", args.tasa_500, "--max-por-pagina", args.max_por_pagina,
+                "--semilla", "0"] + (["--limite-rps", args.limite_rps] if args.limite_rps else [])
+    originales = ServidorRedBus(args.carpeta)
+    puerto = _puerto_libre()
+    proceso = levantar_simulador(args.carpeta, puerto, opciones)
+    extractor.configurar_base_url(f"http://127.0.0.1:{puerto}{RUTA_BUSQUEDA}")
+    if args.pausa_429:
+        extractor_async.PAUSA_429 = tuple(args.pausa_429)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_scraper_") as salida:
+            tareas = construir_tareas(originales.indice, salida, args.tareas)
+            inicio = time.perf_counter()
+            if args.modo == "async":
+                exitos, fallos = asyncio.run(extractor_async.ejecutar_tareas_async(tareas, tasa=args.tasa))
+            else:
+                with ThreadPoolExecutor(max_workers=args.hilos) as executor:
+                    resultados = list(executor.map(lambda t: extractor.scrape_redbus(*t), tareas))
+                exitos, fallos = sum(resultados), len(resultados) - sum(resultados)
+            segundos = time.perf_counter() - inicio
+
+            guardados = inventarios_guardados(salida)
+            diferencias = sum(
+                1 for clave, n in guardados.items()
+                if n != len(originales.leer_respuesta(originales.indice[clave]).get("inventories") or [])
+            )
+        estadisticas = json.loads(urlopen(f"http://127.0.0.1:{puerto}/__estadisticas").read())
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+    resultado = {
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "parametros": {**vars(args), "servidor": opciones},
+        "tareas": len(tareas), "exitos": exitos, "fallos": fallos,
+        "segundos": round(segundos, 3), "tareas_por_seg": round(len(tareas) / segundos, 2),
+        "peticiones_por_seg": round(estadisticas.get("peticiones", 0) / segundos, 2),
+        "respuestas_distintas_al_original": diferencias,
+        "servidor": estadisticas,
+        "metricas": metricas.resumen("scraper_"),
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# Contenido para: benchmarks/bench_suite.py
+# Suite de rendimiento del loader y del recomendador sobre datos sintéticos
+# (benchmarks/generador_redbus.py), con el resultado en un JSON comparable entre corridas.
+#
+# Por cada ronda (un re-scrapeo completo de rutas × días) mide:
+#   - cargar_datos_desde_carpeta: archivos/s (registros, en formato shard), inventarios/s
+#     y filas nuevas/s por tabla;
+#   - el tamaño de la base (tras un checkpoint del WAL) y cuánto creció;
+#   - el desglose por etapa de las métricas del loader (parseo, staging, commit...).
+# Al final mide la latencia (p50/p90/p99/máx) de las consultas con nombre que usa
+# el frontend, sin caché, y de recomendar / calendario_precios / buscar conexiones.
+#
+# Uso: python -m benchmarks.bench_suite --rutas 20 --dias 30 --salidas 12 --rondas 3 [--cdc] [--workers 4]
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import sqlite3
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generador_redbus import generar_dataset
+from backend.database.db_manager import obtener_gestor
+from backend.database.redbus_loader.schema import crear_tablas
+from backend.database.redbus_loader.loader import cargar_datos_desde_carpeta
+from backend.database.redbus_loader.ingesta import BACKEND_JSON
+from backend.scraping.shared.metricas import metricas
+from backend.core.recommender import Recomendador
+from backend.core.conexiones import BuscadorConexiones
+
+TABLAS_CONTADAS = (
+    "viajes", "historial_viajes", "viaje_ultimo_estado", "puntos_parada", "viaje_amenidades",
+    "paradas", "empresas", "rutas", "resumen_ruta_fecha_empresa", "errores_procesamiento",
+)
+
+def contar_filas(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {tabla: conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0] for tabla in TABLAS_CONTADAS}
+    finally:
+        conn.close()
+
+def tamano_bd(db_path):
+    """Bytes de la base tras volcar el WAL (así las rondas son comparables)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return sum(os.path.getsize(p) for p in (db_path, f"{db_path}-wal") if os.path.exists(p))
+
+def percentiles(tiempos):
+    ms = np.asarray(tiempos) * 1000
+    p50, p90, p99 = np.percentile(ms, (50, 90, 99))
+    return {"n": len(ms), "p50_ms": round(float(p50), 3), "p90_ms": round(float(p90), 3),
+            "p99_ms": round(float(p99), 3), "max_ms": round(float(ms.max()), 3)}
+
+def medir_latencia(funcion, repeticiones, calentamiento=2):
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return percentiles(tiempos)
+
+# --- CARGA ---
+
+def medir_ronda(carpeta, db_path, generado, workers, cdc):
+    antes, bytes_antes = contar_filas(db_path), tamano_bd(db_path)
+    inicio = time.perf_counter()
+    cargar_datos_desde_carpeta(carpeta, db_path, workers=workers, cdc=cdc)
+    segundos = time.perf_counter() - inicio
+    despues, bytes_despues = contar_filas(db_path), tamano_bd(db_path)
+    nuevas = {tabla: despues[tabla] - antes[tabla] for tabla in TABLAS_CONTADAS}
+    return {
+        "segundos": round(segundos, 3),
+        "archivos": generado["archivos"],
+        "inventarios": generado["inventarios"],
+        "mb_json": round(generado["bytes"] / 2**20, 2),
+        "archivos_por_seg": round(generado["archivos"] / segundos, 1),
+        "inventarios_por_seg": round(generado["inventarios"] / segundos, 1),
+        "filas_nuevas": nuevas,
+        "filas_nuevas_por_seg": round(sum(nuevas.values()) / segundos, 1),
+        "bytes_bd": bytes_despues,
+        "crecimiento_bytes": bytes_despues - bytes_antes,
+        "bytes_por_inventario": round((bytes_despues - bytes_antes) / max(1, generado["inventarios"]), 1),
+        "metricas": metricas.resumen("loader_"),
+    }
+
+# --- CONSULTAS ---
+
+def consultas_tipicas(db_path, rng):
+    """{nombre: función sin argumentos} con parámetros tomados de la propia base."""
+    gestor = obtener_gestor(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        origen, destino = conn.execute("""
+            SELECT r.origen, r.destino FROM viajes v JOIN rutas r ON r.id = v.ruta_id
+            GROUP BY v.ruta_id ORDER BY COUNT(*) DESC, v.ruta_id LIMIT 1
+        """).fetchone()
+        desde, hasta = conn.execute("SELECT MIN(fecha_salida), MAX(fecha_salida) FROM viajes").fetchone()
+        parada_id, = conn.execute("""
+            SELECT parada_id FROM puntos_parada WHERE tipo = 'embarque' GROUP BY parada_id ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()
+        viaje_ids = [fila[0] for fila in conn.execute("SELECT id FROM viajes")]
+    finally:
+        conn.close()
+
+    semana = (date.fromisoformat(desde) + timedelta(days=6)).isoformat()
+    recomendador = Recomendador(db_path)
+    buscador = BuscadorConexiones(db_path)
+
+    def _sql(nombre, parametros):
+        return lambda: gestor.consultar(nombre, parametros() if callable(parametros) else parametros, cache=False)
+
+    return {
+        "viajes_ruta_fecha (semana)": _sql("viajes_ruta_fecha", (origen, destino, desde, semana)),
+        "tarifas_ruta_fechas (todo)": _sql("tarifas_ruta_fechas", (origen, destino, desde, hasta)),
+        "viajes_desde_parada": _sql("viajes_desde_parada", (parada_id, "embarque", f"{desde} 00:00:00", f"{hasta} 23:59:59")),
+        "historial_viaje": _sql("historial_viaje", lambda: (rng.choice(viaje_ids),)),
+        "puntos_parada_viaje": _sql("puntos_parada_viaje", lambda: (rng.choice(viaje_ids),)),
+        "dashboard_por_ruta": _sql("dashboard_por_ruta", (desde, hasta)),
+        "dashboard_por_empresa": _sql("dashboard_por_empresa", (origen, destino, desde, hasta)),
+        "dashboard_por_fecha": _sql("dashboard_por_fecha", (origen, destino, desde, hasta)),
+        "recomendar (todo)": lambda: recomendador.recomendar(k=10),
+        "recomendar (ruta)": lambda: recomendador.recomendar(k=10, origen=origen, destino=destino),
+        "calendario_precios": lambda: recomendador.calendario_precios(origen, destino, desde[:7]),
+        "conexiones (3 días)": lambda: buscador.buscar(origen, desde, (date.fromisoformat(desde) + timedelta(days=2)).isoformat()),
+    }
+
+def medir_consultas(db_path, repeticiones, semilla):
+    rng = random.Random(semilla)
+    inicio = time.perf_counter()
+    consultas = consultas_tipicas(db_path, rng)
+    resultados = {"construccion_memoria_ms": round((time.perf_counter() - inicio) * 1000, 1)}
+    for nombre, funcion in consultas.items():
+        resultados[nombre] = medir_latencia(funcion, repeticiones)
+    return resultados
+
+# --- SUITE ---
+
+def ejecutar_suite(rutas, dias, salidas, rondas, workers=1, cdc=False, formato="json", repeticiones=50,
+                   semilla=0, trabajo=None):
+    trabajo = Path(trabajo or tempfile.mkdtemp(prefix="bench_chaskiway_"))
+    trabajo.mkdir(parents=True, exist_ok=True)
+    carpeta, db_path = trabajo / "redbus", str(trabajo / "viajes.db")
+    shutil.rmtree(carpeta, ignore_errors=True)
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + sufijo):
+            os.remove(db_path + sufijo)
+    crear_tablas(db_path)
+
+    resultado = {
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "entorno": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                    "plataforma": platform.platform(), "cpus": os.cpu_count(), "backend_json": BACKEND_JSON},
+        "parametros": {"rutas": rutas, "dias": dias, "salidas": salidas, "rondas": rondas, "workers": workers,
+                       "cdc": cdc, "formato": formato, "repeticiones": repeticiones, "semilla": semilla},
+        "rondas": [],
+    }
+    for ronda in range(rondas):
+        if formato == "json":
+            # Cada ronda reescribe los mismos archivos, como un re-scrapeo
+            shutil.rmtree(carpeta, ignore_errors=True)
+        inicio = time.perf_counter()
+        generado = generar_dataset(carpeta, rutas, dias, salidas, ronda=ronda, semilla=semilla, formato=formato)
+        generacion = time.perf_counter() - inicio
+        medicion = medir_ronda(str(carpeta), db_path, generado, workers, cdc)
+        medicion["generacion_seg"] = round(generacion, 3)
+        resultado["rondas"].append(medicion)
+        print(f"ronda {ronda}: {medicion['archivos_por_seg']:>8.1f} arch/s {medicion['inventarios_por_seg']:>9.1f} inv/s "
+              f"{medicion['filas_nuevas_por_seg']:>10.1f} filas/s | BD {medicion['bytes_bd'] / 2**20:.1f} MB "
+              f"(+{medicion['crecimiento_bytes'] / 2**20:.1f})")
+
+    resultado["consultas"] = medir_consultas(db_path, repeticiones, semilla)
+    print(f"\n{'consulta':<30}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for nombre, r in resultado["consultas"].items():
+        if isinstance(r, dict):
+            print(f"{nombre:<30}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de rendimiento del loader y del recomendador con datos sintéticos.")
+    parser.add_argument("--rutas", type=int, default=20)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--salidas", type=int, default=12, help="Salidas por ruta y día.")
+    parser.add_argument("--rondas", type=int, default=3, help="Re-scrapeos completos a cargar uno tras otro.")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cdc", action="store_true")
+    parser.add_argument("--formato", choices=("json", "shard"), default="json")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Mediciones por consulta.")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--trabajo", default=None, help="Directorio para los datos y la base (por defecto, uno temporal).")
+    parser.add_argument("--salida", default=None, help="JSON de resultados (por defecto benchmarks/resultados/suite_<fecha>.json).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    resultado = ejecutar_suite(args.rutas, args.dias, args.salidas, args.rondas, args.workers, args.cdc,
+                               args.formato, args.repeticiones, args.semilla, args.trabajo)
+    salida = Path(args.salida or Path(__file__).resolve().parent / "resultados" / f"suite_{datetime.now():%Y%m%d_%H%M%S}.json")
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n✅ Resultados en {salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# Contenido para: benchmarks/generador_redbus.py
+# Generador de respuestas sintéticas con la forma de SearchV4Results, para medir
+# el loader a escalas que no tenemos scrapeadas (rutas × días × salidas).
+#
+# Cada inventario trae los campos que lee el loader (travelsName, operatorId,
+# fareList, bpData/dpData, amenities, operatorOfferCampaign...) más un relleno
+# con los campos que RedBus manda y el loader ignora, para que el costo de
+# parseo por archivo se parezca al real (~4 KB por inventario).
+#
+# La estructura (empresas, horarios, paradas) depende sólo de la semilla; cada
+# `ronda` es un nuevo scrapeo de los mismos viajes con precios, asientos y
+# ofertas distintos, como cuando el extractor vuelve a pasar por una ruta.
+#
+# Uso: python -m benchmarks.generador_redbus --carpeta /tmp/redbus_sintetico --rutas 20 --dias 30 --salidas 12
+import os
+import json
+import random
+import argparse
+from pathlib import Path
+from datetime import date, datetime, timedelta
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.scraping.redbus.planificador import MESES_ES
+from backend.scraping.shared.shards import agregar_registro, ruta_shard_para
+
+CITY_IDS_PATH = Path(__file__).resolve().parent.parent / "backend" / "scraping" / "redbus" / "config" / "city_ids.json"
+LOGO_BASE_URL = "https://origin-st.redbus.in/buslogos/country/"
+TIPOS_BUS = ("BUS CAMA", "SEMI CAMA", "CAMA 160", "VIP 180", "EJECUTIVO", "ECONOMICO")
+CODIGOS_AMENIDADES = (1, 3, 4, 5, 7, 8, 9, 12, 13, 21, 24, 26, 29, 31, 33, 41, 51, 52, 71, 88, 22, 23, 32, 35, 47, 49)
+EMPRESAS_POR_RUTA = (3, 9)
+PARADAS_POR_CIUDAD = 6
+
+# Campos que el loader no usa pero que pesan en cada inventario real
+RELLENO_INVENTARIO = {
+    "isPickUp": False, "payAtBus": False, "serviceStartingPoint": None, "isConFeePerSeat": False,
+    "hideSeatCount": False, "durationMin": 0, "serviceNotes": {"PETS": "1", "BAGG": "4,2,1", "CHILD": "4,3,2,1"},
+    "isEticketEnabled": False, "busImageCount": -1, "boReqParams": [{"isBpDpSl": None, "isBpDpTb": None,
+    "isAvailCatCard": None, "isAvailReschedule": None, "reschedulePolicy": None, "layoverData": None}],
+    "tupleMessage": None, "busEnRoute": False, "persuasion": None, "isElectricVehicle": False, "isSoldOut": False,
+    "cancellationPolicy": None, "departureTimeMin": 0, "arrivalTimeMin": 0, "journeyDuration": 0,
+    "isSeatLayoutAvailable": True, "isLiveTrackingAvailable": False, "timeZone": None, "convenienceFee": 0.0,
+    "fareForSort": 0.0, "maxFare": 0.0, "isMticketEnabled": False, "maxSeatsPerTransaction": 6,
+    "availableWindowSeats": 0, "availableSingleSeats": 0, "availableFerryServices": 0, "featureList": None,
+    "imageGalleryId": 0, "isPartialCancellationAllowed": False, "vendorCampaignList": None, "isRescheduled": False,
+    "rescheduleCharge": None, "rescheduleTime": 0, "isCounterOnly": None, "isNonAc": False, "isRtc": False,
+    "campaignType": None, "vendorCurrency": "PEN", "subBusType": None, "subBusTypeId": 0, "viaCity": None,
+    "programList": None, "roundTripAdultFare": 0.0, "roundTripChildFare": 0.0, "roundChildFare": 0.0,
+    "busPassDiscount": 0.0, "isNewBusOperator": False, "availableAisleSeats": 0, "availableUpperSeats": 0,
+    "isMerge": False, "affinityFinalScore": 0.0, "recommendedFilter": None, "isPreviousViewedBus": False,
+    "eligibleNudges": None, "discountedFareList": None, "sponsoredAttribute": None, "bpdst": 0.0, "dpdst": 0.0,
+}
+
+def _ciudades(n_rutas):
+    """Ciudades de city_ids.json; si no alcanzan para n_rutas pares, se agregan ciudades ficticias."""
+    with open(CITY_IDS_PATH, "r", encoding="utf-8") as f:
+        ciudades = [nombre.split("(")[0].strip() for nombre in json.load(f)]
+    while len(ciudades) * (len(ciudades) - 1) < n_rutas:
+        ciudades.append(f"Ciudad {len(ciudades) + 1:03d}")
+    return ciudades
+
+def _paradas(rng, ciudad):
+    return [{"Id": rng.randrange(100000, 999999), "Name": f"Terminal {ciudad} {i + 1}",
+             "Address": f"Av. {rng.choice(('Grau', 'Arequipa', 'Bolognesi', 'Ejército', 'Perú'))} {rng.randrange(100, 2000)}, {ciudad}"}
+            for i in range(PARADAS_POR_CIUDAD)]
+
+def construir_estructura(n_rutas, salidas_por_dia, semilla=0):
+    """
+    Rutas y, para cada una, las salidas diarias fijas: empresa, hora, duración,
+    tipo de bus, amenidades, paradas y tarifa base. Sólo depende de la semilla.
+    """
+    rng = random.Random(semilla)
+    ciudades = _ciudades(n_rutas)
+    pares = [(o, d) for o in ciudades for d in ciudades if o != d]
+    rng.shuffle(pares)
+    paradas = {ciudad: _paradas(rng, ciudad) for ciudad in ciudades}
+    empresas = [{"operatorId": 10000 + i, "travelsName": f"Transportes Sintéticos {i:03d}",
+                 "totalRatings": round(rng.uniform(2.5, 5.0), 1), "numberOfReviews": str(rng.randrange(0, 900)),
+                 "busScore": round(rng.uniform(1.5, 4.8), 2)} for i in range(max(12, n_rutas))]
+
+    rutas = []
+    for origen, destino in pares[:n_rutas]:
+        duracion_base = rng.randrange(240, 1320, 15)
+        precio_base = round(duracion_base / 12 + rng.uniform(5, 25))
+        operadores = rng.sample(empresas, rng.randint(*EMPRESAS_POR_RUTA))
+        salidas = []
+        for _ in range(salidas_por_dia):
+            tipo = rng.choice(TIPOS_BUS)
+            salidas.append({
+                "empresa": rng.choice(operadores),
+                "minuto": rng.randrange(0, 24 * 60, 5),
+                "duracion": duracion_base + rng.randrange(-45, 90, 15),
+                "busType": tipo,
+                "isSleeper": "CAMA" in tipo or "180" in tipo,
+                "totalSeats": rng.choice((40, 44, 49, 52, 61)),
+                "amenities": rng.sample(CODIGOS_AMENIDADES, rng.randint(3, 17)),
+                "bp": rng.sample(paradas[origen], rng.randint(1, 3)),
+                "dp": rng.sample(paradas[destino], rng.randint(1, 3)),
+                "precio": precio_base * rng.choice((0.8, 1.0, 1.0, 1.3, 1.8)),
+            })
+        rutas.append({"origen": origen, "destino": destino, "salidas": salidas})
+    return rutas
+
+def _puntos(puntos, salida_base, desfase_min):
+    datos = []
+    for i, punto in enumerate(puntos):
+        momento = salida_base + timedelta(minutes=desfase_min + 10 * i)
+        datos.append({**punto, "Vbpname": punto["Name"], "BpTm": momento.strftime("%H:%M"),
+                      "bpTminmin": momento.hour * 60 + momento.minute, "eta": None,
+                      "BpFullTime": momento.strftime("%Y-%m-%d %H:%M:%S")})
+    return datos
+
+def _oferta(rng, tarifas):
+    porcentaje = rng.choice((5, 10, 15, 20))
+    return {"Vld": True, "RTVld": True, "CmpgList": [{
+        "oType": 1, "CampaignCode": f"ALLF_{rng.getrandbits(32):08x}",
+        "CampaignDesc": f"Descuento {porcentaje} hasta {porcentaje}.0 %", "CampaignType": "PERCENT",
+        "DiscountUnit": float(porcentaje), "OriginalPrices": tarifas,
+        "DiscountedPrices": [round(t * (1 - porcentaje / 100), 1) for t in tarifas],
+        "dealType": "DISCOVERY", "displayText": "Prueba lo nuevo",
+    }]}
+
+def generar_respuesta(ruta, dia, ronda=0, semilla=0):
+    """Un SearchV4Results de `ruta` para la fecha `dia`, tal como lo vería el scrapeo número `ronda`."""
+    rng = random.Random(f"{semilla}|{ruta['origen']}|{ruta['destino']}|{dia.isoformat()}|{ronda}")
+    inventarios = []
+    medianoche = datetime.combine(dia, datetime.min.time())
+    for salida in ruta["salidas"]:
+        inicio = medianoche + timedelta(minutes=salida["minuto"])
+        llegada = inicio + timedelta(minutes=salida["duracion"])
+        factor = rng.uniform(0.85, 1.35)
+        tarifas = sorted({round(salida["precio"] * factor * m) * 1.0 for m in (1.0, 1.25, 1.5)[:rng.randint(1, 3)]})
+        empresa = salida["empresa"]
+        inventarios.append({
+            **RELLENO_INVENTARIO,
+            "serviceId": str(rng.getrandbits(60)), "routeId": rng.randrange(10000, 99999),
+            "travelsName": empresa["travelsName"], "operatorId": empresa["operatorId"],
+            "totalRatings": empresa["totalRatings"], "numberOfReviews": empresa["numberOfReviews"],
+            "busScore": empresa["busScore"], "perzScore": empresa["busScore"],
+            "operatorLogoPath": f"per/logo/{empresa['operatorId']}.png",
+            "departureTime": inicio.strftime("%Y-%m-%d %H:%M:%S"), "firstBpTime": inicio.strftime("%Y-%m-%d %H:%M:%S"),
+            "arrivalTime": llegada.strftime("%Y-%m-%d %H:%M:%S"), "journeyDurationMin": salida["duracion"],
+            "serviceName": "", "busType": salida["busType"], "isAc": True,
+            "isSeater": not salida["isSleeper"], "isSleeper": salida["isSleeper"],
+            "totalSeats": salida["totalSeats"], "availableSeats": rng.randint(0, salida["totalSeats"]),
+            "availableLowerSeats": 0, "fareList": tarifas,
+            "operatorOfferCampaign": _oferta(rng, tarifas) if rng.random() < 0.15 else None,
+            "amenities": salida["amenities"],
+            "bpCount": len(salida["bp"]), "dpCount": len(salida["dp"]),
+            "bpData": _puntos(salida["bp"], inicio, 0),
+            "dpData": _puntos(salida["dp"], llegada, -10 * (len(salida["dp"]) - 1)),
+        })
+    return {
+        "SrcCountry": None, "RTORouteLst": None, "sort": 0, "showOOPSAction": 0,
+        "parentSrcCityName": ruta["origen"], "parentDstCityName": ruta["destino"],
+        "srcCountry": "Peru", "dstCountry": "Peru", "sortLabel": "BUSSCORE",
+        "metaData": {"busLogoBaseUrl": LOGO_BASE_URL, "totalCount": len(inventarios), "isLongRoute": True},
+        "inventories": inventarios,
+        "fechaScrapeo": (medianoche - timedelta(days=7) + timedelta(hours=ronda)).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def generar_dataset(carpeta, rutas=10, dias=30, salidas=10, desde=date(2025, 7, 1), ronda=0, semilla=0, formato="json"):
+    """
+    Escribe rutas × dias respuestas bajo `carpeta` con el mismo árbol que el
+    extractor (<origen>/<destino>/<mes>/api_response_YYYYMMDD.json, o shards
+    .jsonl.gz con formato="shard"). Devuelve {"archivos", "inventarios", "bytes"}.
+    """
+    estructura = construir_estructura(rutas, salidas, semilla)
+    archivos = inventarios = 0
+    for ruta in estructura:
+        for d in range(dias):
+            dia = desde + timedelta(days=d)
+            respuesta = generar_respuesta(ruta, dia, ronda, semilla)
+            output_dir = Path(carpeta) / ruta["origen"] / ruta["destino"] / MESES_ES[dia.month]
+            if formato == "shard":
+                agregar_registro(ruta_shard_para(output_dir), dia.strftime("%Y%m%d"), respuesta)
+            else:
+                os.makedirs(output_dir, exist_ok=True)
+                with open(output_dir / f"api_response_{dia.strftime('%Y%m%d')}.json", "w", encoding="utf-8") as f:
+                    json.dump(respuesta, f, indent=2, ensure_ascii=False)
+            archivos += 1
+            inventarios += len(respuesta["inventories"])
+    total = sum(p.stat().st_size for p in Path(carpeta).rglob("*") if p.is_file())
+    return {"archivos": archivos, "inventarios": inventarios, "bytes": total}
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera respuestas sintéticas de RedBus (SearchV4Results).")
+    parser.add_argument("--carpeta", required=True)
+    parser.add_argument("--rutas", type=int, default=10)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--salidas", type=int, default=10, help="Salidas por ruta y día.")
+    parser.add_argument("--desde", default="2025-07-01")
+    parser.add_argument("--ronda", type=int, default=0, help="Número de re-scrapeo (cambia precios y asientos).")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--formato", choices=("json", "shard"), default="json")
+    args = parser.parse_args()
+    r = generar_dataset(args.carpeta, args.rutas, args.dias, args.salidas, date.fromisoformat(args.desde),
+                        args.ronda, args.semilla, args.formato)
+    print(f"{r['archivos']} archivos | {r['inventarios']} inventarios | {r['bytes'] / 2**20:.1f} MB en {args.carpeta}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Contenido para: frontend/components/dashboard_view.py
+# Dashboard de precios, duración y ofertas por ruta, empresa y fecha de salida.
+#
+# Sólo lee resumen_ruta_fecha_empresa (ver backend/database/redbus_loader/resumenes.py),
+# que el loader mantiene por claves tocadas en cada lote: ninguna vista del
+# dashboard recorre viajes ni historial_viajes. Las consultas pasan por la caché
+# del GestorBD, que se invalida sola cuando el loader sube version_datos.
+from pathlib import Path
+from datetime import date, timedelta
+import sys
+
+import streamlit as st
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from backend.database.db_manager import obtener_gestor, DB_PATH_POR_DEFECTO
+
+COLUMNAS_METRICAS = ("n_viajes", "precio_min", "precio_prom", "precio_max", "duracion_prom", "proporcion_oferta", "asientos")
+
+def _a_columnas(filas, claves):
+    """Filas de la consulta -> {columna: [valores]}, el formato que aceptan los gráficos de Streamlit."""
+    nombres = claves + COLUMNAS_METRICAS
+    return {nombre: [fila[i] for fila in filas] for i, nombre in enumerate(nombres)}
+
+def rango_fechas(gestor):
+    return gestor.consultar("dashboard_rango_fechas")[0]
+
+def resumen_por_ruta(gestor, desde, hasta):
+    return _a_columnas(gestor.consultar("dashboard_por_ruta", (desde, hasta)), ("origen", "destino"))
+
+def resumen_por_empresa(gestor, origen, destino, desde, hasta):
+    return _a_columnas(gestor.consultar("dashboard_por_empresa", (origen, destino, desde, hasta)), ("empresa",))
+
+def resumen_por_fecha(gestor, origen, destino, desde, hasta):
+    return _a_columnas(gestor.consultar("dashboard_por_fecha", (origen, destino, desde, hasta)), ("fecha_salida",))
+
+def mostrar_dashboard(db_path=DB_PATH_POR_DEFECTO):
+    gestor = obtener_gestor(db_path)
+    minima, maxima = rango_fechas(gestor)
+    if minima is None:
+        st.info("Aún no hay datos cargados. Ejecuta run_db_loader.py (o --reconstruir-resumenes).")
+        return
+
+    st.header("📊 Dashboard de precios")
+    desde, hasta = st.select_slider("Fechas de salida", options=_dias_entre(minima, maxima), value=(minima, maxima))
+
+    rutas = resumen_por_ruta(gestor, desde, hasta)
+    st.subheader("Por ruta")
+    st.dataframe(rutas, use_container_width=True, hide_index=True)
+    if not rutas["origen"]:
+        return
+
+    opciones = list(zip(rutas["origen"], rutas["destino"]))
+    origen, destino = st.selectbox("Ruta", opciones, format_func=lambda r: f"{r[0]} → {r[1]}")
+
+    por_fecha = resumen_por_fecha(gestor, origen, destino, desde, hasta)
+    st.subheader("Precio por fecha de salida")
+    st.line_chart(por_fecha, x="fecha_salida", y=["precio_min", "precio_prom", "precio_max"])
+
+    por_empresa = resumen_por_empresa(gestor, origen, destino, desde, hasta)
+    st.subheader("Por empresa")
+    st.bar_chart(por_empresa, x="empresa", y="precio_prom")
+    st.dataframe(por_empresa, use_container_width=True, hide_index=True)
+
+def _dias_entre(desde, hasta):
+    inicio, fin = date.fromisoformat(desde), date.fromisoformat(hasta)
+    return [(inicio + timedelta(days=i)).isoformat() for i in range((fin - inicio).days + 1)]
@@ -1,17 +1,45 @@
 # Contenido para: run_db_loader.py (en la raíz del proyecto)
+import argparse
 import logging
 from pathlib import Path
 import sys
 
 sys.path.append(str(Path(__file__).resolve().parent))
 
-from backend.database.redbus_loader.schema import crear_tablas
-from backend.database.redbus_loader.loader import cargar_datos_desde_carpeta
+from backend.database.db_manager import conectar, incrementar_version_datos
+from backend.database.redbus_loader.schema import crear_tablas, deduplicar_puntos_parada
+from backend.database.redbus_loader.loader import cargar_datos_desde_carpeta, reconstruir_ultimo_estado, compactar_historial
+from backend.database.redbus_loader.resumenes import reconstruir_resumenes
 
 DB_PATH = Path("data/processed/viajes.db")
 JSON_ROOT_PATH = Path("data/raw/redbus")
 
 def main():
+    parser = argparse.ArgumentParser(description="Carga los JSON de RedBus en la base de datos SQLite.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para parsear los JSON en paralelo (1 = modo serial).")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Ignora el manifiesto y vuelve a procesar todos los archivos.")
+    parser.add_argument("--reconstruir-ultimo-estado", action="store_true",
+                        help="Rehace viaje_ultimo_estado desde historial_viajes y termina.")
+    parser.add_argument("--cdc", action="store_true",
+                        help="Sólo guarda un snapshot nuevo cuando cambia precio, asientos u oferta; "
+                             "si no, extiende fecha_ultima_vista del snapshot vigente.")
+    parser.add_argument("--compactar-historial", action="store_true",
+                        help="Convierte un historial existente al formato CDC (borra snapshots repetidos), "
+                             "hace VACUUM y termina.")
+    parser.add_argument("--reconstruir-resumenes", action="store_true",
+                        help="Rehace las tablas de resumen del dashboard desde viaje_ultimo_estado y termina.")
+    parser.add_argument("--deduplicar-paradas", action="store_true",
+                        help="Deja un solo punto de parada por viaje, tipo, hora y nombre de terminal "
+                             "(bases cargadas con la misma terminal bajo dos direcciones) y termina.")
+    parser.add_argument("--metricas", metavar="DIR", default=None,
+                        help="Exporta tiempos por etapa, filas por tabla y errores por categoría a DIR "
+                             "(loader.prom para Prometheus y un JSON por corrida).")
+    parser.add_argument("--perfilar-lote", type=int, metavar="N", default=None,
+                        help="Perfila con cProfile el lote N (0 = el primero); el .prof queda en --metricas o en el directorio actual.")
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     
@@ -19,8 +47,46 @@ def main():
     crear_tablas(str(DB_PATH))
     logging.info("   Esquema listo.")
 
+    if args.reconstruir_ultimo_estado:
+        conn = conectar(str(DB_PATH))
+        with conn:
+            n = reconstruir_ultimo_estado(conn.cursor())
+        conn.close()
+        logging.info(f"✅ viaje_ultimo_estado reconstruida: {n} viajes.")
+        return
+
+    if args.reconstruir_resumenes:
+        conn = conectar(str(DB_PATH))
+        with conn:
+            cursor = conn.cursor()
+            n = reconstruir_resumenes(cursor)
+            incrementar_version_datos(cursor)
+        conn.close()
+        logging.info(f"✅ Resúmenes del dashboard reconstruidos: {n} filas ruta × fecha × empresa.")
+        return
+
+    if args.deduplicar_paradas:
+        conn = conectar(str(DB_PATH))
+        with conn:
+            cursor = conn.cursor()
+            n = deduplicar_puntos_parada(cursor)
+            incrementar_version_datos(cursor)
+        conn.close()
+        logging.info(f"✅ puntos_parada deduplicada: {n} puntos repetidos eliminados.")
+        return
+
+    if args.compactar_historial:
+        conn = conectar(str(DB_PATH))
+        with conn:
+            n = compactar_historial(conn.cursor())
+        conn.execute("VACUUM")
+        conn.close()
+        logging.info(f"✅ Historial compactado: {n} snapshots repetidos eliminados.")
+        return
+
     logging.info(f"2. Iniciando la carga de datos desde: {JSON_ROOT_PATH}")
-    cargar_datos_desde_carpeta(str(JSON_ROOT_PATH), str(DB_PATH))
+    cargar_datos_desde_carpeta(str(JSON_ROOT_PATH), str(DB_PATH), workers=args.workers, forzar=args.forzar, cdc=args.cdc,
+                               metricas_dir=args.metricas, perfilar_lote=args.perfilar_lote)
 
     logging.info("\n✅ ¡Proceso de carga a la base de datos completado!")
 
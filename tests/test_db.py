@@ -0,0 +1,164 @@
+# Contenido para: tests/test_db.py
+# Pruebas del loader (staging, pool de parseo, manifiesto, CDC, paradas) y de la
+# caché de consultas de GestorBD, sobre respuestas sintéticas de benchmarks/generador_redbus.py.
+import os
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from datetime import date
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generador_redbus import construir_estructura, generar_dataset, generar_respuesta
+from backend.database.db_manager import CacheResultados
+from backend.database.redbus_loader.schema import crear_tablas
+from backend.database.redbus_loader.loader import cargar_datos_desde_carpeta
+
+# Tablas que escribe el loader; de archivos_cargados se omite fecha_carga (es la hora de la carga)
+CONSULTAS_TABLAS = {
+    tabla: f"SELECT * FROM {tabla}" for tabla in (
+        "rutas", "empresas", "amenidades", "paradas", "viajes", "historial_viajes", "viaje_ultimo_estado",
+        "puntos_parada", "viaje_amenidades", "resumen_ruta_fecha_empresa", "errores_procesamiento",
+    )
+}
+CONSULTAS_TABLAS["archivos_cargados"] = "SELECT ruta, tamano, mtime, hash, fecha_snapshot FROM archivos_cargados"
+
+def volcar(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {tabla: sorted(conn.execute(sql).fetchall(), key=repr) for tabla, sql in CONSULTAS_TABLAS.items()}
+    finally:
+        conn.close()
+
+def consultar(db_path, sql, parametros=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, parametros).fetchall()
+    finally:
+        conn.close()
+
+def cargar(carpeta, db_path, **opciones):
+    crear_tablas(db_path)
+    cargar_datos_desde_carpeta(str(carpeta), db_path, **opciones)
+
+def escribir_respuesta(carpeta, respuesta, dia, mtime):
+    """Escribe una respuesta como la guarda el extractor y fija su mtime (el manifiesto lo compara)."""
+    output_dir = Path(carpeta) / respuesta["parentSrcCityName"] / respuesta["parentDstCityName"] / "julio"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ruta = output_dir / f"api_response_{dia:%Y%m%d}.json"
+    ruta.write_text(json.dumps(respuesta), encoding="utf-8")
+    os.utime(ruta, (mtime, mtime))
+    return ruta
+
+@pytest.fixture
+def datos(tmp_path):
+    carpeta = tmp_path / "redbus"
+    generar_dataset(carpeta, rutas=3, dias=4, salidas=5)
+    return carpeta
+
+# --- CARGA ---
+
+def test_carga_serial_y_paralela_producen_las_mismas_tablas(datos, tmp_path):
+    serial, paralela = str(tmp_path / "serial.db"), str(tmp_path / "paralela.db")
+    cargar(datos, serial, workers=1)
+    cargar(datos, paralela, workers=2)
+
+    tablas = volcar(serial)
+    assert len(tablas["viajes"]) == 3 * 4 * 5
+    assert len(tablas["historial_viajes"]) == 3 * 4 * 5
+    assert tablas == volcar(paralela)
+
+def test_json_y_shards_producen_los_mismos_viajes(tmp_path):
+    generar_dataset(tmp_path / "json", rutas=2, dias=3, salidas=4)
+    generar_dataset(tmp_path / "shard", rutas=2, dias=3, salidas=4, formato="shard")
+    cargar(tmp_path / "json", str(tmp_path / "json.db"))
+    cargar(tmp_path / "shard", str(tmp_path / "shard.db"))
+
+    viajes = "SELECT * FROM viajes ORDER BY id"
+    ultimo = "SELECT viaje_id, precio_min, precio_max, asientos_disponibles, tarifas FROM viaje_ultimo_estado ORDER BY viaje_id"
+    for sql in (viajes, ultimo):
+        assert consultar(str(tmp_path / "json.db"), sql) == consultar(str(tmp_path / "shard.db"), sql)
+
+def test_recarga_sin_cambios_no_hace_nada(datos, tmp_path):
+    db_path = str(tmp_path / "viajes.db")
+    cargar(datos, db_path)
+    antes, version = volcar(db_path), consultar(db_path, "SELECT version FROM version_datos")
+
+    cargar(datos, db_path)
+    assert volcar(db_path) == antes
+    assert consultar(db_path, "SELECT version FROM version_datos") == version
+
+def test_archivo_modificado_agrega_snapshot(datos, tmp_path):
+    db_path = str(tmp_path / "viajes.db")
+    cargar(datos, db_path)
+    # Un re-scrapeo de la misma carpeta: mismos viajes, precios y fechaScrapeo nuevos
+    generar_dataset(datos, rutas=3, dias=4, salidas=5, ronda=1)
+    cargar(datos, db_path)
+
+    assert consultar(db_path, "SELECT COUNT(*) FROM viajes") == [(60,)]
+    assert consultar(db_path, "SELECT COUNT(*) FROM historial_viajes") == [(120,)]
+    # viaje_ultimo_estado sigue al snapshot más reciente
+    assert consultar(db_path, """
+        SELECT COUNT(*) FROM viaje_ultimo_estado u
+        WHERE u.fecha_snapshot <> (SELECT MAX(fecha_snapshot) FROM historial_viajes h WHERE h.viaje_id = u.viaje_id)
+    """) == [(0,)]
+
+# --- CDC ---
+
+def test_cdc_extiende_fecha_ultima_vista_si_no_hay_cambios(tmp_path):
+    carpeta, db_path = tmp_path / "redbus", str(tmp_path / "viajes.db")
+    ruta, dia = construir_estructura(1, 3)[0], date(2025, 7, 10)
+    respuesta = generar_respuesta(ruta, dia)
+    escribir_respuesta(carpeta, respuesta, dia, mtime=1_000_000)
+    cargar(carpeta, db_path, cdc=True)
+    primera = respuesta["fechaScrapeo"]
+
+    # Mismo estado observado más tarde: sólo cambia la fecha de scrapeo
+    respuesta["fechaScrapeo"] = "2025-07-05 12:00:00"
+    escribir_respuesta(carpeta, respuesta, dia, mtime=2_000_000)
+    cargar(carpeta, db_path, cdc=True)
+
+    assert consultar(db_path, "SELECT DISTINCT fecha_snapshot, fecha_ultima_vista FROM historial_viajes") == \
+        [(primera, "2025-07-05 12:00:00")]
+    assert consultar(db_path, "SELECT COUNT(*) FROM historial_viajes") == [(3,)]
+    assert consultar(db_path, "SELECT DISTINCT fecha_ultima_vista FROM viaje_ultimo_estado") == [("2025-07-05 12:00:00",)]
+
+    # Un cambio de precio sí genera un snapshot nuevo
+    respuesta["inventories"][0]["fareList"] = [1.0]
+    respuesta["fechaScrapeo"] = "2025-07-06 12:00:00"
+    escribir_respuesta(carpeta, respuesta, dia, mtime=3_000_000)
+    cargar(carpeta, db_path, cdc=True)
+    assert consultar(db_path, "SELECT COUNT(*) FROM historial_viajes") == [(4,)]
+
+# --- PARADAS ---
+
+def test_una_terminal_con_dos_direcciones_es_un_solo_punto(tmp_path):
+    carpeta, db_path = tmp_path / "redbus", str(tmp_path / "viajes.db")
+    ruta, dia = construir_estructura(1, 1)[0], date(2025, 7, 10)
+    respuesta = generar_respuesta(ruta, dia)
+    inventario = respuesta["inventories"][0]
+    inventario["bpData"] = [inventario["bpData"][0], {**inventario["bpData"][0], "Address": "Otra dirección 123"}]
+    escribir_respuesta(carpeta, respuesta, dia, mtime=1_000_000)
+    cargar(carpeta, db_path)
+
+    assert consultar(db_path, "SELECT COUNT(*) FROM puntos_parada WHERE tipo = 'embarque'") == [(1,)]
+
+# --- CACHÉ DE CONSULTAS ---
+
+def test_cache_no_retrocede_ante_una_version_vieja():
+    cache = CacheResultados()
+    assert cache.obtener("q", 5) is None
+    cache.guardar("q", 5, [(1,)])
+
+    # Un lector con una foto anterior no ve ni pisa lo de la versión 5
+    assert cache.obtener("q", 4) is None
+    cache.guardar("otra", 4, [(2,)])
+    assert cache.obtener("q", 5) == ((1,),)
+    assert cache.obtener("otra", 5) is None
+
+    # Una versión nueva sí invalida
+    assert cache.obtener("q", 6) is None
+    assert cache.estadisticas()["version_datos"] == 6
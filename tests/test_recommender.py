@@ -0,0 +1,74 @@
+# Contenido para: tests/test_recommender.py
+# Pruebas del recomendador en memoria: el refresco incremental debe dejar la
+# misma foto que una reconstrucción completa desde SQLite.
+import sys
+from pathlib import Path
+from datetime import date
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generador_redbus import generar_dataset
+from backend.database.redbus_loader.schema import crear_tablas
+from backend.database.redbus_loader.loader import cargar_datos_desde_carpeta
+from backend.core.recommender import Recomendador
+
+def cargar(carpeta, db_path):
+    crear_tablas(db_path)
+    cargar_datos_desde_carpeta(str(carpeta), db_path)
+
+def assert_misma_foto(refrescado, reconstruido):
+    assert refrescado.max_historial_id == reconstruido.max_historial_id
+    assert refrescado.rutas == reconstruido.rutas
+    assert refrescado.empresas == reconstruido.empresas
+    assert refrescado._columnas.keys() == reconstruido._columnas.keys()
+    for nombre, valores in reconstruido._columnas.items():
+        assert refrescado._columnas[nombre].dtype == valores.dtype, nombre
+        assert np.array_equal(refrescado._columnas[nombre], valores, equal_nan=valores.dtype.kind == "f"), nombre
+    assert refrescado._dia0 == reconstruido._dia0
+    for nombre, matriz in reconstruido._calendario.items():
+        assert np.array_equal(refrescado._calendario[nombre], matriz, equal_nan=matriz.dtype.kind == "f"), nombre
+
+@pytest.fixture
+def base(tmp_path):
+    carpeta, db_path = tmp_path / "redbus", str(tmp_path / "viajes.db")
+    generar_dataset(carpeta, rutas=3, dias=4, salidas=5)
+    cargar(carpeta, db_path)
+    return carpeta, db_path
+
+def test_refrescar_sin_cambios_no_toca_nada(base):
+    _, db_path = base
+    recomendador = Recomendador(db_path)
+    assert len(recomendador) == 60
+    assert recomendador.refrescar() == 0
+
+def test_refrescar_equivale_a_reconstruir(base):
+    carpeta, db_path = base
+    recomendador = Recomendador(db_path, intervalo_refresco=0)
+
+    # Nuevo scrapeo de los mismos viajes (otros precios y asientos) y días más adelante
+    generar_dataset(carpeta, rutas=3, dias=4, salidas=5, ronda=1)
+    generar_dataset(carpeta, rutas=3, dias=3, salidas=5, desde=date(2025, 7, 20))
+    cargar(carpeta, db_path)
+
+    assert recomendador.refrescar() == 60 + 45
+    reconstruido = Recomendador(db_path)
+    assert len(reconstruido) == 105
+    assert_misma_foto(recomendador, reconstruido)
+
+    filtros = {"presupuesto": 200, "fecha_desde": "2025-07-01", "fecha_hasta": "2025-07-31"}
+    assert recomendador.recomendar(k=10, **filtros) == reconstruido.recomendar(k=10, **filtros)
+    origen, destino = next(iter(reconstruido.rutas.values()))
+    assert recomendador.calendario_precios(origen, destino, "2025-07") == \
+        reconstruido.calendario_precios(origen, destino, "2025-07")
+
+def test_reconstruir_deja_la_misma_foto_que_una_instancia_nueva(base):
+    carpeta, db_path = base
+    recomendador = Recomendador(db_path)
+    generar_dataset(carpeta, rutas=3, dias=4, salidas=5, ronda=1)
+    cargar(carpeta, db_path)
+
+    recomendador.reconstruir()
+    assert_misma_foto(recomendador, Recomendador(db_path))
@@ -0,0 +1,237 @@
+# Contenido para: tests/test_scraper.py
+# Pruebas del scraper sin red: paginación del extractor, presupuesto de
+# peticiones, cola de trabajos (leases, propiedad, backoff), limitador de tasa y métricas.
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.scraping.redbus import extractor
+from backend.scraping.redbus.extractor import offsets_pendientes, combinar_paginas, PresupuestoAgotado
+from backend.scraping.shared.cola_trabajos import ColaTrabajos
+from backend.scraping.shared.rate_limiter import TokenBucket
+from backend.scraping.shared.metricas import Metricas
+
+def inventario(servicio, operador=1):
+    return {"operatorId": operador, "routeId": 7, "serviceId": servicio, "departureTime": f"2025-07-10 {servicio:02d}:00:00"}
+
+def tarea(fecha, origen="Lima", destino="Ica"):
+    return (1, 2, origen, destino, fecha, f"data/raw/redbus/{origen}/{destino}/julio")
+
+# --- PAGINACIÓN ---
+
+def test_offsets_pendientes_avanza_segun_la_primera_pagina():
+    assert offsets_pendientes({"metaData": {"totalCount": 45}, "inventories": [{}] * 20}) == [20, 40]
+    # El servidor entregó menos que `limit`: se avanza de a 5
+    assert offsets_pendientes({"metaData": {"totalCount": 45}, "inventories": [{}] * 5}) == list(range(5, 45, 5))
+    assert offsets_pendientes({"metaData": {"totalCount": 45}, "inventories": [{}] * 5}, tamano_pagina=20) == [20, 40]
+
+def test_offsets_pendientes_sin_metadata_es_una_sola_pagina():
+    assert offsets_pendientes({"inventories": [{}] * 20}) == []
+    assert offsets_pendientes({"metaData": {"totalCount": "?"}, "inventories": []}) == []
+
+def test_combinar_paginas_descarta_duplicados():
+    data = {"inventories": [inventario(1), inventario(2)]}
+    paginas = [{"inventories": [inventario(2), inventario(3)]}, {"inventories": [inventario(3), inventario(3, operador=2)]}, None]
+    combinado = combinar_paginas(data, paginas)
+    assert combinado["inventories"] == [inventario(1), inventario(2), inventario(3), inventario(3, operador=2)]
+    assert combinado["paginasDescargadas"] == 4
+
+# --- PRESUPUESTO ---
+
+def test_presupuesto_corta_en_el_limite():
+    extractor.configurar_presupuesto(3)
+    try:
+        for _ in range(3):
+            extractor.reservar_peticion()
+        assert extractor.presupuesto_agotado()
+        with pytest.raises(PresupuestoAgotado):
+            extractor.reservar_peticion()
+        assert extractor.peticiones_realizadas() == 3
+    finally:
+        extractor.configurar_presupuesto(None)
+    assert not extractor.presupuesto_agotado()
+
+# --- COLA DE TRABAJOS ---
+
+@pytest.fixture
+def colas(tmp_path):
+    db_path = tmp_path / "cola.db"
+    a = ColaTrabajos(db_path, worker_id="A", lease_segundos=60)
+    b = ColaTrabajos(db_path, worker_id="B", lease_segundos=60)
+    a.encolar([tarea("2025-07-10"), tarea("2025-07-11")])
+    return a, b
+
+def estado_de(cola, trabajo_id):
+    with cola._conexion() as conn:
+        return conn.execute("SELECT estado, worker, intentos, disponible_desde FROM trabajos_scraping WHERE id = ?",
+                            (trabajo_id,)).fetchone()
+
+def test_encolar_no_duplica(colas):
+    a, _ = colas
+    assert a.encolar([tarea("2025-07-10")]) == 0
+    assert a.estado()["por_estado"]["pendiente"] == 2
+
+def test_reabrir_actualiza_la_prioridad_de_los_pendientes(tmp_path):
+    cola = ColaTrabajos(tmp_path / "cola.db", worker_id="A")
+    cola.encolar([tarea("2025-07-10")], prioridad=1.0, reabrir=True)
+    cola.encolar([tarea("2025-07-11")], prioridad=2.0, reabrir=True)
+    # La pasada siguiente puntúa más alto el trabajo que seguía pendiente
+    assert cola.encolar([tarea("2025-07-10")], prioridad=5.0, reabrir=True) == 0
+
+    assert [t[1] for t in cola.tomar(n=2)] == [tarea("2025-07-10"), tarea("2025-07-11")]
+
+def test_reabrir_no_toca_intentos_ni_backoff_de_los_pendientes(tmp_path):
+    cola = ColaTrabajos(tmp_path / "cola.db", worker_id="A")
+    cola.encolar([tarea("2025-07-10")], prioridad=1.0)
+    [(trabajo_id, _, intento)] = cola.tomar()
+    assert cola.fallar(trabajo_id, intento, "HTTP 500")
+    antes = estado_de(cola, trabajo_id)
+
+    cola.encolar([tarea("2025-07-10")], prioridad=5.0, reabrir=True)
+    assert estado_de(cola, trabajo_id) == antes
+    with cola._conexion() as conn:
+        assert conn.execute("SELECT prioridad FROM trabajos_scraping WHERE id = ?", (trabajo_id,)).fetchone() == (5.0,)
+    assert cola.tomar() == []
+
+def test_otro_worker_no_toma_ni_cierra_un_trabajo_ajeno(colas):
+    a, b = colas
+    [(trabajo_id, args, intento)] = a.tomar(ids=a.ids_de([tarea("2025-07-10")]))
+    assert args == tarea("2025-07-10")
+
+    # B sólo se lleva el otro trabajo
+    assert [t[1] for t in b.tomar(n=10)] == [tarea("2025-07-11")]
+    assert not b.completar(trabajo_id, intento)
+    assert not b.fallar(trabajo_id, intento, "error")
+    assert not b.renovar_lease(trabajo_id, intento)
+    assert estado_de(a, trabajo_id)[:2] == ("en_curso", "A")
+
+    assert a.completar(trabajo_id, intento)
+    assert estado_de(a, trabajo_id)[0] == "completado"
+
+def test_lease_vencido_pasa_a_otro_worker_y_el_rezagado_no_pisa(tmp_path):
+    a = ColaTrabajos(tmp_path / "cola.db", worker_id="A", lease_segundos=0.2)
+    b = ColaTrabajos(tmp_path / "cola.db", worker_id="B", lease_segundos=60)
+    a.encolar([tarea("2025-07-10")])
+    [(trabajo_id, _, intento_a)] = a.tomar()
+    time.sleep(0.3)
+
+    [(retomado, _, intento_b)] = b.tomar()
+    assert retomado == trabajo_id and intento_b == intento_a + 1
+    assert not a.completar(trabajo_id, intento_a)
+    assert not a.fallar(trabajo_id, intento_a, "tarde")
+    assert b.completar(trabajo_id, intento_b)
+
+def test_mismo_worker_con_una_toma_vieja_no_cierra(tmp_path):
+    a = ColaTrabajos(tmp_path / "cola.db", worker_id="A", lease_segundos=0.2)
+    a.encolar([tarea("2025-07-10")])
+    [(trabajo_id, _, vieja)] = a.tomar()
+    time.sleep(0.3)
+    [(_, _, nueva)] = a.tomar()
+    assert not a.completar(trabajo_id, vieja)
+    assert a.completar(trabajo_id, nueva)
+
+def test_latido_renueva_el_lease(tmp_path):
+    a = ColaTrabajos(tmp_path / "cola.db", worker_id="A", lease_segundos=0.5)
+    b = ColaTrabajos(tmp_path / "cola.db", worker_id="B", lease_segundos=60)
+    a.encolar([tarea("2025-07-10")])
+    [(trabajo_id, _, intento)] = a.tomar()
+    with a.latido(intervalo=0.1) as latido:
+        latido.agregar(trabajo_id, intento)
+        time.sleep(1.0)
+        assert b.tomar() == []
+        latido.quitar(trabajo_id)
+    assert a.completar(trabajo_id, intento)
+
+def test_fallar_aplica_backoff_y_agota_intentos(tmp_path):
+    a = ColaTrabajos(tmp_path / "cola.db", worker_id="A", max_intentos=2)
+    a.encolar([tarea("2025-07-10")])
+    [(trabajo_id, _, intento)] = a.tomar()
+    antes = time.time()
+    assert a.fallar(trabajo_id, intento, "HTTP 500")
+
+    estado, _, intentos, disponible_desde = estado_de(a, trabajo_id)
+    assert (estado, intentos) == ("pendiente", 1)
+    assert disponible_desde > antes + 20  # BACKOFF_BASE con jitter de ±20 %
+    assert a.tomar() == []
+    assert 20 < a.proximo_disponible() <= 36
+
+    with a._transaccion() as conn:
+        conn.execute("UPDATE trabajos_scraping SET disponible_desde = 0")
+    [(_, _, intento)] = a.tomar()
+    assert a.fallar(trabajo_id, intento, "HTTP 500")
+    assert estado_de(a, trabajo_id)[0] == "fallido"
+    assert a.proximo_disponible() is None
+
+    assert a.reintentar_fallidos() == 1
+    assert estado_de(a, trabajo_id)[:3] == ("pendiente", "A", 0)
+
+def test_liberar_no_gasta_intentos(colas):
+    a, _ = colas
+    [(trabajo_id, _, intento)] = a.tomar()
+    assert a.liberar(trabajo_id, intento)
+    assert estado_de(a, trabajo_id)[:3:2] == ("pendiente", 0)
+    assert not a.liberar(trabajo_id, intento)
+
+def test_filtro_de_ids(colas):
+    a, _ = colas
+    [elegido] = a.ids_de([tarea("2025-07-11")])
+    assert [t[0] for t in a.tomar(n=10, ids=[elegido])] == [elegido]
+    assert a.tomar(n=10, ids=[elegido]) == []
+    assert a.proximo_disponible(ids=[]) is None
+    assert a.proximo_disponible() == 0
+
+# --- LIMITADOR ---
+
+def test_penalizaciones_concurrentes_reducen_la_tasa_una_vez():
+    limitador = TokenBucket(tasa=8)
+    for _ in range(16):
+        limitador.penalizar(5)
+    assert limitador.tasa == 4
+    pausa = limitador._pausa_hasta
+    limitador.penalizar(10)
+    assert limitador.tasa == 4 and limitador._pausa_hasta > pausa
+
+    limitador._pausa_hasta = 0.0  # terminó la ventana: un 429 nuevo es otro episodio
+    limitador.penalizar(1)
+    assert limitador.tasa == 2
+
+def test_recompensar_recupera_hasta_la_tasa_objetivo():
+    limitador = TokenBucket(tasa=10, paso_recuperacion=0.25)
+    limitador.penalizar(0)
+    assert limitador.tasa == 5
+    for _ in range(10):
+        limitador.recompensar()
+    assert limitador.tasa == 10
+
+def test_adquirir_respeta_la_tasa():
+    limitador = TokenBucket(tasa=20, capacidad=1)
+
+    async def pedir(n):
+        for _ in range(n):
+            await limitador.adquirir()
+
+    inicio = time.monotonic()
+    asyncio.run(pedir(6))
+    # Una ficha inicial y 5 más a 20 por segundo
+    assert time.monotonic() - inicio >= 0.2
+
+# --- MÉTRICAS ---
+
+def test_histograma_prometheus_acumula_buckets():
+    registro = Metricas()
+    for valor in (0.0001, 0.003, 0.003, 100):
+        registro.observar("scraper_peticion_segundos", valor, modo="async")
+    registro.contar("scraper_tareas_total", 2, modo="async", resultado="ok")
+    texto = registro.texto_prometheus()
+
+    assert 'chaskiway_scraper_tareas_total{modo="async",resultado="ok"} 2' in texto
+    assert 'chaskiway_scraper_peticion_segundos_bucket{modo="async",le="0.0005"} 1' in texto
+    assert 'chaskiway_scraper_peticion_segundos_bucket{modo="async",le="0.005"} 3' in texto
+    assert 'chaskiway_scraper_peticion_segundos_bucket{modo="async",le="60.0"} 3' in texto
+    assert 'chaskiway_scraper_peticion_segundos_bucket{modo="async",le="+Inf"} 4' in texto
+    assert 'chaskiway_scraper_peticion_segundos_count{modo="async"} 4' in texto